@@ -2,117 +2,196 @@
 import pandas as pd
 import numpy as np
 import os
-from pathlib import Path
 import warnings
+from price_store import default_store_dir, store_is_fresh, read_price_store
+from price_matrix import PriceMatrix, as_price_matrix
+from price_schema import PRECISIONS, compact_prices
+from csv_loader import load_csv_dir, print_outcomes
+from correlation import compute_correlation
+from instrumentation import instrument
 warnings.filterwarnings('ignore')
 
 
-def load_stock_data(csv_dir="data/csv"):
-    """Load all stock CSV files into a single DataFrame."""
+@instrument()
+def load_stock_data(csv_dir="data/csv", columns=None, symbols=None, use_store=True, store_dir=None,
+                    compact=True, precision='float32'):
+    """
+    Load all stock data into a single DataFrame sorted by Symbol and Date.
+
+    Reads the columnar price store (see price_store.py) when it is present and
+    up to date, otherwise falls back to parsing the per-symbol CSV files
+    concurrently (see csv_loader.py; files it cannot use are reported).
+    columns / symbols optionally restrict the result, e.g. columns=['Close'].
+    compact applies the schema in price_schema.py (categorical Symbol, float32
+    prices, unsigned volume); pass precision='float64' to keep double prices.
+    """
+    store_dir = store_dir or default_store_dir(csv_dir)
+    if use_store and store_is_fresh(store_dir, csv_dir):
+        try:
+            result = read_price_store(store_dir, columns=columns, symbols=symbols)
+            print(f"📊 Total data loaded: {len(result)} rows, {result['Symbol'].nunique()} stocks (store)")
+            return compact_prices(result, precision) if compact else result
+        except Exception as e:
+            print(f"⚠️ Price store unreadable, falling back to CSV: {e}")
+
     if not os.path.exists(csv_dir):
         print(f"❌ Folder {csv_dir} not found!")
         return pd.DataFrame()
 
-    all_files = Path(csv_dir).glob("*.csv")
-    all_data = []
-
-    for file_path in all_files:
-        symbol = file_path.stem
-        try:
-            df = pd.read_csv(file_path)
-            if 'Date' not in df.columns:
-                df['Date'] = pd.date_range(start='2023-01-01', periods=len(df))
-            if 'Close' not in df.columns:
-                continue
-            if 'Volume' not in df.columns:
-                df['Volume'] = 1000000
-
-            df['Symbol'] = symbol
-            df['Date'] = pd.to_datetime(df['Date'])
-            all_data.append(df)
-            print(f"✅ Loaded {symbol}: {len(df)} rows")
-        except Exception as e:
-            print(f"❌ Error loading {file_path}: {e}")
-
-    if not all_data:
+    result, outcomes = load_csv_dir(csv_dir, symbols=symbols, columns=columns,
+                                    price_dtype=PRECISIONS[precision] if compact else np.float64)
+    print_outcomes(outcomes)
+    if result.empty:
         print("❌ No valid CSV files found!")
         return pd.DataFrame()
 
-    result = pd.concat(all_data, ignore_index=True)
     print(f"📊 Total data loaded: {len(result)} rows, {result['Symbol'].nunique()} stocks")
-    return result.sort_values(['Symbol', 'Date'])
+    if not compact:
+        return result.assign(Symbol=result['Symbol'].astype(object))
+    return compact_prices(result, precision)
+
 
+def _has_close(df):
+    if isinstance(df, PriceMatrix):
+        return not df.empty and 'Close' in df.fields
+    return not df.empty and 'Close' in df.columns
 
+
+@instrument()
 def calculate_key_metrics(df):
-    """Key metrics and yearly returns per stock."""
-    if df.empty or 'Close' not in df.columns:
+    """Key metrics and yearly returns per stock (df may be a frame or a PriceMatrix)."""
+    if not _has_close(df):
         return pd.DataFrame(), pd.DataFrame(), {}, pd.DataFrame()
 
-    yearly_returns = df.groupby('Symbol')['Close'].agg(['first', 'last']).reset_index()
-    yearly_returns['Yearly_Return'] = (
-        (yearly_returns['last'] - yearly_returns['first']) / yearly_returns['first'] * 100
-    ).fillna(0)
+    matrix = as_price_matrix(df)
+    yearly_returns = matrix.yearly_returns()
 
     top_green = yearly_returns.nlargest(10, 'Yearly_Return')[['Symbol', 'Yearly_Return']]
     top_red = yearly_returns.nsmallest(10, 'Yearly_Return')[['Symbol', 'Yearly_Return']]
 
+    volume = matrix.volume
     market_summary = {
         'total_stocks': len(yearly_returns),
         'green_stocks': len(top_green),
         'red_stocks': len(top_red),
-        'avg_close_price': df['Close'].mean(),
-        'avg_volume': df['Volume'].mean() if 'Volume' in df.columns else 0,
+        'avg_close_price': np.nanmean(matrix.close),
+        'avg_volume': np.nanmean(volume) if volume is not None else 0,
         'avg_yearly_return': yearly_returns['Yearly_Return'].mean()
     }
 
     return top_green, top_red, market_summary, yearly_returns
 
 
-def calculate_volatility(df):
-    """Annualized volatility (std dev of daily returns)."""
-    if df.empty or len(df['Symbol'].unique()) < 2:
-        return pd.DataFrame()
+def _symbol_segments(df):
+    """
+    Per-row symbol codes and segment boundaries of a frame sorted by (Symbol, Date).
+
+    Returns (codes, symbols, starts, ends): rows starts[i]:ends[i] belong to symbols[i].
+    """
+    codes, symbols = pd.factorize(df['Symbol'], sort=False)
+    n = len(codes)
+    breaks = np.flatnonzero(codes[1:] != codes[:-1]) + 1
+    starts = np.concatenate([[0], breaks]) if n else np.empty(0, dtype=np.int64)
+    ends = np.concatenate([breaks, [n]]) if n else np.empty(0, dtype=np.int64)
+    return codes, np.asarray(symbols), starts, ends
+
+
+def _frame_daily_returns(close, starts):
+    """pct_change within each symbol segment of the sorted close column; NaN at segment starts."""
+    returns = np.empty_like(close, dtype=np.float64)
+    returns[0:1] = np.nan
+    with np.errstate(divide='ignore', invalid='ignore'):
+        returns[1:] = close[1:] / close[:-1] - 1
+    returns[starts] = np.nan
+    return returns
+
 
-    volatility_results = []
-    for symbol, group in df.groupby('Symbol'):
-        if len(group) > 1:
-            daily_ret = group['Close'].pct_change().dropna()
-            vol = daily_ret.std() * np.sqrt(252) * 100 if len(daily_ret) > 0 else 0
-            volatility_results.append({'Symbol': symbol, 'Volatility': vol})
+def _frame_volatility(df):
+    """Annualized volatility per symbol from the sorted long frame (no per-symbol groups)."""
+    codes, symbols, starts, ends = _symbol_segments(df)
+    close = df['Close'].to_numpy(dtype=np.float64)
+    returns = _frame_daily_returns(close, starts)
 
-    return pd.DataFrame(volatility_results).sort_values('Volatility', ascending=False)
+    valid = ~np.isnan(returns)
+    n_symbols = len(symbols)
+    counts = np.bincount(codes[valid], minlength=n_symbols)
+    sums = np.bincount(codes[valid], weights=returns[valid], minlength=n_symbols)
+    mean = sums / np.maximum(counts, 1)
+    dev = returns[valid] - mean[codes[valid]]
+    sq = np.bincount(codes[valid], weights=dev * dev, minlength=n_symbols)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        vol = np.sqrt(sq / (counts - 1)) * np.sqrt(252) * 100
 
+    keep = (ends - starts) > 1
+    return symbols[keep], vol[keep]
 
+
+@instrument()
+def calculate_volatility(df):
+    """Annualized volatility (std dev of daily returns); df may be a sorted frame or a PriceMatrix."""
+    if isinstance(df, PriceMatrix):
+        if df.n_symbols < 2:
+            return pd.DataFrame()
+        rows = df.mask.sum(axis=0)
+        keep = rows > 1
+        symbols, vol = df.symbols[keep], df.volatility()[keep]
+    else:
+        if df.empty or df['Symbol'].nunique() < 2:
+            return pd.DataFrame()
+        symbols, vol = _frame_volatility(df)
+
+    return (
+        pd.DataFrame({'Symbol': symbols, 'Volatility': vol})
+        .sort_values('Volatility', ascending=False)
+    )
+
+
+@instrument()
 def calculate_cumulative_returns(df):
-    """Cumulative return time-series and top 5 stocks."""
+    """Cumulative return time-series and top 5 stocks; df may be a sorted frame or a PriceMatrix."""
     if df.empty:
         return pd.DataFrame(), []
 
-    cum_data = []
-    for symbol, group in df.groupby('Symbol'):
-        if len(group) > 1:
-            daily_ret = group['Close'].pct_change().fillna(0)
-            cum_ret = (1 + daily_ret).cumprod() - 1
-            cum_data.append(pd.DataFrame({
-                'Date': group['Date'].iloc[:len(cum_ret)],
-                'Symbol': symbol,
-                'Cumulative_Return': cum_ret
-            }))
-
-    if not cum_data:
+    if isinstance(df, PriceMatrix):
+        matrix = df
+    else:
+        # Only the final row decides the top 5, so rank on the long frame and
+        # lay out just those symbols
+        codes, symbols, starts, ends = _symbol_segments(df)
+        dates = df['Date'].to_numpy()
+        close = df['Close'].to_numpy(dtype=np.float64)
+        keep = (ends - starts) > 1
+        if not keep.any():
+            return pd.DataFrame(), []
+        last_date = dates[ends[keep] - 1].max()
+        at_end = keep & (dates[ends - 1] == last_date)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            final = close[ends - 1] / close[starts] - 1
+        final_returns = pd.Series(final[at_end], index=symbols[at_end]).dropna()
+        candidates = final_returns.nlargest(5).index if not final_returns.empty else symbols[keep][:5]
+        # One copy of just the rows and columns needed
+        subset = df.loc[df['Symbol'].isin(candidates), ['Symbol', 'Date', 'Close']]
+        matrix = PriceMatrix.from_frame(subset)
+
+    keep = matrix.mask.sum(axis=0) > 1
+    if not keep.any():
         return pd.DataFrame(), []
 
-    cum_df = pd.concat(cum_data, ignore_index=True)
-    pivot_cum = cum_df.pivot(index='Date', columns='Symbol', values='Cumulative_Return')
-    final_returns = pivot_cum.iloc[-1].dropna()
-    top_5 = final_returns.nlargest(5).index.tolist() if not final_returns.empty else list(pivot_cum.columns[:5])
+    cumulative = pd.DataFrame(
+        matrix.cumulative_returns()[:, keep],
+        index=pd.DatetimeIndex(matrix.dates, name='Date'),
+        columns=pd.Index(matrix.symbols[keep], name='Symbol'),
+    )
+    final_returns = cumulative.iloc[-1].dropna()
+    top_5 = final_returns.nlargest(5).index.tolist() if not final_returns.empty else list(cumulative.columns[:5])
 
-    return pivot_cum[top_5], top_5
+    return cumulative[top_5], top_5
 
 
 # 👉 SIMPLE, RELIABLE SECTOR FUNCTION USING YOUR sectors.csv
+@instrument()
 def get_sector_performance(df, sectors_file="data/sectors.csv"):
-    """Bulletproof sector analysis."""
+    """Bulletproof sector analysis (df may be a frame or a PriceMatrix)."""
     if df.empty:
         return pd.DataFrame({'Sector': ['No Data'], 'Return': [0]})
 
@@ -127,11 +206,8 @@ def get_sector_performance(df, sectors_file="data/sectors.csv"):
         sectors = sectors.drop_duplicates('Symbol')
 
         # Yearly returns
-        yearly = df.groupby('Symbol')['Close'].agg(['first', 'last']).reset_index()
+        yearly = as_price_matrix(df).yearly_returns()
         yearly['Symbol'] = yearly['Symbol'].astype(str).str.strip().str.upper()
-        yearly['Yearly_Return'] = (
-            (yearly['last'] - yearly['first']) / yearly['first'] * 100
-        ).fillna(0)
 
         # Merge and calculate
         merged = yearly.merge(sectors, on='Symbol', how='left')
@@ -155,41 +231,94 @@ def get_sector_performance(df, sectors_file="data/sectors.csv"):
         })
 
 
-def calculate_correlation(df, max_stocks=12):
-    """Correlation matrix of daily returns."""
-    if df.empty or df['Symbol'].nunique() < 2:
+@instrument()
+def calculate_correlation(df, max_stocks=None):
+    """
+    Correlation matrix of daily returns for the whole universe (df may be a frame
+    or a PriceMatrix). max_stocks optionally keeps only the first N symbols.
+    Use correlation.compute_correlation directly for top pairs and sub-blocks.
+    """
+    if df.empty:
         return pd.DataFrame()
 
     try:
-        close_pivot = df.pivot_table(index='Date', columns='Symbol', values='Close').pct_change().dropna(how='all')
-        if len(close_pivot.columns) > max_stocks:
-            close_pivot = close_pivot[close_pivot.columns[:max_stocks]]
-        return close_pivot.corr().round(2)
+        corr = compute_correlation(df)
+        if corr.empty:
+            return pd.DataFrame()
+        symbols = corr.symbols[:max_stocks] if max_stocks else None
+        return corr.to_frame(symbols, decimals=2)
     except Exception:
         return pd.DataFrame()
 
 
-def get_monthly_top_gainers_losers(df, top_n=5):
-    """Month-wise top gainers and losers."""
+def _top_n_per_row(values, top_n, largest=True):
+    """
+    Column indices of the top_n largest (or smallest) values of every row, best first.
+
+    Uses argpartition so only the selected candidates are sorted. NaN never
+    ranks; rows with fewer valid values return -1 for the missing slots.
+    """
+    n_rows, n_cols = values.shape
+    k = min(top_n, n_cols)
+    if k == 0:
+        return np.empty((n_rows, 0), dtype=np.int64)
+
+    keys = -values if largest else values.copy()
+    keys[np.isnan(keys)] = np.inf
+    candidates = np.argpartition(keys, k - 1, axis=1)[:, :k]
+    candidate_keys = np.take_along_axis(keys, candidates, axis=1)
+    order = np.argsort(candidate_keys, axis=1, kind='stable')
+    picked = np.take_along_axis(candidates, order, axis=1)
+    picked[np.isinf(np.take_along_axis(candidate_keys, order, axis=1))] = -1
+    return picked
+
+
+@instrument()
+def get_monthly_leaders(df, top_n=5):
+    """
+    Month-wise top gainers and losers as one long table.
+
+    Columns: Month ('YYYY-MM'), Type ('Gainers'/'Losers'), Rank, Symbol,
+    Monthly_Return. The whole month × symbol return matrix is computed in one
+    pass; months with fewer than two stocks are skipped.
+    """
+    columns = ['Month', 'Type', 'Rank', 'Symbol', 'Monthly_Return']
     if df.empty:
-        return {}
+        return pd.DataFrame(columns=columns)
+
+    matrix = as_price_matrix(df)
+    months, returns = matrix.monthly_returns()
+    keep = (~np.isnan(returns)).sum(axis=1) >= 2
+    months, returns = months[keep], returns[keep]
+
+    parts = []
+    for label, largest in (('Gainers', True), ('Losers', False)):
+        picked = _top_n_per_row(returns, top_n, largest=largest)
+        month_idx, rank = np.nonzero(picked >= 0)
+        sym_idx = picked[month_idx, rank]
+        parts.append(pd.DataFrame({
+            'Month': months.astype(str)[month_idx],
+            'Type': label,
+            'Rank': rank + 1,
+            'Symbol': matrix.symbols[sym_idx],
+            'Monthly_Return': returns[month_idx, sym_idx],
+        }))
+
+    return (
+        pd.concat(parts, ignore_index=True)
+        .sort_values(['Month', 'Type', 'Rank'], kind='stable')
+        .reset_index(drop=True)
+    )
 
-    df = df.copy()
-    df['Month_Year'] = df['Date'].dt.to_period('M').astype(str)
 
-    monthly_results = {}
-    for month, group in df.groupby('Month_Year'):
-        monthly_stocks = group.groupby('Symbol')['Close'].agg(['first', 'last']).reset_index()
-        if len(monthly_stocks) < 2:
-            continue
-        monthly_stocks['Monthly_Return'] = (
-            (monthly_stocks['last'] - monthly_stocks['first']) / monthly_stocks['first'] * 100
-        )
-
-        gainers = monthly_stocks.nlargest(top_n, 'Monthly_Return')[['Symbol', 'Monthly_Return']]
-        losers = monthly_stocks.nsmallest(top_n, 'Monthly_Return')[['Symbol', 'Monthly_Return']]
-        monthly_results[month] = {'gainers': gainers, 'losers': losers}
+def get_monthly_top_gainers_losers(df, top_n=5):
+    """Month-wise top gainers and losers, as {month: {'gainers': df, 'losers': df}}."""
+    leaders = get_monthly_leaders(df, top_n=top_n)
 
+    monthly_results = {}
+    for (month, kind), group in leaders.groupby(['Month', 'Type'], sort=True):
+        entry = monthly_results.setdefault(month, {})
+        entry[kind.lower()] = group[['Symbol', 'Monthly_Return']].reset_index(drop=True)
     return monthly_results
 
 
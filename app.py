@@ -4,12 +4,16 @@ import pandas as pd
 import plotly.express as px
 import plotly.graph_objects as go
 import numpy as np
-from sqlalchemy import create_engine, text
+from sqlalchemy import create_engine
 from urllib.parse import quote_plus
-from analysis import (load_stock_data, calculate_key_metrics, 
-                      calculate_volatility, calculate_cumulative_returns,
-                      get_sector_performance, calculate_correlation,
-                      get_monthly_top_gainers_losers)
+from metrics_provider import MetricsProvider
+from persistence import BackgroundWriter
+from metrics_cache import MetricsCache, data_fingerprint
+from shared_panel import SharedPanel
+from instrumentation import summary as stage_summary
+from downsample import downsample_series, downsample_ohlc, lttb_frame
+from rolling import (ROLLING_WINDOWS, MARKET, rolling_volatility,
+                     rolling_correlation_to, rolling_correlation_matrices)
 
 # 🚨 MYSQL DATABASE CONNECTION
 DB_CONFIG = {
@@ -27,98 +31,109 @@ engine = create_engine(connection_string, pool_pre_ping=True)
 
 st.set_page_config(page_title="Stock Performance Dashboard", layout="wide")
 
-@st.cache_data
-def load_and_analyze():
-    """Load data from CSV and analyze - FULLY INTEGRATED WITH ALL REQUIREMENTS"""
+@st.cache_resource
+def get_db_writer():
+    """One write-behind queue per server process; the page never waits on MySQL"""
+    return BackgroundWriter(engine)
+
+metrics_cache = MetricsCache()
+# Price and correlation matrices live in memory-mapped files shared by every worker process
+shared_panel = SharedPanel()
+
+def submit_to_db(name, value):
+    """Queue freshly computed data for the background writer (never blocks the page)"""
+    db_writer = get_db_writer()
+    if name == 'prices':
+        db_writer.submit_prices(value)
+    elif name in ('volatility', 'sector_perf'):
+        db_writer.submit_snapshot('sector_performance' if name == 'sector_perf' else name, value)
+
+@st.cache_resource
+def get_metrics_provider(fingerprint):
+    """One lazy provider per data version; artifacts are computed when a page first asks"""
+    provider = MetricsProvider(cache=metrics_cache, fingerprint=fingerprint, panel=shared_panel)
+    provider.on_computed(submit_to_db)
+    return provider
+
+provider = get_metrics_provider(data_fingerprint())
+
+def artifact(name, default=None):
+    """One metric artifact for the current page; errors are shown instead of crashing the page"""
     try:
-        print("🔄 Loading data...")
-        df = load_stock_data()
-        print(f"📊 Raw data shape: {df.shape}")
-        
-        if df.empty:
-            st.warning("❌ No data found in 'data/csv/' folder")
-            return pd.DataFrame(), {}, pd.DataFrame(), pd.DataFrame(), pd.DataFrame(), pd.DataFrame(), pd.DataFrame(), {}
-        
-        print(f"📊 Analyzing {len(df)} rows from {df['Symbol'].nunique()} stocks...")
-        
-        top_green, top_red, market_summary, yearly_returns = calculate_key_metrics(df)
-        volatility = calculate_volatility(df)
-        cum_returns_data, top_stocks = calculate_cumulative_returns(df)
-        sector_perf = get_sector_performance(df)
-        correlation = calculate_correlation(df)
-        monthly_analysis = get_monthly_top_gainers_losers(df, top_n=5)
-        
-        print(f"✅ Metrics calculated: {len(top_green)} green, {len(top_red)} red stocks")
-        print(f"📈 Volatility shape: {volatility.shape}")
-        print(f"📊 Cum returns shape: {cum_returns_data.shape}")
-        print(f"🏭 Sector perf: {len(sector_perf)} sectors")
-        print(f"🔗 Correlation: {correlation.shape}")
-        print(f"📅 Monthly: {len(monthly_analysis)} months")
-        
-        metrics = {
-            'top_green': top_green,
-            'top_red': top_red,
-            'market_summary': market_summary,
-            'sector_perf': sector_perf,
-            'correlation': correlation,
-            'volatility': volatility,
-            'cum_returns': cum_returns_data,
-            'monthly_analysis': monthly_analysis
-        }
-        
-        try:
-            df.to_sql('raw_stock_data', engine, if_exists='replace', index=False)
-            print("✅ Data saved to MySQL!")
-        except Exception as db_error:
-            print(f"⚠️ MySQL save failed: {db_error}")
-        
-        return df, metrics, volatility, cum_returns_data, sector_perf, correlation, pd.DataFrame(), monthly_analysis
-        
+        return provider.get(name)
     except Exception as e:
-        print(f"❌ CRITICAL ERROR in load_and_analyze: {e}")
-        st.error(f"❌ Error: {e}")
-        return pd.DataFrame(), {}, pd.DataFrame(), pd.DataFrame(), pd.DataFrame(), pd.DataFrame(), pd.DataFrame(), {}
+        print(f"❌ Failed to compute {name}: {e}")
+        st.error(f"❌ Error computing {name}: {e}")
+        return pd.DataFrame() if default is None else default
+
+@st.cache_data(max_entries=64, show_spinner=False)
+def comparison_series(fingerprint, symbols, start, end, n_points, chart_type):
+    """Chart-sized comparison data, cached per (symbols, range, resolution)"""
+    price_matrix = provider.get('price_matrix')
+    if chart_type == "Bar":
+        return downsample_ohlc(price_matrix, list(symbols), start, end, n_buckets=max(10, n_points // 4))
+    return downsample_series(price_matrix, list(symbols), start, end, n_points)
+
+@st.cache_data(max_entries=16, show_spinner=False)
+def cumulative_series(fingerprint, n_points):
+    """LTTB-reduced cumulative return paths of the top performers"""
+    cum = provider.get('cum_returns')
+    return lttb_frame(cum.index, cum.columns, cum.to_numpy(dtype=float), n_points, value_name='Cumulative_Return')
+
+@st.cache_data(max_entries=8, show_spinner=False)
+def rolling_volatility_frame(fingerprint, window):
+    """Rolling volatility of every symbol, cached per window"""
+    return rolling_volatility(provider.get('price_matrix'), window)
+
+@st.cache_data(max_entries=16, show_spinner=False)
+def rolling_correlation_frame(fingerprint, benchmark, window):
+    """Rolling correlation of every symbol to the benchmark, cached per (benchmark, window)"""
+    return rolling_correlation_to(provider.get('price_matrix'), benchmark, window)
+
+@st.cache_data(max_entries=8, show_spinner=False)
+def rolling_matrix_series(fingerprint, window, symbols):
+    """Weekly rolling correlation matrices for the heatmap symbols; the date slider only indexes into them"""
+    return rolling_correlation_matrices(provider.get('price_matrix'), window, step=5, symbols=list(symbols))
 
 # Initialize session state
 if 'db_connected' not in st.session_state:
     st.session_state.db_connected = False
 
-@st.cache_resource
-def test_db_connection():
-    try:
-        with engine.connect() as conn:
-            result = conn.execute(text("SELECT 1"))
-            st.session_state.db_connected = True
-            return "✅ Database Ready"
-    except Exception as e:
-        st.session_state.db_connected = False
-        print(f"❌ DB Connection error: {e}")
-        return "❌ Database Error"
+def db_status():
+    """Sidebar status from the background writer's counters (no DB round trip)"""
+    status = get_db_writer().status()
+    st.session_state.db_connected = bool(status['connected'])
+    if status['connected'] is None:
+        label = "⏳ Connecting to Database..."
+    elif status['connected']:
+        label = "✅ Database Ready"
+    else:
+        label = "❌ Database Error"
+    return label, status
 
-# Load data
-print("🚀 Starting main app load...")
-df, metrics, volatility, cum_returns, sector_perf_df, correlation, unused, monthly_analysis = load_and_analyze()
-print("✅ Main data load complete!")
+st.sidebar.title("🗄️ Status")
+db_label, db_stats = db_status()
+st.sidebar.info(db_label)
+st.sidebar.caption(f"Write queue: {db_stats['queue_depth']} pending, "
+                   f"lag {db_stats['lag_s']:.1f}s, {db_stats['written_rows']:,} rows written")
+if db_stats['last_error']:
+    st.sidebar.caption(f"Last DB error: {db_stats['last_error'][:120]}")
 
-# 5-TAB DASHBOARD
-tab1, tab2, tab3, tab4, tab5 = st.tabs(["📈 Overview", "🔍 Filters & Charts", "🏭 Sectors", "🔗 Advanced", "📅 Monthly"])
+debug_mode = st.sidebar.checkbox("🔍 Debug Mode")
 
-with tab1:
-    st.sidebar.title("🗄️ Status")
-    db_status = test_db_connection()
-    st.sidebar.info(db_status)
-    
-    if st.sidebar.checkbox("🔍 Debug Mode"):
-        st.sidebar.write("**Metrics keys:**", list(metrics.keys()))
-        st.sidebar.write("**Data shape:**", df.shape if not df.empty else "No data")
-    
+# 5-PAGE DASHBOARD - only the selected page runs, so only its metrics are computed
+PAGES = ["📈 Overview", "🔍 Filters & Charts", "🏭 Sectors", "🔗 Advanced", "📅 Monthly"]
+page = st.radio("Page", PAGES, horizontal=True, label_visibility="collapsed")
+
+if page == PAGES[0]:
     st.title("📈 Nifty 50 Stock Performance Dashboard")
     st.markdown("**✅ ALL 5 REQUIREMENTS IMPLEMENTED**")
     st.markdown("---")
     
     # MARKET SUMMARY CARDS
     col1, col2, col3, col4, col5 = st.columns(5)
-    market_summary = metrics.get('market_summary', {})
+    key_metrics = artifact('key_metrics', default={})
+    market_summary = key_metrics.get('market_summary', {})
     
     with col1:
         st.metric("Total Stocks", market_summary.get('total_stocks', 0))
@@ -138,7 +153,7 @@ with tab1:
     
     with col1:
         st.subheader("🚀 Top 10 Green Stocks")
-        top_green = metrics.get('top_green', pd.DataFrame())
+        top_green = key_metrics.get('top_green', pd.DataFrame())
         if not top_green.empty:
             top_green_display = top_green.copy()
             top_green_display['Yearly_Return_%'] = top_green_display['Yearly_Return'].apply(lambda x: f"{x:.2f}%")
@@ -146,19 +161,43 @@ with tab1:
     
     with col2:
         st.subheader("📉 Top 10 Red Stocks")
-        top_red = metrics.get('top_red', pd.DataFrame())
+        top_red = key_metrics.get('top_red', pd.DataFrame())
         if not top_red.empty:
             top_red_display = top_red.copy()
             top_red_display['Yearly_Return_%'] = top_red_display['Yearly_Return'].apply(lambda x: f"{x:.2f}%")
             st.dataframe(top_red_display[['Symbol', 'Yearly_Return_%']], use_container_width=True)
 
-with tab2:
+    # 📆 CUSTOM WINDOW - every stock re-ranked for any date range from prefix sums (no recompute)
+    st.subheader("📆 Top Movers in a Custom Window")
+    window_index = artifact('window_index')
+    if not window_index.empty:
+        first_day, last_day = (d.date() for d in window_index.date_range)
+        col1, col2 = st.columns([3, 1])
+        with col1:
+            window_range = st.slider("Window", min_value=first_day, max_value=last_day,
+                                     value=(first_day, last_day), format="YYYY-MM-DD")
+        with col2:
+            rank_by = st.selectbox("Rank By", ["Return_%", "Volatility", "Avg_Volume"])
+        window_columns = ['Symbol', 'Return_%', 'Volatility', 'Avg_Volume']
+        col1, col2 = st.columns(2)
+        with col1:
+            st.write(f"**🔝 Highest {rank_by}**")
+            st.dataframe(window_index.top(*window_range, n=10, by=rank_by)[window_columns].round(2),
+                         use_container_width=True, hide_index=True)
+        with col2:
+            st.write(f"**🔻 Lowest {rank_by}**")
+            st.dataframe(window_index.top(*window_range, n=10, by=rank_by, ascending=True)[window_columns].round(2),
+                         use_container_width=True, hide_index=True)
+
+elif page == PAGES[1]:
     st.subheader("🔍 **Interactive Controls**")
+    # Symbols and dates come from the (shared, memory-mapped) price matrix
+    price_matrix = artifact('price_matrix')
     
     col1, col2, col3 = st.columns(3)
     
     with col1:
-        all_stocks = sorted(df['Symbol'].unique()) if not df.empty else []
+        all_stocks = list(price_matrix.symbols) if not price_matrix.empty else []
         selected_stocks = st.multiselect(
             "Select Stocks", 
             options=all_stocks,
@@ -172,8 +211,20 @@ with tab2:
     with col3:
         chart_type = st.selectbox("Chart Type", ["Line", "Bar", "Area"])
     
+    col1, col2 = st.columns(2)
+    with col1:
+        date_range = st.date_input("Date Range",
+                                   (price_matrix.dates[0].date(), price_matrix.dates[-1].date())
+                                   if not price_matrix.empty else ())
+    with col2:
+        # Points per series sent to the browser; roughly one per horizontal pixel of the chart
+        resolution = st.select_slider("Chart Resolution (points per series)",
+                                      options=[250, 500, 1000, 2000, 4000], value=1000)
+    start_date, end_date = (date_range if len(date_range) == 2 else (None, None))
+    
     # ✅ FIXED VOLATILITY CHART - PROPER % LABELS
     st.subheader("⚡ Top 10 Most Volatile Stocks")
+    volatility = artifact('volatility')
     if not volatility.empty:
         top_10_vol = volatility.head(10)
         fig_vol = px.bar(top_10_vol, 
@@ -194,35 +245,40 @@ with tab2:
     
     # CUMULATIVE RETURNS (Line chart - no bar labels needed)
     st.subheader("📈 Cumulative Returns - Top 5 Performing Stocks")
+    cum_returns = artifact('cum_returns')
     if not cum_returns.empty:
-        fig_cumulative = px.line(cum_returns, 
-                               x=cum_returns.index, 
-                               y=cum_returns.columns,
+        cum_points = cumulative_series(provider.fingerprint, resolution)
+        fig_cumulative = px.line(cum_points, 
+                               x='Date', 
+                               y='Cumulative_Return',
+                               color='Symbol',
                                title="Cumulative Returns: Top 5 Performing Stocks",
-                               labels={'value': 'Cumulative Return (%)', 'variable': 'Stock'})
+                               labels={'Cumulative_Return': 'Cumulative Return (%)', 'Symbol': 'Stock'})
         fig_cumulative.update_layout(height=500)
         st.plotly_chart(fig_cumulative, use_container_width=True)
     
     # Interactive Stock Comparison
     st.subheader("📊 Interactive Stock Comparison")
-    if not df.empty and selected_stocks:
-        filtered_df = df[df['Symbol'].isin(selected_stocks)]
+    if not price_matrix.empty and selected_stocks:
+        # Downsampled server-side: LTTB for lines/areas, OHLC buckets for bars
+        filtered_df = comparison_series(provider.fingerprint, tuple(selected_stocks),
+                                        start_date, end_date, resolution, chart_type)
         if chart_type == "Line":
             fig_compare = px.line(filtered_df, x='Date', y='Close', color='Symbol',
                                 title=f"Price Evolution - {len(selected_stocks)} Stocks")
         elif chart_type == "Area":
             fig_compare = px.area(filtered_df, x='Date', y='Close', color='Symbol')
         else:
-            fig_compare = px.bar(filtered_df.groupby(['Symbol', 'Date'])['Close'].mean().reset_index(),
-                               x='Date', y='Close', color='Symbol')
+            fig_compare = px.bar(filtered_df, x='Date', y='Close', color='Symbol',
+                               hover_data=[c for c in ('Open', 'High', 'Low', 'Volume') if c in filtered_df.columns])
         fig_compare.update_layout(height=500)
         st.plotly_chart(fig_compare, use_container_width=True)
 
 # ✅ FIXED TAB3 - PERFECT SECTOR CHART
-with tab3:
+elif page == PAGES[2]:
     st.subheader("🏭 Sector-wise Performance Analysis")
     
-    sector_perf = metrics.get('sector_perf', pd.DataFrame())
+    sector_perf = artifact('sector_perf')
     if not sector_perf.empty:
         # ✅ FIXED: Perfect sector bar chart
         fig_sector = px.bar(sector_perf, 
@@ -256,16 +312,22 @@ with tab3:
         st.info("📊 Create **data/sectors.csv** with **Symbol,Sector** columns")
         st.code("Symbol,Sector\nRELIANCE,Energy\nTCS,IT\nHDFCBANK,Financials")
 
-with tab4:
+elif page == PAGES[3]:
     st.subheader("🔗 Stock Price Correlation Matrix")
     
-    correlation_matrix = metrics.get('correlation', pd.DataFrame())
+    correlation_matrix = artifact('correlation')
     if not correlation_matrix.empty:
-        n_stocks = st.slider("Matrix Size", 6, 15, 12)
-        corr_subset = correlation_matrix.iloc[:n_stocks, :n_stocks]
+        # The full-universe matrix is computed once; the heatmap is a slice of it
+        n_total = len(correlation_matrix.symbols)
+        n_stocks = st.slider("Matrix Size", min(6, n_total), min(50, n_total), min(12, n_total))
+        focus_stocks = st.multiselect("Focus Stocks (default: most connected)",
+                                      options=list(correlation_matrix.symbols))
+        heatmap_symbols = focus_stocks or correlation_matrix.most_connected(n_stocks)
+        corr_subset = correlation_matrix.to_frame(heatmap_symbols, decimals=2)
+        n_shown = len(corr_subset)
         
         fig_corr = px.imshow(corr_subset,
-                           title=f"Stock Price Correlation Heatmap ({n_stocks}x{n_stocks})",
+                           title=f"Stock Price Correlation Heatmap ({n_shown}x{n_shown} of {n_total} stocks)",
                            color_continuous_scale='RdBu_r',
                            color_continuous_midpoint=0)
         st.plotly_chart(fig_corr, use_container_width=True)
@@ -275,22 +337,101 @@ with tab4:
         with col1: st.metric("Avg Correlation", f"{corr_values.mean():.3f}")
         with col2: st.metric("Highest Correlation", f"{corr_values.max():.3f}")
         with col3: st.metric("Lowest Correlation", f"{corr_values.min():.3f}")
+        
+        col1, col2 = st.columns(2)
+        with col1:
+            st.markdown("**🔝 Most Correlated Pairs**")
+            st.dataframe(correlation_matrix.top_pairs(10, most=True).round(3), use_container_width=True)
+        with col2:
+            st.markdown("**🔻 Least Correlated Pairs**")
+            st.dataframe(correlation_matrix.top_pairs(10, most=False).round(3), use_container_width=True)
+    
+    price_matrix = artifact('price_matrix')
+    if not price_matrix.empty:
+        st.subheader("📉 Rolling Risk")
+        col1, col2 = st.columns(2)
+        with col1:
+            window = st.radio("Window (trading days)", ROLLING_WINDOWS, index=1, horizontal=True)
+        with col2:
+            benchmark = st.selectbox("Correlation Benchmark", [MARKET] + list(price_matrix.symbols))
+        
+        volatility_df = artifact('volatility')
+        default_rolling = volatility_df['Symbol'].head(5).tolist() if not volatility_df.empty else []
+        rolling_symbols = st.multiselect("Stocks", options=list(price_matrix.symbols), default=default_rolling)
+        
+        if rolling_symbols:
+            rolling_vol = rolling_volatility_frame(provider.fingerprint, window)[rolling_symbols].dropna(how='all')
+            fig_rvol = px.line(rolling_vol, title=f"{window}-Day Rolling Volatility (%)")
+            fig_rvol.update_layout(yaxis_title="Annualized Volatility %", legend_title="Symbol")
+            st.plotly_chart(fig_rvol, use_container_width=True)
+            
+            rolling_corr = rolling_correlation_frame(provider.fingerprint, benchmark, window)[rolling_symbols].dropna(how='all')
+            fig_rcorr = px.line(rolling_corr, title=f"{window}-Day Rolling Correlation vs {benchmark}")
+            fig_rcorr.update_layout(yaxis_title="Correlation", yaxis_range=[-1, 1], legend_title="Symbol")
+            st.plotly_chart(fig_rcorr, use_container_width=True)
+        
+        if not correlation_matrix.empty and len(heatmap_symbols) > 1:
+            # Only the heatmap's symbols, sampled weekly, keeps the N×N series small
+            roll_dates, roll_symbols, roll_values = rolling_matrix_series(
+                provider.fingerprint, window, tuple(heatmap_symbols))
+            if len(roll_dates) > 1:
+                pick = st.select_slider("Rolling Matrix Date", options=list(range(len(roll_dates))),
+                                        value=len(roll_dates) - 1,
+                                        format_func=lambda i: roll_dates[i].strftime('%Y-%m-%d'))
+                roll_frame = pd.DataFrame(roll_values[pick], index=roll_symbols, columns=roll_symbols).round(2)
+                fig_rmat = px.imshow(roll_frame,
+                                     title=f"{window}-Day Correlation on {roll_dates[pick]:%Y-%m-%d}",
+                                     color_continuous_scale='RdBu_r', zmin=-1, zmax=1)
+                st.plotly_chart(fig_rmat, use_container_width=True)
     
     st.subheader("📋 Raw Data Explorer")
-    if not df.empty:
-        st.dataframe(df, use_container_width=True)
+    price_index = artifact('price_index')
+    if not price_index.empty:
+        # Only the requested page is sliced out of the indexed frame and sent to the browser
+        col1, col2, col3 = st.columns(3)
+        with col1:
+            explorer_stocks = st.multiselect("Filter Stocks", options=list(price_index.symbols))
+        with col2:
+            explorer_range = st.date_input("Filter Dates", tuple(d.date() for d in price_index.date_range),
+                                           key="explorer_range")
+        with col3:
+            sort_columns = [c for c in price_index.df.columns if c != 'Symbol']
+            sort_by = st.selectbox("Sort By", ["Symbol"] + sort_columns)
+        
+        col1, col2, col3 = st.columns(3)
+        with col1:
+            descending = st.checkbox("Descending")
+        with col2:
+            page_size = st.selectbox("Rows per Page", [25, 50, 100, 500], index=2)
+        explorer_start, explorer_end = (explorer_range if len(explorer_range) == 2 else (None, None))
+        total_rows = price_index.count(explorer_stocks or None, explorer_start, explorer_end)
+        n_pages = max(1, -(-total_rows // page_size))
+        with col3:
+            page_number = st.number_input(f"Page (of {n_pages:,})", min_value=1, max_value=n_pages, value=1)
+        
+        page_df, total_rows = price_index.page(explorer_stocks or None, explorer_start, explorer_end,
+                                               page=page_number - 1, page_size=page_size,
+                                               sort_by=None if sort_by == "Symbol" else sort_by,
+                                               ascending=not descending)
+        first_row = (page_number - 1) * page_size
+        if total_rows:
+            st.caption(f"Rows {first_row + 1:,}–{first_row + len(page_df):,} of {total_rows:,} "
+                       f"(full table: {price_index.n_rows:,} rows)")
+        else:
+            st.caption(f"No rows match (full table: {price_index.n_rows:,} rows)")
+        st.dataframe(page_df, use_container_width=True)
 
-with tab5:
+elif page == PAGES[4]:
     st.subheader("📅 Monthly Top 5 Gainers & Losers")
     
-    monthly_analysis = metrics.get('monthly_analysis', {})
-    if monthly_analysis:
-        months = sorted(monthly_analysis.keys(), reverse=True)
+    monthly_analysis = artifact('monthly_analysis')
+    if not monthly_analysis.empty:
+        months = sorted(monthly_analysis['Month'].unique(), reverse=True)
         selected_month = st.selectbox("📋 Select Month", months)
         
-        month_data = monthly_analysis[selected_month]
-        gainers = month_data['gainers']
-        losers = month_data['losers']
+        month_data = monthly_analysis[monthly_analysis['Month'] == selected_month]
+        gainers = month_data[month_data['Type'] == 'Gainers']
+        losers = month_data[month_data['Type'] == 'Losers']
         
         col1, col2 = st.columns(2)
         
@@ -310,7 +451,7 @@ with tab5:
         
         # ✅ FIXED MONTHLY TREND CHART
         st.subheader("📊 Top Gainers Trend Across All Months")
-        all_gainers = pd.concat([data['gainers'] for data in monthly_analysis.values()])
+        all_gainers = monthly_analysis[monthly_analysis['Type'] == 'Gainers']
         if not all_gainers.empty:
             top_gainers_monthly = all_gainers.nlargest(10, 'Monthly_Return')
             fig_monthly = px.bar(top_gainers_monthly, 
@@ -325,6 +466,17 @@ with tab5:
             )
             st.plotly_chart(fig_monthly, use_container_width=True)
 
+if debug_mode:
+    st.sidebar.write("**Computed artifacts:**", provider.computed())
+    st.sidebar.write({name: f"{source} {seconds:.2f}s" for name, (source, seconds) in provider.timings.items()})
+    st.sidebar.write("**Shared panel:**", f"attached v{provider.panel_version()}" if provider.panel_version()
+                     else f"published v{shared_panel.current_version()}")
+    st.sidebar.write("**⏱️ Stage Timings:**")
+    st.sidebar.dataframe(stage_summary().round(3), use_container_width=True, hide_index=True)
+
 st.markdown("---")
 st.markdown("**✅ ALL BAR CHARTS FIXED**")
 st.caption("🚀 Stock Analysis Dashboard")
+
+# The current page is on screen; warm the other pages' metrics in the background
+provider.prefetch()
@@ -0,0 +1,345 @@
+# benchmark.py - Synthetic market data and scaling benchmarks for the analysis pipeline
+import argparse
+import json
+import os
+import shutil
+import sys
+import tempfile
+import time
+import tracemalloc
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+import yaml
+
+from analysis import (load_stock_data, calculate_key_metrics, calculate_volatility,
+                      calculate_cumulative_returns, get_sector_performance, get_monthly_leaders)
+from correlation import compute_correlation
+from extract_data import extract_yaml_to_csv
+from price_matrix import PriceMatrix
+from stock_analyzer import StockAnalyzer
+
+try:
+    from yaml import CSafeDumper as YamlDumper
+except ImportError:
+    from yaml import SafeDumper as YamlDumper
+
+# Same time of day as the bundled data ('2023-10-03 05:30:00')
+SESSION_TIME = pd.Timedelta(hours=5, minutes=30)
+SECTOR_NAMES = ['Financials', 'IT', 'Energy', 'Consumer', 'Healthcare', 'Metals',
+                'Automobile', 'Capital Goods', 'Services', 'Telecom', 'Materials', 'Utilities']
+
+
+def make_synthetic_prices(n_symbols, n_days, seed=0, missing_rate=0.0):
+    """Deterministic random-walk OHLCV frame sorted by (Symbol, Date)."""
+    rng = np.random.default_rng(seed)
+    dates = pd.bdate_range("2015-01-01", periods=n_days) + SESSION_TIME
+    symbols = np.array([f"SYM{i:05d}" for i in range(n_symbols)], dtype=object)
+
+    log_ret = rng.normal(0.0004, 0.02, size=(n_symbols, n_days))
+    close = 100 * np.exp(np.cumsum(log_ret, axis=1))
+    open_ = close * np.exp(rng.normal(0, 0.005, size=close.shape))
+    high = np.maximum(open_, close) * (1 + rng.uniform(0, 0.01, size=close.shape))
+    low = np.minimum(open_, close) * (1 - rng.uniform(0, 0.01, size=close.shape))
+    volume = rng.integers(10_000, 5_000_000, size=close.shape)
+
+    df = pd.DataFrame({
+        'Symbol': np.repeat(symbols, n_days),
+        'Date': np.tile(dates.to_numpy(), n_symbols),
+        'Open': open_.ravel(),
+        'High': high.ravel(),
+        'Low': low.ravel(),
+        'Close': close.ravel(),
+        'Volume': volume.ravel(),
+    })
+    if missing_rate > 0:
+        df = df[rng.random(len(df)) >= missing_rate].reset_index(drop=True)
+    return df
+
+
+def make_sector_map(symbols, n_sectors=12, seed=0):
+    """Deterministic Symbol → Sector assignment over n_sectors sectors."""
+    rng = np.random.default_rng(seed + 1)
+    names = [SECTOR_NAMES[i] if i < len(SECTOR_NAMES) else f"Sector {i + 1}" for i in range(n_sectors)]
+    return pd.DataFrame({'Symbol': list(symbols),
+                         'Sector': np.asarray(names, dtype=object)[rng.integers(0, n_sectors, len(symbols))]})
+
+
+def write_csv_dataset(df, csv_dir):
+    """One Symbol,Date,Open,High,Low,Close,Volume CSV per symbol, as extract_data writes them."""
+    Path(csv_dir).mkdir(parents=True, exist_ok=True)
+    out = df.assign(Date=df['Date'].dt.strftime('%Y-%m-%d %H:%M:%S'))
+    for symbol, symbol_df in out.groupby('Symbol', sort=False):
+        symbol_df.to_csv(os.path.join(csv_dir, f"{symbol}.csv"), index=False)
+
+
+def write_sectors_file(sectors, sectors_file):
+    with open(sectors_file, 'w') as f:
+        f.write("# sectors.csv\n")
+        sectors.to_csv(f, index=False)
+
+
+def write_yaml_dataset(df, yaml_dir):
+    """The raw input layout: yaml_dir/YYYY-MM/YYYY-MM-DD_HH-MM-SS.yaml, one list of records per day."""
+    for date, day in df.groupby('Date', sort=True):
+        month_dir = Path(yaml_dir) / date.strftime('%Y-%m')
+        month_dir.mkdir(parents=True, exist_ok=True)
+        stamp = date.strftime('%Y-%m-%d %H:%M:%S')
+        records = [
+            {'Ticker': symbol, 'close': float(close), 'date': stamp, 'high': float(high),
+             'low': float(low), 'month': date.strftime('%Y-%m'), 'open': float(open_), 'volume': int(volume)}
+            for symbol, open_, high, low, close, volume in zip(
+                day['Symbol'], day['Open'].round(2), day['High'].round(2), day['Low'].round(2),
+                day['Close'].round(2), day['Volume'])
+        ]
+        with open(month_dir / f"{date.strftime('%Y-%m-%d_%H-%M-%S')}.yaml", 'w') as f:
+            yaml.dump(records, f, Dumper=YamlDumper, sort_keys=True)
+
+
+def make_dataset(root, n_symbols, n_days, missing_rate=0.0, n_sectors=12, seed=0, formats=('yaml', 'csv')):
+    """
+    Write a synthetic dataset under root in the repo's layout (root/yaml,
+    root/csv, root/sectors.csv) and return the generated frame.
+    """
+    df = make_synthetic_prices(n_symbols, n_days, seed=seed, missing_rate=missing_rate)
+    df['Close'] = df['Close'].round(2)
+    if 'yaml' in formats:
+        write_yaml_dataset(df, Path(root) / "yaml")
+    if 'csv' in formats:
+        write_csv_dataset(df, Path(root) / "csv")
+    write_sectors_file(make_sector_map(pd.unique(df['Symbol']), n_sectors, seed), Path(root) / "sectors.csv")
+    return df
+
+
+def _legacy_volatility(df):
+    """Reference: the original per-symbol groupby loop."""
+    volatility_results = []
+    for symbol, group in df.groupby('Symbol', observed=True):
+        if len(group) > 1:
+            daily_ret = group['Close'].pct_change().dropna()
+            vol = daily_ret.std() * np.sqrt(252) * 100 if len(daily_ret) > 0 else 0
+            volatility_results.append({'Symbol': symbol, 'Volatility': vol})
+    return pd.DataFrame(volatility_results).sort_values('Volatility', ascending=False)
+
+
+def _legacy_cumulative_returns(df):
+    """Reference: the original per-symbol groupby loop."""
+    cum_data = []
+    for symbol, group in df.groupby('Symbol', observed=True):
+        if len(group) > 1:
+            daily_ret = group['Close'].pct_change().fillna(0)
+            cum_ret = (1 + daily_ret).cumprod() - 1
+            cum_data.append(pd.DataFrame({'Date': group['Date'], 'Symbol': symbol,
+                                          'Cumulative_Return': cum_ret}))
+    cum_df = pd.concat(cum_data, ignore_index=True)
+    pivot_cum = cum_df.pivot(index='Date', columns='Symbol', values='Cumulative_Return')
+    top_5 = pivot_cum.iloc[-1].dropna().nlargest(5).index.tolist()
+    return pivot_cum[top_5], top_5
+
+
+def _time(func, *args, repeat=3):
+    """Best-of-N wall time in seconds."""
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func(*args)
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def run_kernel_benchmark(sizes=(50, 500, 2000, 5000), n_days=252, legacy=True, missing_rate=0.02):
+    """Time volatility / cumulative-return kernels on the long frame and on a PriceMatrix."""
+    rows = []
+    for n_symbols in sizes:
+        df = make_synthetic_prices(n_symbols, n_days, missing_rate=missing_rate)
+        matrix = PriceMatrix.from_frame(df)
+        row = {
+            'symbols': n_symbols,
+            'rows': len(df),
+            'matrix_build_s': _time(PriceMatrix.from_frame, df),
+            'volatility_frame_s': _time(calculate_volatility, df),
+            'volatility_matrix_s': _time(calculate_volatility, matrix),
+            'cumulative_frame_s': _time(calculate_cumulative_returns, df),
+            'cumulative_matrix_s': _time(calculate_cumulative_returns, matrix),
+        }
+        if legacy:
+            row['volatility_legacy_s'] = _time(_legacy_volatility, df, repeat=1)
+            row['cumulative_legacy_s'] = _time(_legacy_cumulative_returns, df, repeat=1)
+        rows.append(row)
+        print(f"⏱️ {n_symbols:>6} symbols done")
+    return pd.DataFrame(rows)
+
+
+def _measure(func, *args, track_memory=True, **kwargs):
+    """Run func once; return (result, wall seconds, peak traced memory in MB or None)."""
+    if track_memory:
+        tracemalloc.start()
+    start = time.perf_counter()
+    try:
+        result = func(*args, **kwargs)
+        elapsed = time.perf_counter() - start
+        peak_mb = tracemalloc.get_traced_memory()[1] / 1e6 if track_memory else None
+    finally:
+        if track_memory:
+            tracemalloc.stop()
+    return result, elapsed, peak_mb
+
+
+def _quietly(func, *args, **kwargs):
+    """Call func with its progress prints (one line per file/symbol) silenced."""
+    stdout = sys.stdout
+    with open(os.devnull, 'w') as devnull:
+        sys.stdout = devnull
+        try:
+            return func(*args, **kwargs)
+        finally:
+            sys.stdout = stdout
+
+
+def run_pipeline_benchmark(n_symbols, n_days, missing_rate=0.02, n_sectors=12, seed=0,
+                           jobs=1, track_memory=True, workdir=None):
+    """
+    Time every pipeline stage on one synthetic dataset: YAML extraction, CSV
+    and store loading, the PriceMatrix build, each analysis, and the SQLite
+    StockAnalyzer load and queries. Returns one row per stage with seconds,
+    rows/sec and peak traced (tracemalloc) memory.
+    """
+    root = Path(workdir or tempfile.mkdtemp(prefix="stock_bench_"))
+    try:
+        df = make_dataset(root, n_symbols, n_days, missing_rate, n_sectors, seed, formats=('yaml',))
+        csv_dir, sectors_file = str(root / "csv"), str(root / "sectors.csv")
+        n_rows = len(df)
+        loaded = {}
+
+        def load_store():
+            loaded['df'] = load_stock_data(csv_dir)
+            return loaded['df']
+
+        def build_matrix():
+            loaded['matrix'] = PriceMatrix.from_frame(loaded['df'])
+            return loaded['matrix']
+
+        def analyzer_load():
+            # Start from an empty database so repeated runs measure a full load
+            for suffix in ("", "-wal", "-shm"):
+                Path(f"{root / 'stocks.db'}{suffix}").unlink(missing_ok=True)
+            loaded['analyzer'] = StockAnalyzer(csv_dir, str(root / "stocks.db"), pushdown=True, cache_size=0)
+            return loaded['analyzer']
+
+        stages = [
+            ('extract_yaml', lambda: extract_yaml_to_csv(str(root / "yaml"), csv_dir, jobs=jobs)),
+            ('load_csv', lambda: load_stock_data(csv_dir, use_store=False)),
+            ('load_store', load_store),
+            ('build_matrix', build_matrix),
+            ('key_metrics', lambda: calculate_key_metrics(loaded['matrix'])),
+            ('volatility', lambda: calculate_volatility(loaded['matrix'])),
+            ('cumulative_returns', lambda: calculate_cumulative_returns(loaded['matrix'])),
+            ('sector_performance', lambda: get_sector_performance(loaded['matrix'], sectors_file)),
+            ('correlation', lambda: compute_correlation(loaded['matrix'])),
+            ('monthly_leaders', lambda: get_monthly_leaders(loaded['matrix'])),
+            ('analyzer_load', analyzer_load),
+            ('analyzer_market_summary', lambda: loaded['analyzer'].market_summary()),
+            ('analyzer_top_green_red', lambda: loaded['analyzer'].get_top_green_red()),
+            ('analyzer_volatility_top', lambda: loaded['analyzer'].get_volatility_top()),
+        ]
+
+        rows = []
+        for stage, func in stages:
+            # Peak memory comes from a second, traced run so tracing overhead does not skew timings
+            _, seconds, _ = _measure(_quietly, func, track_memory=False)
+            peak_mb = _measure(_quietly, func)[2] if track_memory else None
+            rows.append({'symbols': n_symbols, 'days': n_days, 'rows': n_rows, 'stage': stage,
+                         'seconds': seconds, 'rows_per_sec': n_rows / seconds if seconds > 0 else np.nan,
+                         'peak_mb': peak_mb})
+            print(f"⏱️ {n_symbols:>6} x {n_days:<5} {stage:<24} {seconds:8.3f}s")
+        return pd.DataFrame(rows)
+    finally:
+        if workdir is None:
+            shutil.rmtree(root, ignore_errors=True)
+
+
+def run_pipeline_grid(grid, **kwargs):
+    """run_pipeline_benchmark over (n_symbols, n_days) pairs, concatenated."""
+    return pd.concat([run_pipeline_benchmark(n_symbols, n_days, **kwargs) for n_symbols, n_days in grid],
+                     ignore_index=True)
+
+
+def save_baseline(results, path):
+    records = results[['symbols', 'days', 'stage', 'seconds', 'peak_mb']].to_dict('records')
+    with open(path, 'w') as f:
+        json.dump({'created': time.strftime('%Y-%m-%d %H:%M:%S'), 'results': records}, f, indent=1)
+    print(f"💾 Baseline saved to {path}")
+
+
+def compare_to_baseline(results, path, tolerance=0.25, min_seconds=0.05):
+    """
+    Join results to a saved baseline on (symbols, days, stage). A stage
+    regresses when it is more than `tolerance` slower and at least
+    min_seconds slower (tiny stages are too noisy to judge by ratio alone).
+    """
+    with open(path) as f:
+        baseline = pd.DataFrame(json.load(f)['results'])
+    merged = results.merge(baseline, on=['symbols', 'days', 'stage'], suffixes=('', '_baseline'))
+    merged['ratio'] = merged['seconds'] / merged['seconds_baseline']
+    merged['regression'] = ((merged['ratio'] > 1 + tolerance)
+                            & (merged['seconds'] - merged['seconds_baseline'] > min_seconds))
+    return merged[['symbols', 'days', 'stage', 'seconds_baseline', 'seconds', 'ratio', 'regression']]
+
+
+def _parse_grid(text):
+    """'50x252,3000x1260' → [(50, 252), (3000, 1260)]"""
+    grid = []
+    for item in text.split(","):
+        if item:
+            n_symbols, n_days = item.lower().split("x")
+            grid.append((int(n_symbols), int(n_days)))
+    return grid
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the analysis pipeline across universe sizes.")
+    parser.add_argument("--suite", choices=["kernels", "pipeline"], default="kernels",
+                        help="kernels: volatility/cumulative kernels; pipeline: every stage end to end")
+    parser.add_argument("--sizes", default="50,500,2000,5000", help="Comma separated symbol counts (kernels)")
+    parser.add_argument("--days", type=int, default=252, help="Trading days per symbol (kernels)")
+    parser.add_argument("--no-legacy", action="store_true", help="Skip the original groupby-loop reference")
+    parser.add_argument("--grid", default="50x252,500x504,3000x1260",
+                        help="Comma separated SYMBOLSxDAYS sizes (pipeline)")
+    parser.add_argument("--missing-rate", type=float, default=0.02, help="Fraction of symbol-days dropped")
+    parser.add_argument("--sectors", type=int, default=12, help="Number of synthetic sectors")
+    parser.add_argument("--seed", type=int, default=0, help="Random seed for the synthetic data")
+    parser.add_argument("--jobs", type=int, default=1, help="YAML parsing processes for the extract stage")
+    parser.add_argument("--no-memory", action="store_true", help="Skip tracemalloc peak memory tracking")
+    parser.add_argument("--output", default=None, help="Write the results table to this CSV")
+    parser.add_argument("--save-baseline", default=None, help="Store the results as a JSON baseline")
+    parser.add_argument("--baseline", default=None, help="Compare against this JSON baseline")
+    parser.add_argument("--tolerance", type=float, default=0.25, help="Allowed slowdown before flagging")
+    return parser.parse_args(argv)
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    if args.suite == "kernels":
+        sizes = [int(s) for s in args.sizes.split(",") if s]
+        results = run_kernel_benchmark(sizes, n_days=args.days, legacy=not args.no_legacy,
+                                       missing_rate=args.missing_rate)
+    else:
+        results = run_pipeline_grid(_parse_grid(args.grid), missing_rate=args.missing_rate,
+                                    n_sectors=args.sectors, seed=args.seed, jobs=args.jobs,
+                                    track_memory=not args.no_memory)
+
+    with pd.option_context('display.width', 200, 'display.max_columns', 20, 'display.max_rows', 500):
+        print(results.round(4).to_string(index=False))
+    if args.output:
+        results.to_csv(args.output, index=False)
+    if args.save_baseline and args.suite == "pipeline":
+        save_baseline(results, args.save_baseline)
+    if args.baseline and args.suite == "pipeline":
+        comparison = compare_to_baseline(results, args.baseline, tolerance=args.tolerance)
+        regressions = comparison[comparison['regression']]
+        print(comparison.round(3).to_string(index=False))
+        if len(regressions):
+            print(f"❌ {len(regressions)} stage(s) slower than baseline by more than {args.tolerance:.0%}")
+            sys.exit(1)
+        print("✅ No regressions against baseline")
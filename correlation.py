@@ -0,0 +1,124 @@
+# correlation.py - Full-universe return correlation engine
+import numpy as np
+import pandas as pd
+
+from instrumentation import instrument
+from price_matrix import as_price_matrix
+
+
+class CorrelationMatrix:
+    """
+    N × N daily-return correlation for the whole universe, stored as float32.
+
+    Slicing (sub-blocks, top/bottom pairs, most connected symbols) works on
+    the stored matrix and never recomputes it.
+    """
+
+    def __init__(self, symbols, values, pair_counts=None):
+        self.symbols = np.asarray(symbols, dtype=object)
+        self.values = np.asarray(values, dtype=np.float32)
+        self.pair_counts = pair_counts
+        self.symbol_index = {s: i for i, s in enumerate(self.symbols)}
+
+    @property
+    def empty(self):
+        return len(self.symbols) < 2
+
+    @property
+    def shape(self):
+        return self.values.shape
+
+    def _positions(self, symbols):
+        return np.array([self.symbol_index[s] for s in symbols if s in self.symbol_index], dtype=np.int64)
+
+    def sub_block(self, symbols):
+        """float32 sub-matrix for the given symbols (in the given order)."""
+        pos = self._positions(symbols)
+        return self.values[np.ix_(pos, pos)]
+
+    def to_frame(self, symbols=None, decimals=None):
+        """Symbol × Symbol DataFrame for all or some symbols."""
+        if symbols is None:
+            symbols, values = self.symbols, self.values
+        else:
+            symbols = self.symbols[self._positions(symbols)]
+            values = self.sub_block(symbols)
+        frame = pd.DataFrame(values.astype(np.float64), index=symbols, columns=symbols)
+        frame.index.name = frame.columns.name = 'Symbol'
+        return frame.round(decimals) if decimals is not None else frame
+
+    def top_pairs(self, k=10, most=True):
+        """The k most (or least) correlated distinct pairs as Symbol_1, Symbol_2, Correlation."""
+        rows, cols = np.triu_indices(len(self.symbols), k=1)
+        values = self.values[rows, cols]
+        keep = ~np.isnan(values)
+        rows, cols, values = rows[keep], cols[keep], values[keep]
+        k = min(k, len(values))
+        if k == 0:
+            return pd.DataFrame(columns=['Symbol_1', 'Symbol_2', 'Correlation'])
+
+        keys = -values if most else values
+        picked = np.argpartition(keys, k - 1)[:k]
+        picked = picked[np.argsort(keys[picked], kind='stable')]
+        return pd.DataFrame({
+            'Symbol_1': self.symbols[rows[picked]],
+            'Symbol_2': self.symbols[cols[picked]],
+            'Correlation': values[picked].astype(np.float64),
+        })
+
+    def most_connected(self, n=12):
+        """The n symbols with the highest mean absolute correlation to the rest."""
+        strength = np.abs(self.values.astype(np.float64))
+        np.fill_diagonal(strength, np.nan)
+        with np.errstate(invalid='ignore'):
+            mean_strength = np.nanmean(strength, axis=1) if len(self.symbols) > 1 else np.zeros(len(self.symbols))
+        order = np.argsort(-np.nan_to_num(mean_strength, nan=-1.0), kind='stable')
+        return list(self.symbols[order[:n]])
+
+
+@instrument()
+def compute_correlation(data, min_periods=2):
+    """
+    Pairwise-complete Pearson correlation of daily returns for every symbol.
+
+    Returns are standardized per symbol, then the pairwise sums are four
+    matrix products over the (dates × symbols) array; with no missing days it
+    is a single product Zᵀ Z. Pairs with fewer than min_periods common days
+    are NaN. data may be a long price frame or a PriceMatrix.
+    """
+    matrix = as_price_matrix(data)
+    returns = matrix.daily_returns()
+    # Days where nothing has a return (e.g. the first day) carry no information
+    returns = returns[~np.isnan(returns).all(axis=1)]
+    valid = ~np.isnan(returns)
+    counts = valid.sum(axis=0)
+
+    mean = np.nansum(returns, axis=0) / np.maximum(counts, 1)
+    centred = np.where(valid, returns - mean, 0.0)
+    std = np.sqrt((centred * centred).sum(axis=0) / np.maximum(counts - 1, 1))
+    std[std == 0] = np.nan
+    z = centred / std
+    z[np.isnan(z)] = 0.0
+
+    if valid.all():
+        # Complete data: correlation is just the scaled Gram matrix
+        n_obs = np.full((matrix.n_symbols, matrix.n_symbols), float(len(returns)))
+        corr = (z.T @ z) / max(len(returns) - 1, 1)
+    else:
+        v = valid.astype(np.float64)
+        n_obs = v.T @ v
+        sums = z.T @ v                       # Σ z_i over days where j is present
+        sq_sums = (z * z).T @ v
+        cross = z.T @ z
+        safe_n = np.maximum(n_obs, 1)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            var = sq_sums - sums * sums / safe_n
+            corr = (cross - sums * sums.T / safe_n) / np.sqrt(var * var.T)
+
+    corr[n_obs < min_periods] = np.nan
+    flat = np.isnan(std)
+    corr[flat, :] = np.nan
+    corr[:, flat] = np.nan
+    np.clip(corr, -1.0, 1.0, out=corr)
+    np.fill_diagonal(corr, np.where((counts >= min_periods) & ~flat, 1.0, np.nan))
+    return CorrelationMatrix(matrix.symbols, corr, pair_counts=n_obs.astype(np.int32))
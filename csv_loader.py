@@ -0,0 +1,162 @@
+# csv_loader.py - Concurrent reader for a folder of per-symbol CSV files
+import os
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from instrumentation import stage
+from price_schema import PRICE_FIELDS
+
+DATE_FORMAT = "%Y-%m-%d %H:%M:%S"
+VALUE_COLUMNS = PRICE_FIELDS + ('Volume',)
+REQUIRED_COLUMNS = ('Date', 'Close')
+# Files with these outcomes contribute rows; the rest are reported and skipped
+LOADED = ('ok', 'no_volume', 'partial')
+
+
+def csv_engine():
+    """pyarrow's multithreaded parser when it is installed, pandas' C parser otherwise."""
+    try:
+        import pyarrow  # noqa: F401
+        return 'pyarrow'
+    except ImportError:
+        return 'c'
+
+
+def _read_one(path, price_dtype, engine):
+    """Parse one file; returns (frame or None, outcome dict)."""
+    outcome = {'Symbol': path.stem, 'File': path.name, 'Status': 'ok', 'Rows': 0, 'Detail': ''}
+    dtypes = {column: price_dtype for column in PRICE_FIELDS}
+    dtypes.update({'Volume': np.float64, 'Date': str})
+    try:
+        df = pd.read_csv(path, dtype=dtypes, engine=engine)
+    except Exception as e:
+        outcome.update(Status='error', Detail=str(e))
+        return None, outcome
+
+    missing = [column for column in REQUIRED_COLUMNS if column not in df.columns]
+    if missing:
+        outcome.update(Status='rejected', Detail=f"missing {', '.join(missing)}")
+        return None, outcome
+    if df.empty:
+        outcome.update(Status='empty')
+        return None, outcome
+    if 'Volume' not in df.columns:
+        outcome.update(Status='no_volume', Detail="no Volume column, volume left empty")
+
+    try:
+        dates = _parse_dates(df['Date'])
+    except Exception as e:
+        outcome.update(Status='error', Detail=f"Date: {e}")
+        return None, outcome
+    bad = dates.isna().to_numpy()
+    if bad.all():
+        outcome.update(Status='error', Detail="no readable Date")
+        return None, outcome
+    if bad.any():
+        # Rows whose Date cannot be read are dropped and counted
+        detail = f"{int(bad.sum())} row(s) with an unreadable Date dropped"
+        outcome.update(Status='partial', Detail=f"{outcome['Detail']}; {detail}" if outcome['Detail'] else detail)
+        df, dates = df[~bad], dates[~bad]
+    df = df.assign(Date=dates.to_numpy(dtype='datetime64[ns]'))
+    outcome['Rows'] = len(df)
+    return df, outcome
+
+
+def _parse_dates(values):
+    """
+    Parse with the fixed format; only values that do not match it fall back to
+    ISO 8601. Values with a UTC offset are converted to UTC and the offset is
+    dropped, so one file may mix offsets and naive timestamps.
+    """
+    dates = pd.to_datetime(values, format=DATE_FORMAT, errors='coerce')
+    retry = dates.isna() & pd.notna(values)
+    if retry.any():
+        iso = pd.to_datetime(values[retry], format='ISO8601', utc=True, errors='coerce')
+        dates[retry] = iso.dt.tz_convert(None)
+    return dates
+
+
+def load_csv_dir(csv_dir, symbols=None, columns=None, price_dtype=np.float64, workers=None):
+    """
+    Read every <SYMBOL>.csv in csv_dir on a thread pool into one frame sorted
+    by (Symbol, Date), plus a per-file outcome table.
+
+    Columns are parsed with declared dtypes and each file's dates with
+    DATE_FORMAT (ISO 8601 fallback, UTC offsets normalised to naive UTC).
+    The files are copied once into preallocated column arrays, and Symbol is
+    built as a categorical straight from the file boundaries. Files without
+    Date or Close are rejected, and a missing Volume stays NaN; every such
+    case is listed in the outcomes (Symbol, File, Status, Rows, Detail)
+    instead of being patched over.
+    """
+    paths = sorted(Path(csv_dir).glob("*.csv"), key=lambda p: p.stem)
+    if symbols is not None:
+        wanted_symbols = set(symbols)
+        paths = [p for p in paths if p.stem in wanted_symbols]
+    engine = csv_engine()
+    workers = workers or min(32, (os.cpu_count() or 1) + 4)
+
+    with stage("load.read_csv") as record:
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            results = list(pool.map(lambda path: _read_one(path, price_dtype, engine), paths))
+        record['rows'] = sum(outcome['Rows'] for _, outcome in results)
+
+    outcomes = [outcome for _, outcome in results]
+    loaded = [(df, outcome) for df, outcome in results if df is not None]
+    if not loaded:
+        return pd.DataFrame(), pd.DataFrame(outcomes, columns=['Symbol', 'File', 'Status', 'Rows', 'Detail'])
+
+    with stage("load.assemble") as record:
+        value_columns = [c for c in VALUE_COLUMNS
+                         if (columns is None or c in columns) and any(c in df.columns for df, _ in loaded)]
+        counts = np.array([len(df) for df, _ in loaded], dtype=np.int64)
+        offsets = np.concatenate([[0], np.cumsum(counts)])
+        total = int(offsets[-1])
+
+        stamps = np.empty(total, dtype='datetime64[ns]')
+        values = {c: np.full(total, np.nan, dtype=np.float64 if c == 'Volume' else price_dtype)
+                  for c in value_columns}
+        for i, (df, _) in enumerate(loaded):
+            lo, hi = offsets[i], offsets[i + 1]
+            stamps[lo:hi] = df['Date'].to_numpy()
+            for column in value_columns:
+                if column in df.columns:
+                    values[column][lo:hi] = df[column].to_numpy()
+        codes = np.repeat(np.arange(len(loaded)), counts)
+
+        ticks = stamps.view(np.int64)
+        in_order = (codes[1:] != codes[:-1]) | (ticks[1:] >= ticks[:-1])
+        if not in_order.all():
+            order = np.lexsort((ticks, codes))
+            codes, stamps = codes[order], stamps[order]
+            values = {c: v[order] for c, v in values.items()}
+
+        volume = values.get('Volume')
+        if volume is not None and not np.isnan(volume).any() and np.array_equal(volume, np.floor(volume)):
+            values['Volume'] = volume.astype(np.int64)
+
+        symbol_names = pd.Index([outcome['Symbol'] for _, outcome in loaded], dtype=object)
+        data = {'Symbol': pd.Categorical.from_codes(codes, categories=symbol_names),
+                'Date': stamps}
+        data.update(values)
+        result = pd.DataFrame(data, copy=False)
+        record['rows'] = len(result)
+
+    return result, pd.DataFrame(outcomes, columns=['Symbol', 'File', 'Status', 'Rows', 'Detail'])
+
+
+def print_outcomes(outcomes, limit=10):
+    """One summary line, plus a line per file that was not loaded cleanly."""
+    if outcomes.empty:
+        return
+    loaded = outcomes['Status'].isin(LOADED)
+    print(f"✅ Read {int(loaded.sum())} of {len(outcomes)} CSV files ({int(outcomes.loc[loaded, 'Rows'].sum())} rows)")
+    issues = outcomes[outcomes['Status'] != 'ok']
+    for row in issues.head(limit).itertuples():
+        icon = "⚠️" if row.Status in LOADED else "❌"
+        print(f"{icon} {row.File}: {row.Status}{' - ' + row.Detail if row.Detail else ''}")
+    if len(issues) > limit:
+        print(f"⚠️ ... and {len(issues) - limit} more file(s) with issues")
@@ -5,6 +5,7 @@
 from sqlalchemy import create_engine, text
 from sqlalchemy.exc import SQLAlchemyError
 from urllib.parse import quote_plus
+from db_schema import SCHEMA
 
 # 🚨 UPDATE ONLY THIS LINE WITH YOUR MySQL WORKBENCH PASSWORD 🚨
 MYSQL_PASSWORD = ""  # ← PUT YOUR PASSWORD HERE (empty if no password)
@@ -43,30 +44,9 @@ def setup_database():
         # Step 2: Connect to our database
         engine = create_engine(db_url, echo=False, pool_pre_ping=True)
         with engine.connect() as conn:
-            # Create tables
-            conn.execute(text("""
-                CREATE TABLE IF NOT EXISTS stocks (
-                    id INT AUTO_INCREMENT PRIMARY KEY,
-                    symbol VARCHAR(10) UNIQUE NOT NULL,
-                    company_name VARCHAR(255),
-                    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-                )
-            """))
-            
-            conn.execute(text("""
-                CREATE TABLE IF NOT EXISTS stock_prices (
-                    id INT AUTO_INCREMENT PRIMARY KEY,
-                    symbol VARCHAR(10),
-                    date DATE,
-                    open_price DECIMAL(10,4),
-                    high_price DECIMAL(10,4),
-                    low_price DECIMAL(10,4),
-                    close_price DECIMAL(10,4),
-                    volume BIGINT,
-                    FOREIGN KEY (symbol) REFERENCES stocks(symbol),
-                    UNIQUE KEY unique_symbol_date (symbol, date)
-                )
-            """))
+            # Create tables (same DDL the background price writer uses)
+            for statement in SCHEMA['mysql']:
+                conn.execute(text(statement))
             
             # Test data
             conn.execute(text("INSERT IGNORE INTO stocks (symbol, company_name) VALUES ('AAPL', 'Apple Inc'), ('GOOGL', 'Google')"))
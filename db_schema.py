@@ -0,0 +1,52 @@
+# db_schema.py - DDL for the stocks / stock_prices tables, shared by database.py and persistence.py
+
+# MySQL is the production database; the SQLite variant is for local runs and testing
+SCHEMA = {
+    'mysql': [
+        """
+        CREATE TABLE IF NOT EXISTS stocks (
+            id INT AUTO_INCREMENT PRIMARY KEY,
+            symbol VARCHAR(10) UNIQUE NOT NULL,
+            company_name VARCHAR(255),
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+        """,
+        """
+        CREATE TABLE IF NOT EXISTS stock_prices (
+            id INT AUTO_INCREMENT PRIMARY KEY,
+            symbol VARCHAR(10),
+            date DATE,
+            open_price DECIMAL(10,4),
+            high_price DECIMAL(10,4),
+            low_price DECIMAL(10,4),
+            close_price DECIMAL(10,4),
+            volume BIGINT,
+            FOREIGN KEY (symbol) REFERENCES stocks(symbol),
+            UNIQUE KEY unique_symbol_date (symbol, date)
+        )
+        """,
+    ],
+    'sqlite': [
+        """
+        CREATE TABLE IF NOT EXISTS stocks (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            symbol VARCHAR(10) UNIQUE NOT NULL,
+            company_name VARCHAR(255),
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+        """,
+        """
+        CREATE TABLE IF NOT EXISTS stock_prices (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            symbol VARCHAR(10) REFERENCES stocks(symbol),
+            date DATE,
+            open_price DECIMAL(10,4),
+            high_price DECIMAL(10,4),
+            low_price DECIMAL(10,4),
+            close_price DECIMAL(10,4),
+            volume BIGINT,
+            UNIQUE (symbol, date)
+        )
+        """,
+    ],
+}
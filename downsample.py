@@ -0,0 +1,151 @@
+# downsample.py - Chart-sized views of long price series (LTTB lines, OHLC buckets for bars)
+import numpy as np
+import pandas as pd
+
+from price_matrix import PriceMatrix, as_price_matrix
+
+DEFAULT_POINTS = 1000
+
+
+def lttb_indices(x, values, n_out):
+    """
+    Largest-Triangle-Three-Buckets for many series sharing one x axis.
+
+    values is (n, m): m series of n points, NaN where a series has no point.
+    Returns an (n_out, m) array of selected row indices, -1 where a series
+    has nothing to pick. Each series keeps its first and last valid point;
+    the rows in between are split into n_out - 2 equal buckets and each
+    bucket keeps the point forming the largest triangle with the previously
+    kept point and the next bucket's average. The loop runs over buckets;
+    every series is handled in the same array operation.
+    """
+    n, m = values.shape
+    valid = ~np.isnan(values)
+    cols = np.arange(m)
+    rows = np.arange(n)
+
+    has_any = valid.any(axis=0)
+    first = np.where(has_any, valid.argmax(axis=0), -1)
+    last = np.where(has_any, n - 1 - valid[::-1].argmax(axis=0), -1)
+
+    selected = np.full((n_out, m), -1, dtype=np.int64)
+    if n <= n_out:
+        selected[:n] = np.where(valid, rows[:, None], -1)
+        return selected
+
+    every = (n - 2) / (n_out - 2)
+    edges = (np.arange(n_out - 1) * every).astype(np.int64) + 1
+    edges[-1] = n - 1
+    filled = np.where(valid, values, 0.0)
+    counts = np.add.reduceat(valid.astype(np.float64), edges[:-1], axis=0)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        avg_y = np.add.reduceat(filled, edges[:-1], axis=0) / counts
+        avg_x = np.add.reduceat(valid * x[:, None], edges[:-1], axis=0) / counts
+
+    last_x = x[np.maximum(last, 0)]
+    last_y = values[np.maximum(last, 0), cols]
+    prev = np.maximum(first, 0)
+    selected[0] = first
+
+    for bucket in range(n_out - 2):
+        lo, hi = edges[bucket], edges[bucket + 1]
+        if bucket + 1 < n_out - 2:
+            cx, cy = avg_x[bucket + 1], avg_y[bucket + 1]
+            # A series with nothing in the next bucket aims at its last point instead
+            missing = np.isnan(cy)
+            cx, cy = np.where(missing, last_x, cx), np.where(missing, last_y, cy)
+        else:
+            cx, cy = last_x, last_y
+
+        ax, ay = x[prev], values[prev, cols]
+        bx, by = x[lo:hi, None], values[lo:hi]
+        area = np.abs((ax - cx) * (by - ay) - (ax - bx) * (cy - ay))
+        area[~valid[lo:hi]] = -1.0
+        pick = lo + area.argmax(axis=0)
+        ok = valid[lo:hi].any(axis=0)
+        selected[bucket + 1] = np.where(ok, pick, -1)
+        prev = np.where(ok, pick, prev)
+
+    selected[-1] = last
+    return selected
+
+
+def lttb_frame(dates, symbols, values, n_out, value_name='Value'):
+    """Downsample a Date × Symbol array with LTTB into a long (Date, Symbol, value) frame."""
+    dates = pd.DatetimeIndex(dates)
+    x = dates.asi8.astype(np.float64)
+    selected = lttb_indices(x, np.asarray(values, dtype=np.float64), n_out)
+
+    row_idx, col_idx = [], []
+    for col in range(selected.shape[1]):
+        picked = np.unique(selected[:, col][selected[:, col] >= 0])
+        row_idx.append(picked)
+        col_idx.append(np.full(len(picked), col))
+    row_idx = np.concatenate(row_idx) if row_idx else np.empty(0, dtype=np.int64)
+    col_idx = np.concatenate(col_idx) if col_idx else np.empty(0, dtype=np.int64)
+
+    return pd.DataFrame({
+        'Date': dates[row_idx],
+        'Symbol': np.asarray(symbols, dtype=object)[col_idx],
+        value_name: np.asarray(values)[row_idx, col_idx],
+    })
+
+
+def _before_end(dates, end):
+    """Mask of dates at or before end; a date-only end covers that whole day."""
+    end = pd.Timestamp(end)
+    if end == end.normalize():
+        return dates < end + pd.Timedelta(days=1)
+    return dates <= end
+
+
+def _date_rows(dates, start, end):
+    lo = 0 if start is None else dates.searchsorted(pd.Timestamp(start), side='left')
+    hi = len(dates) if end is None else int(np.count_nonzero(_before_end(dates, end)))
+    return slice(lo, hi)
+
+
+def downsample_series(data, symbols, start=None, end=None, n_points=DEFAULT_POINTS, field='Close'):
+    """
+    One price field for the given symbols between start and end, reduced to
+    at most n_points per symbol with LTTB. Returns a long Date, Symbol, field frame.
+    """
+    matrix = as_price_matrix(data).select(symbols)
+    rows = _date_rows(matrix.dates, start, end)
+    return lttb_frame(matrix.dates[rows], matrix.symbols, matrix[field][rows], n_points, value_name=field)
+
+
+def downsample_ohlc(data, symbols, start=None, end=None, n_buckets=DEFAULT_POINTS // 4):
+    """
+    OHLCV bars for the given symbols aggregated into at most n_buckets equal
+    time buckets over [start, end]: first Open, max High, min Low, last
+    Close, summed Volume. Date is each bucket's first trading day. data may
+    be a long frame or a PriceMatrix; only the requested rows are taken from
+    a matrix.
+    """
+    if isinstance(data, PriceMatrix):
+        matrix = data.select(symbols)
+        rows = _date_rows(matrix.dates, start, end)
+        data = PriceMatrix(matrix.symbols, matrix.dates[rows],
+                           {name: values[rows] for name, values in matrix.fields.items()},
+                           matrix.mask[rows]).to_frame()
+    part = data[data['Symbol'].isin(symbols)]
+    if start is not None:
+        part = part[part['Date'] >= pd.Timestamp(start)]
+    if end is not None:
+        part = part[_before_end(part['Date'], end)]
+    if part.empty:
+        return part
+
+    part = part.sort_values(['Symbol', 'Date'])
+    stamps = part['Date'].to_numpy(dtype='datetime64[ns]').astype(np.int64)
+    edges = np.linspace(stamps.min(), stamps.max() + 1, n_buckets + 1)
+    bucket = np.searchsorted(edges, stamps, side='right') - 1
+
+    agg = {'Date': ('Date', 'first'), 'Close': ('Close', 'last')}
+    for column, how in (('Open', 'first'), ('High', 'max'), ('Low', 'min'), ('Volume', 'sum')):
+        if column in part.columns:
+            agg[column] = (column, how)
+    bars = part.groupby([part['Symbol'], pd.Series(bucket, index=part.index, name='Bucket')],
+                        sort=True, observed=True).agg(**agg)
+    return bars.reset_index().drop(columns='Bucket')
@@ -2,102 +2,303 @@
 import pandas as pd
 import numpy as np
 import os
+import sys
+import json
+import hashlib
+import argparse
 from pathlib import Path
-from analysis import (load_stock_data, calculate_key_metrics, calculate_volatility, 
-                     calculate_cumulative_returns, get_sector_performance, 
-                     get_monthly_top_gainers_losers)
-
-print("🚀 POWER BI EXPORT STARTED...")
-print("=" * 50)
-
-# ✅ AUTO-CREATE powerbi FOLDER
-powerbi_dir = Path("powerbi")
-powerbi_dir.mkdir(exist_ok=True)
-print(f"✅ Created folder: {powerbi_dir.absolute()}")
-
-try:
-    # Load & analyze ALL data
-    print("📊 Loading stock data...")
-    df = load_stock_data()
-    if df.empty:
-        print("❌ No stock data found! Create data/csv/*.csv files")
-        exit(1)
-    
-    print(f"✅ Loaded {len(df)} rows, {df['Symbol'].nunique()} stocks")
-    
-    # Calculate ALL metrics
-    print("🔬 Calculating metrics...")
-    green, red, summary, yearly = calculate_key_metrics(df)
-    volatility = calculate_volatility(df)
-    cum_returns, top5 = calculate_cumulative_returns(df)
-    sector_perf = get_sector_performance(df)
-    monthly = get_monthly_top_gainers_losers(df)
-    
-    print("✅ All metrics calculated!")
-    
-    # EXPORT 7 POWER BI-READY FILES
-    print("\n📁 EXPORTING FILES...")
-    
-    # 1. RAW DATA
-    df.to_csv(powerbi_dir / 'raw_stock_data.csv', index=False)
-    print("✅ 1. raw_stock_data.csv")
-    
-    # 2. KEY METRICS
-    metrics_df = pd.DataFrame([summary])
-    metrics_df.to_csv(powerbi_dir / 'key_metrics.csv', index=False)
-    green.to_csv(powerbi_dir / 'top_green.csv', index=False)
-    red.to_csv(powerbi_dir / 'top_red.csv', index=False)
-    print("✅ 2. key_metrics.csv, top_green.csv, top_red.csv")
-    
-    # 3. VOLATILITY
-    volatility.to_csv(powerbi_dir / 'volatility.csv', index=False)
-    print("✅ 3. volatility.csv")
-    
-    # 4. SECTOR PERFORMANCE
-    sector_perf.to_csv(powerbi_dir / 'sector_performance.csv', index=False)
-    print("✅ 4. sector_performance.csv")
-    
-    # 5. CUMULATIVE RETURNS (Top 5 stocks only)
-    cum_returns.to_csv(powerbi_dir / 'cumulative_returns.csv', index=True)
-    print("✅ 5. cumulative_returns.csv")
-    
-    # 6. MONTHLY ANALYSIS (Flattened)
-    monthly_flat = []
-    for month, data in monthly.items():
-        gainers = data['gainers'].copy()
-        gainers['Month'] = month
-        gainers['Type'] = 'Gainers'
-        losers = data['losers'].copy()
-        losers['Month'] = month
-        losers['Type'] = 'Losers'
-        monthly_flat.append(pd.concat([gainers, losers]))
-    
-    if monthly_flat:
-        monthly_df = pd.concat(monthly_flat, ignore_index=True)
-        monthly_df.to_csv(powerbi_dir / 'monthly_analysis.csv', index=False)
-        print("✅ 6. monthly_analysis.csv")
+from concurrent.futures import ThreadPoolExecutor
+from analysis import (load_stock_data, calculate_key_metrics, calculate_volatility,
+                     calculate_cumulative_returns, get_sector_performance,
+                     get_monthly_leaders)
+from price_matrix import PriceMatrix
+from instrumentation import stage, print_summary
+
+FORMATS = {'csv': '.csv', 'csv.gz': '.csv.gz', 'parquet': '.parquet'}
+MANIFEST_FILE = "export_manifest.json"
+# Manifest entry holding the Symbol → symbol_key mapping of the star schema
+SYMBOL_KEYS = "symbol_keys"
+
+
+def _has_pyarrow():
+    try:
+        import pyarrow  # noqa: F401
+        return True
+    except ImportError:
+        return False
+
+
+def write_frame(df, base_path, fmt='csv', index=False):
+    """Write df as base_path + the format's extension, atomically (temp file + rename)."""
+    path = Path(f"{base_path}{FORMATS[fmt]}")
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = path.with_name(f".{path.name}.tmp")
+    if fmt == 'parquet':
+        (df.reset_index() if index else df).to_parquet(tmp_path, index=False)
     else:
-        print("⚠️ No monthly data")
-    
-    # 7. SUMMARY REPORT
+        df.to_csv(tmp_path, index=index, compression='gzip' if fmt == 'csv.gz' else None)
+    os.replace(tmp_path, path)
+    return path
+
+
+def _frame_hash(df):
+    """Content hash of a partition's rows (order-sensitive, index ignored)."""
+    digest = hashlib.sha256(pd.util.hash_pandas_object(df, index=False).to_numpy().tobytes())
+    digest.update(",".join(map(str, df.columns)).encode())
+    return digest.hexdigest()
+
+
+def load_manifest(out_dir):
+    path = Path(out_dir) / MANIFEST_FILE
+    if not path.exists():
+        return {}
+    with open(path) as f:
+        return json.load(f)
+
+
+def save_manifest(manifest, out_dir):
+    path = Path(out_dir) / MANIFEST_FILE
+    tmp_path = path.with_name(f".{path.name}.tmp")
+    with open(tmp_path, 'w') as f:
+        json.dump(manifest, f, indent=1, sort_keys=True)
+    os.replace(tmp_path, path)
+
+
+def assign_symbol_keys(symbols, symbol_keys):
+    """
+    symbol_key for each symbol, reusing the keys in symbol_keys and appending
+    new symbols after the highest key ever issued. symbol_keys is updated in
+    place; removed symbols keep their key so it is never handed out again.
+    """
+    next_key = max(symbol_keys.values(), default=-1) + 1
+    for symbol in sorted(set(map(str, symbols)) - set(symbol_keys)):
+        symbol_keys[symbol] = next_key
+        next_key += 1
+    return np.array([symbol_keys[str(s)] for s in symbols], dtype=np.int32)
+
+
+def build_star_schema(df, sectors_file="data/sectors.csv", symbol_keys=None):
+    """
+    Split the long price frame into dim_date, dim_symbol and a fact table that
+    carries integer keys instead of the repeated Symbol text and timestamps.
+
+    symbol_keys is the persisted Symbol → symbol_key map (see the export
+    manifest); keys stay fixed across exports, so adding or dropping a symbol
+    does not renumber the others and rewrite every fact partition.
+    """
+    symbol_keys = symbol_keys if symbol_keys is not None else {}
+    dates = pd.to_datetime(df['Date'])
+    day = dates.dt.normalize()
+    date_key = (day.dt.year * 10000 + day.dt.month * 100 + day.dt.day).astype(np.int32)
+
+    unique_days = pd.DatetimeIndex(day.unique()).sort_values()
+    dim_date = pd.DataFrame({
+        'date_key': (unique_days.year * 10000 + unique_days.month * 100 + unique_days.day).astype(np.int32),
+        'Date': unique_days,
+        'Year': unique_days.year.astype(np.int16),
+        'Month': unique_days.month.astype(np.int8),
+        'Month_Name': unique_days.strftime('%b'),
+        'Year_Month': unique_days.strftime('%Y-%m'),
+        'Day': unique_days.day.astype(np.int8),
+        'Weekday': unique_days.day_name(),
+    })
+
+    symbol_codes, symbols = pd.factorize(df['Symbol'], sort=True)
+    keys = assign_symbol_keys(symbols, symbol_keys)
+    dim_symbol = pd.DataFrame({'symbol_key': keys, 'Symbol': symbols})
+    if os.path.exists(sectors_file):
+        sectors = pd.read_csv(sectors_file, comment='#')
+        sectors.columns = [c.strip().title() for c in sectors.columns]
+        if {'Symbol', 'Sector'} <= set(sectors.columns):
+            dim_symbol = dim_symbol.merge(sectors[['Symbol', 'Sector']].drop_duplicates('Symbol'),
+                                          on='Symbol', how='left')
+
+    fact = pd.DataFrame({'date_key': date_key.to_numpy(), 'symbol_key': keys[symbol_codes]})
+    for column in ('Open', 'High', 'Low', 'Close'):
+        if column in df.columns:
+            fact[column] = df[column].to_numpy(dtype=np.float64)
+    if 'Volume' in df.columns:
+        # Nullable, so a missing volume is exported as blank instead of a huge negative number
+        fact['Volume'] = df['Volume'].astype('Int64').array
+    return dim_date, dim_symbol, fact
+
+
+def export_partitioned(df, out_dir, name, fmt, partition_by=('month',), manifest=None):
+    """
+    Write df as name/month=YYYY-MM[/symbol=XYZ] partitions, rewriting only
+    partitions whose rows changed since the manifest was recorded and
+    deleting partitions that no longer exist. Returns (written, unchanged, removed).
+    """
+    manifest = manifest if manifest is not None else {}
+    old_entries = {k: v for k, v in manifest.items() if k.startswith(f"{name}/")}
+    month = pd.to_datetime(df['Date']).dt.strftime('%Y-%m') if 'Date' in df.columns \
+        else (df['date_key'] // 100).astype(str).str.replace(r'^(\d{4})(\d{2})$', r'\1-\2', regex=True)
+    keys = [month.rename('month')]
+    if 'symbol' in partition_by:
+        keys.append((df['Symbol'] if 'Symbol' in df.columns else df['symbol_key']).rename('symbol'))
+
+    written = unchanged = 0
+    seen = set()
+    for key, part in df.groupby(keys, sort=True):
+        key = key if isinstance(key, tuple) else (key,)
+        rel = "/".join([name] + [f"{field}={value}" for field, value in zip(('month', 'symbol'), key)])
+        rel_file = f"{rel}/part{FORMATS[fmt]}"
+        seen.add(rel_file)
+        content_hash = _frame_hash(part)
+        if manifest.get(rel_file) == content_hash and (Path(out_dir) / rel_file).exists():
+            unchanged += 1
+            continue
+        write_frame(part, Path(out_dir) / rel / "part", fmt)
+        manifest[rel_file] = content_hash
+        written += 1
+
+    removed = 0
+    for rel_file in set(old_entries) - seen:
+        stale = Path(out_dir) / rel_file
+        stale.unlink(missing_ok=True)
+        # Drop the partition folders it leaves empty
+        for folder in stale.parents:
+            if folder == Path(out_dir) / name or any(folder.iterdir()):
+                break
+            folder.rmdir()
+        manifest.pop(rel_file, None)
+        removed += 1
+    return written, unchanged, removed
+
+
+def compute_metrics(df):
+    """All Power BI metric tables from one PriceMatrix."""
+    with stage("export.analyze", rows=len(df)):
+        matrix = PriceMatrix.from_frame(df)
+        green, red, summary, yearly = calculate_key_metrics(matrix)
+        volatility = calculate_volatility(matrix)
+        cum_returns, top5 = calculate_cumulative_returns(matrix)
+        sector_perf = get_sector_performance(matrix)
+        monthly = get_monthly_leaders(matrix)
+
     summary_report = pd.DataFrame({
         'Metric': ['Total Stocks', 'Green Stocks', 'Red Stocks', 'Avg Close', 'Avg Volume', 'Avg Return %'],
         'Value': [summary['total_stocks'], summary['green_stocks'], summary['red_stocks'],
                  f"₹{summary['avg_close_price']:.0f}", f"{summary['avg_volume']:,.0f}",
                  f"{summary['avg_yearly_return']:.1f}%"]
     })
-    summary_report.to_csv(powerbi_dir / 'summary_report.csv', index=False)
-    print("✅ 7. summary_report.csv")
-    
-    print("\n🎉 SUCCESS! ALL FILES EXPORTED!")
-    print(f"📁 Folder: {powerbi_dir.absolute()}")
-    print("\n📋 FILES CREATED:")
-    for file in powerbi_dir.glob("*.csv"):
-        print(f"   ✅ {file.name}")
-    
-    print("\n🚀 NEXT: Open Power BI Desktop → Get Data → Folder → Select 'powerbi' folder!")
-    
-except Exception as e:
-    print(f"❌ ERROR: {e}")
-    import traceback
-    traceback.print_exc()
+    tables = {
+        'key_metrics': (pd.DataFrame([summary]), False),
+        'top_green': (green, False),
+        'top_red': (red, False),
+        'volatility': (volatility, False),
+        'sector_performance': (sector_perf, False),
+        'cumulative_returns': (cum_returns, True),
+        'summary_report': (summary_report, False),
+    }
+    if not monthly.empty:
+        tables['monthly_analysis'] = (monthly[['Symbol', 'Monthly_Return', 'Month', 'Type', 'Rank']], False)
+    else:
+        print("⚠️ No monthly data")
+    return tables
+
+
+def write_metric_tables(tables, out_dir, fmt, workers=4):
+    """Write the independent metric tables concurrently."""
+    with stage("export.metric_tables", rows=sum(len(df) for df, _ in tables.values())):
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            futures = {name: pool.submit(write_frame, df, Path(out_dir) / name, fmt, index)
+                       for name, (df, index) in tables.items()}
+            return {name: future.result() for name, future in futures.items()}
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Export stock data and metrics for Power BI.")
+    parser.add_argument("--output-dir", default="powerbi", help="Export folder")
+    parser.add_argument("--format", choices=list(FORMATS), default="csv",
+                        help="File format (parquet needs pyarrow)")
+    parser.add_argument("--partitioned", action="store_true",
+                        help="Write raw prices as month partitions, rewriting only changed ones")
+    parser.add_argument("--partition-by", default="month",
+                        help="'month' or 'month,symbol' (symbol partitions mean many small files)")
+    parser.add_argument("--star", action="store_true",
+                        help="Write dim_date / dim_symbol and an integer-keyed fact_prices table")
+    parser.add_argument("--workers", type=int, default=4, help="Threads for the metric table writes")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    fmt = args.format
+    if fmt == 'parquet' and not _has_pyarrow():
+        print("❌ Parquet export needs pyarrow (pip install pyarrow); use --format csv.gz instead")
+        return 1
+
+    print("🚀 POWER BI EXPORT STARTED...")
+    print("=" * 50)
+
+    # ✅ AUTO-CREATE powerbi FOLDER
+    powerbi_dir = Path(args.output_dir)
+    powerbi_dir.mkdir(exist_ok=True, parents=True)
+    print(f"✅ Created folder: {powerbi_dir.absolute()}")
+
+    try:
+        # Load & analyze ALL data
+        print("📊 Loading stock data...")
+        # float64 so the exported prices and key metrics carry the exact values
+        df = load_stock_data(precision='float64')
+        if df.empty:
+            print("❌ No stock data found! Create data/csv/*.csv files")
+            return 1
+
+        print(f"✅ Loaded {len(df)} rows, {df['Symbol'].nunique()} stocks")
+
+        # Calculate ALL metrics
+        print("🔬 Calculating metrics...")
+        tables = compute_metrics(df)
+        print("✅ All metrics calculated!")
+
+        print("\n📁 EXPORTING FILES...")
+        manifest = load_manifest(powerbi_dir)
+        partition_by = tuple(p.strip() for p in args.partition_by.split(",") if p.strip())
+
+        # 1. RAW DATA (flat, partitioned, and/or star schema)
+        with stage("export.raw_stock_data", rows=len(df)):
+            if args.star:
+                dim_date, dim_symbol, fact = build_star_schema(df, symbol_keys=manifest.setdefault(SYMBOL_KEYS, {}))
+                write_frame(dim_date, powerbi_dir / 'dim_date', fmt)
+                write_frame(dim_symbol, powerbi_dir / 'dim_symbol', fmt)
+                if args.partitioned:
+                    counts = export_partitioned(fact, powerbi_dir, 'fact_prices', fmt, partition_by, manifest)
+                    print(f"✅ 1. fact_prices/: {counts[0]} written, {counts[1]} unchanged, {counts[2]} removed")
+                else:
+                    write_frame(fact, powerbi_dir / 'fact_prices', fmt)
+                    print(f"✅ 1. fact_prices{FORMATS[fmt]}")
+                print(f"✅    dim_date{FORMATS[fmt]}, dim_symbol{FORMATS[fmt]}")
+            elif args.partitioned:
+                counts = export_partitioned(df, powerbi_dir, 'raw_stock_data', fmt, partition_by, manifest)
+                print(f"✅ 1. raw_stock_data/: {counts[0]} written, {counts[1]} unchanged, {counts[2]} removed")
+            else:
+                write_frame(df, powerbi_dir / 'raw_stock_data', fmt)
+                print(f"✅ 1. raw_stock_data{FORMATS[fmt]}")
+        save_manifest(manifest, powerbi_dir)
+
+        # 2-7. METRIC TABLES (independent files, written concurrently)
+        written = write_metric_tables(tables, powerbi_dir, fmt, workers=args.workers)
+        print("✅ 2-7. " + ", ".join(path.name for path in written.values()))
+
+        print("\n🎉 SUCCESS! ALL FILES EXPORTED!")
+        print(f"📁 Folder: {powerbi_dir.absolute()}")
+        print("\n📋 FILES CREATED:")
+        for file in sorted(powerbi_dir.glob(f"*{FORMATS[fmt]}")):
+            print(f"   ✅ {file.name}")
+
+        print("\n🚀 NEXT: Open Power BI Desktop → Get Data → Folder → Select 'powerbi' folder!")
+        print()
+        print_summary()
+        return 0
+
+    except Exception as e:
+        print(f"❌ ERROR: {e}")
+        import traceback
+        traceback.print_exc()
+        return 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
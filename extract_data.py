@@ -2,72 +2,332 @@
 import pandas as pd
 import yaml
 import os
+import sys
+import time
+import argparse
+import hashlib
+import json
+import csv
 from pathlib import Path
 from glob import glob
+from concurrent.futures import ProcessPoolExecutor
+from price_store import (default_store_dir, write_price_store, append_price_store,
+                         store_exists, build_price_store)
+from instrumentation import instrument, stage, print_summary
 
-def extract_yaml_to_csv(yaml_dir="data/yaml", output_dir="data/csv"):
+# Prefer the libyaml-backed loader; it is several times faster than the pure Python one
+try:
+    from yaml import CSafeLoader as YamlLoader
+except ImportError:
+    from yaml import SafeLoader as YamlLoader
+
+MANIFEST_VERSION = 1
+
+# Map the YAML keys (e.g., 'Ticker', 'close') to the desired CSV columns (e.g., 'Symbol', 'Close')
+COLUMN_MAP = {
+    'Symbol': 'Ticker',
+    'Date': 'date',
+    'Open': 'open',
+    'High': 'high',
+    'Low': 'low',
+    'Close': 'close',
+    'Volume': 'volume',
+}
+
+
+def _parse_yaml_file(file_path):
+    """Parse one YAML file into a dict of column lists (no per-row dicts)."""
+    with open(file_path, 'r') as f:
+        data = yaml.load(f, Loader=YamlLoader)
+
+    # The data is a LIST of records (your provided format)
+    if not isinstance(data, list):
+        return file_path, None
+
+    columns = {}
+    for column, key in COLUMN_MAP.items():
+        columns[column] = [record.get(key) for record in data]
+    return file_path, columns
+
+
+def _peak_memory_mb():
+    """Peak resident memory of this process and its workers in MB (None if unsupported)."""
+    try:
+        import resource
+    except ImportError:
+        return None
+    peak = max(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+               resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss)
+    # ru_maxrss is reported in bytes on macOS and kilobytes elsewhere
+    return peak / (1024 * 1024) if sys.platform == 'darwin' else peak / 1024
+
+
+def _iter_parsed(yaml_files, jobs):
+    """Yield (file_path, columns) for every file, serially or across a process pool."""
+    if jobs <= 1:
+        for file_path in yaml_files:
+            yield _parse_yaml_file(file_path)
+        return
+
+    chunksize = max(1, len(yaml_files) // (jobs * 4))
+    with ProcessPoolExecutor(max_workers=jobs) as pool:
+        yield from pool.map(_parse_yaml_file, yaml_files, chunksize=chunksize)
+
+
+def _file_sha256(file_path):
+    digest = hashlib.sha256()
+    with open(file_path, 'rb') as f:
+        for block in iter(lambda: f.read(1 << 20), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def default_manifest_path(output_dir="data/csv"):
+    """The ingest manifest lives next to the CSV folder (data/csv → data/ingest_manifest.json)."""
+    return str(Path(output_dir).parent / "ingest_manifest.json")
+
+
+def load_manifest(manifest_path):
+    if not os.path.exists(manifest_path):
+        return {'version': MANIFEST_VERSION, 'files': {}}
+    with open(manifest_path) as f:
+        manifest = json.load(f)
+    if manifest.get('version') != MANIFEST_VERSION:
+        return {'version': MANIFEST_VERSION, 'files': {}}
+    return manifest
+
+
+def save_manifest(manifest, manifest_path):
+    tmp_path = f"{manifest_path}.tmp"
+    with open(tmp_path, 'w') as f:
+        json.dump(manifest, f, indent=1, sort_keys=True)
+    os.replace(tmp_path, manifest_path)
+
+
+def _file_entry(file_path, known=None):
+    """Manifest entry (size, mtime, sha256); the hash is reused when size and mtime match."""
+    stat = os.stat(file_path)
+    entry = {'size': stat.st_size, 'mtime_ns': stat.st_mtime_ns}
+    if known and known.get('size') == entry['size'] and known.get('mtime_ns') == entry['mtime_ns']:
+        entry['sha256'] = known['sha256']
+    else:
+        entry['sha256'] = _file_sha256(file_path)
+    return entry
+
+
+def find_changed_files(yaml_files, manifest):
+    """
+    Split yaml_files into (changed, entries): files that are new or whose
+    content hash differs from the manifest, and fresh manifest entries for all.
+    Unchanged size + mtime skips hashing entirely.
+    """
+    known_files = manifest.get('files', {})
+    changed, entries = [], {}
+    for file_path in yaml_files:
+        key = os.path.normpath(file_path)
+        known = known_files.get(key)
+        entry = _file_entry(file_path, known)
+        entries[key] = entry
+        if known is None or known.get('sha256') != entry['sha256']:
+            changed.append(file_path)
+    return changed, entries
+
+
+def _read_yaml_frame(yaml_files, jobs):
+    """Parse yaml_files into one frame sorted by Symbol and Date."""
+    # Accumulate typed columns instead of one dict per record
+    all_columns = {column: [] for column in COLUMN_MAP}
+    for file_path, columns in _iter_parsed(yaml_files, jobs):
+        if columns is None:
+            # Optional: Handle the old dictionary format if some files are different
+            print(f"Warning: Skipping file {file_path} as it's not a list format.")
+            continue
+        for column, values in columns.items():
+            all_columns[column].extend(values)
+
+    # Convert all extracted data into a single DataFrame
+    df_master = pd.DataFrame(all_columns)
+    if df_master.empty:
+        return df_master
+
+    # Parse every date in one vectorized pass
+    df_master['Date'] = pd.to_datetime(df_master['Date'])
+
+    # Sort the data by Symbol and Date
+    return df_master.sort_values(by=['Symbol', 'Date']).reset_index(drop=True)
+
+
+def _csv_tail(csv_path):
+    """
+    (header columns, Date of the last row) of a per-symbol CSV, reading only
+    the first line and the file tail. The Date is looked up by the header's
+    column position; it is None when there is no Date column or no data row.
+    """
+    with open(csv_path, 'rb') as f:
+        header = next(csv.reader([f.readline().decode('utf-8', errors='ignore')]), [])
+        f.seek(0, os.SEEK_END)
+        size = f.tell()
+        f.seek(max(0, size - 4096))
+        lines = f.read().decode('utf-8', errors='ignore').strip().splitlines()
+    header = [column.strip() for column in header]
+    # The tail of a small file starts with the header line itself
+    has_rows = len(lines) > 1 if size <= 4096 else bool(lines)
+    if 'Date' not in header or not has_rows:
+        return header, None
+    try:
+        last_row = next(csv.reader([lines[-1]]))
+        return header, pd.Timestamp(last_row[header.index('Date')])
+    except (IndexError, ValueError, StopIteration):
+        return header, None
+
+
+def _merge_symbol_csv(symbol_df, output_path):
+    """
+    Append new rows to a per-symbol CSV, or merge them when they overlap
+    existing dates. Duplicates are resolved by (Symbol, Date), newest wins.
+    """
+    if not os.path.exists(output_path):
+        symbol_df.to_csv(output_path, index=False)
+        return 'new'
+
+    # Appending needs the file's columns in the same order as the new rows
+    header, last_date = _csv_tail(output_path)
+    if header == list(symbol_df.columns) and last_date is not None and symbol_df['Date'].min() > last_date:
+        symbol_df.to_csv(output_path, mode='a', header=False, index=False)
+        return 'appended'
+
+    existing = pd.read_csv(output_path)
+    existing['Date'] = pd.to_datetime(existing['Date'])
+    merged = (
+        pd.concat([existing, symbol_df], ignore_index=True)
+        .drop_duplicates(subset=['Symbol', 'Date'], keep='last')
+        .sort_values('Date')
+    )
+    merged.to_csv(output_path, index=False)
+    return 'merged'
+
+
+def _update_price_store(df_new, output_dir, store_dir):
+    """
+    Append new rows to the columnar store as a chunk. The store is rebuilt
+    from the (already merged) CSVs only when it is missing or unreadable, or
+    when the rows overlap dates it already holds.
+    """
+    if store_exists(store_dir):
+        try:
+            if append_price_store(df_new, store_dir, output_dir) is not None:
+                return
+        except (OSError, ValueError) as e:
+            print(f"⚠️ Price store unreadable, rebuilding: {e}")
+    build_price_store(output_dir, store_dir)
+
+
+@instrument(rows='output')
+def extract_yaml_to_csv(yaml_dir="data/yaml", output_dir="data/csv", jobs=1, store_dir=None,
+                        incremental=False, manifest_path=None):
     """
     Extracts data from YAML files (formatted as a list of stock records)
     and transforms it into symbol-wise CSV files.
+
+    With jobs > 1 the YAML files are parsed across a process pool.
+    The same data is also written to the columnar price store that
+    load_stock_data reads (store_dir defaults to data/store).
+
+    With incremental=True only YAML files that are new or changed since the
+    last run (per the ingest manifest) are parsed, and their rows are appended
+    or merged into the affected symbol files only.
     """
     print(f"Starting data extraction process...")
-    
+    start = time.perf_counter()
+
     Path(output_dir).mkdir(exist_ok=True, parents=True)
-    
-    all_data = []
-    
+    store_dir = store_dir or default_store_dir(output_dir)
+    manifest_path = manifest_path or default_manifest_path(output_dir)
+
     search_pattern = os.path.join(yaml_dir, "**/*.yaml")
-    yaml_files = glob(search_pattern, recursive=True)
-    
+    yaml_files = sorted(glob(search_pattern, recursive=True))
+
     if not yaml_files:
         print(f"Error: No YAML files found in '{yaml_dir}'. Please place your dataset there.")
         return
 
-    print(f"Found {len(yaml_files)} YAML files to process.")
+    manifest = load_manifest(manifest_path)
+    changed_files, entries = find_changed_files(yaml_files, manifest)
+    files_to_parse = changed_files if incremental else yaml_files
 
-    for file_path in yaml_files:
-        with open(file_path, 'r') as f:
-            data = yaml.safe_load(f)
-            
-            # The data is a LIST of records (your provided format)
-            if isinstance(data, list):
-                for record in data:
-                    # Map the YAML keys (e.g., 'Ticker', 'close') to the desired CSV columns (e.g., 'Symbol', 'Close')
-                    row = {
-                        'Symbol': record.get('Ticker'),
-                        # Convert date string immediately using pandas
-                        'Date': pd.to_datetime(record.get('date')), 
-                        'Open': record.get('open'),
-                        'High': record.get('high'),
-                        'Low': record.get('low'),
-                        'Close': record.get('close'),
-                        'Volume': record.get('volume')
-                    }
-                    all_data.append(row)
-            else:
-                # Optional: Handle the old dictionary format if some files are different
-                print(f"Warning: Skipping file {file_path} as it's not a list format.")
+    if incremental:
+        print(f"Found {len(yaml_files)} YAML files, {len(changed_files)} new or changed.")
+        if not changed_files:
+            print("✅ Nothing new to ingest.")
+            save_manifest({'version': MANIFEST_VERSION, 'files': entries}, manifest_path)
+            return pd.DataFrame()
 
+    jobs = max(1, min(jobs, len(files_to_parse)))
+    print(f"Parsing {len(files_to_parse)} YAML files ({jobs} job{'s' if jobs > 1 else ''}).")
+
+    with stage("extract.parse_yaml") as record:
+        df_master = _read_yaml_frame(files_to_parse, jobs)
+        record['rows'] = len(df_master)
 
-    # Convert all extracted data into a single DataFrame
-    df_master = pd.DataFrame(all_data)
-    
     if df_master.empty:
         print("No data extracted. Exiting.")
         return
 
-    # Sort the data by Symbol and Date
-    df_master = df_master.sort_values(by=['Symbol', 'Date']).reset_index(drop=True)
-    
-    # Save the consolidated data into separate CSV files, one for each symbol
-    for symbol in df_master['Symbol'].unique():
-        symbol_df = df_master[df_master['Symbol'] == symbol]
-        output_path = os.path.join(output_dir, f"{symbol}.csv")
-        symbol_df.to_csv(output_path, index=False)
+    # Save the consolidated data into separate CSV files, one for each symbol.
+    # The frame is already sorted, so a single groupby pass yields contiguous slices.
+    n_symbols = 0
+    outcomes = {}
+    with stage("extract.write_csv", rows=len(df_master)):
+        for symbol, symbol_df in df_master.groupby('Symbol', sort=False):
+            output_path = os.path.join(output_dir, f"{symbol}.csv")
+            if incremental:
+                outcome = _merge_symbol_csv(symbol_df.drop_duplicates(subset=['Date'], keep='last'), output_path)
+                outcomes[outcome] = outcomes.get(outcome, 0) + 1
+            else:
+                symbol_df.to_csv(output_path, index=False)
+            n_symbols += 1
+
+    with stage("extract.write_store", rows=len(df_master)):
+        if incremental:
+            _update_price_store(df_master, output_dir, store_dir)
+        else:
+            write_price_store(df_master, store_dir, output_dir)
+
+    # Only record files once their rows are safely on disk
+    save_manifest({'version': MANIFEST_VERSION, 'files': entries}, manifest_path)
+
+    elapsed = time.perf_counter() - start
+    print(f"✅ Extracted {len(df_master)} records → {n_symbols} CSV files saved in {output_dir}")
+    if incremental:
+        print("   " + ", ".join(f"{count} {outcome}" for outcome, count in sorted(outcomes.items())))
+
+    peak_mb = _peak_memory_mb()
+    peak_text = f", peak memory {peak_mb:,.0f} MB" if peak_mb is not None else ""
+    print(f"⏱️ {elapsed:.2f}s ({len(df_master) / elapsed:,.0f} records/sec){peak_text}")
+
+    return df_master
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Extract YAML stock records into per-symbol CSV files.")
+    parser.add_argument("--yaml-dir", default="data/yaml", help="Root folder of the raw YAML dataset")
+    parser.add_argument("--output-dir", default="data/csv", help="Folder for the per-symbol CSV files")
+    parser.add_argument("--jobs", type=int, default=1,
+                        help="Number of worker processes for YAML parsing (0 = all CPUs)")
+    parser.add_argument("--store-dir", default=None,
+                        help="Columnar price store folder (default: data/store next to --output-dir)")
+    parser.add_argument("--incremental", action="store_true",
+                        help="Only ingest YAML files that are new or changed since the last run")
+    parser.add_argument("--manifest", default=None,
+                        help="Ingest manifest path (default: data/ingest_manifest.json next to --output-dir)")
+    return parser.parse_args(argv)
 
-    print(f"✅ Extracted {len(df_master)} records → {len(df_master['Symbol'].unique())} CSV files saved in {output_dir}")
 
 if __name__ == "__main__":
     # Ensure your raw yaml dataset is placed in a folder named 'data/yaml'
     # relative to your current working directory.
-    extract_yaml_to_csv()
+    args = parse_args()
+    extract_yaml_to_csv(args.yaml_dir, args.output_dir, jobs=args.jobs or os.cpu_count() or 1,
+                        store_dir=args.store_dir, incremental=args.incremental,
+                        manifest_path=args.manifest)
+    print_summary()
@@ -0,0 +1,313 @@
+# incremental_metrics.py - Running per-symbol metrics updated one trading day at a time
+import numpy as np
+import pandas as pd
+
+from price_matrix import as_price_matrix
+
+_SYMBOL_STATE = ('first_close', 'prev_close', 'last_close', 'last_return',
+                 'n', 'mean', 'm2', 'growth')
+_PAIR_STATE = ('pair_n', 'pair_mean', 'pair_m2', 'pair_cov')
+
+
+class IncrementalMetrics:
+    """
+    Running yearly return, volatility, cumulative return and return
+    correlations for every symbol, updated with new bars via update(bars).
+
+    Per-symbol state: first/previous/last close, the last daily return, a
+    Welford mean and M2 of daily returns and the cumulative growth product,
+    so a new bar costs O(1) per symbol. Correlations keep pairwise-complete
+    Welford co-moments: pair_mean[i, j] / pair_m2[i, j] are the mean and M2
+    of symbol i over the days both i and j traded, pair_cov[i, j] their
+    co-moment. A day with k traded symbols updates a k × k block.
+
+    A bar dated on a symbol's last date revises that day (intraday refresh).
+    The members and returns of the last `revision_days` dates are kept, so
+    a revision removes and re-adds exactly the co-moments of the revised
+    symbols against everything that traded that day, including symbols
+    that have since moved on to later dates. A bar for an older day whose
+    record was dropped cannot be applied exactly, and neither can a bar
+    dated before its symbol's last date (a backfill or correction of a past
+    day): both set `stale`, which makes needs_recompute true. recompute(history) rebuilds the state from
+    a full history and reports how far the running values had drifted.
+    """
+
+    def __init__(self, recompute_every=250, history_loader=None, revision_days=20):
+        self.recompute_every = recompute_every
+        self.history_loader = history_loader
+        self.revision_days = revision_days
+        self.updates_since_recompute = 0
+        self.stale = False
+        # date → {symbol position: daily return} for the most recent dates
+        self._days = {}
+        self.symbols = []
+        self.symbol_index = {}
+        self.last_date = np.empty(0, dtype='datetime64[ns]')
+        for name in _SYMBOL_STATE:
+            setattr(self, name, np.empty(0))
+        for name in _PAIR_STATE:
+            setattr(self, name, np.empty((0, 0)))
+
+    # ------------------------------------------------------------------ state
+
+    def _add_symbols(self, new_symbols):
+        """Grow every state array for symbols seen for the first time."""
+        old, extra = len(self.symbols), len(new_symbols)
+        for symbol in new_symbols:
+            self.symbol_index[symbol] = len(self.symbols)
+            self.symbols.append(symbol)
+
+        self.last_date = np.concatenate([self.last_date, np.full(extra, np.datetime64('NaT'), 'datetime64[ns]')])
+        fills = {'n': 0.0, 'mean': 0.0, 'm2': 0.0, 'growth': 1.0}
+        for name in _SYMBOL_STATE:
+            grown = np.concatenate([getattr(self, name), np.full(extra, fills.get(name, np.nan))])
+            setattr(self, name, grown)
+        for name in _PAIR_STATE:
+            grown = np.zeros((old + extra, old + extra))
+            grown[:old, :old] = getattr(self, name)
+            setattr(self, name, grown)
+
+    def _add_day(self, idx, x, touched):
+        """
+        Welford-add one day's returns x for the symbols idx that traded together,
+        for the symbols flagged in touched and every pair involving one of them.
+        """
+        sym, xs = idx[touched], x[touched]
+        n = self.n[sym] + 1
+        delta = xs - self.mean[sym]
+        self.mean[sym] += delta / n
+        self.m2[sym] += delta * (xs - self.mean[sym])
+        self.n[sym] = n
+
+        block = np.ix_(idx, idx)
+        pairs = touched[:, None] | touched[None, :]
+        pair_n = self.pair_n[block] + 1
+        dx = x[:, None] - self.pair_mean[block]
+        new_mean = self.pair_mean[block] + dx / pair_n
+        self.pair_cov[block] = np.where(pairs, self.pair_cov[block] + dx * (x[None, :] - new_mean.T),
+                                        self.pair_cov[block])
+        self.pair_m2[block] = np.where(pairs, self.pair_m2[block] + dx * (x[:, None] - new_mean), self.pair_m2[block])
+        self.pair_mean[block] = np.where(pairs, new_mean, self.pair_mean[block])
+        self.pair_n[block] = np.where(pairs, pair_n, self.pair_n[block])
+
+    def _remove_day(self, idx, x, touched):
+        """Exact inverse of _add_day for the same idx, x and touched."""
+        sym, xs = idx[touched], x[touched]
+        n = self.n[sym] - 1
+        safe_n = np.maximum(n, 1)
+        old_mean = self.mean[sym]
+        new_mean = np.where(n > 0, (old_mean * (n + 1) - xs) / safe_n, 0.0)
+        self.m2[sym] = np.where(n > 0, self.m2[sym] - (xs - new_mean) * (xs - old_mean), 0.0)
+        self.mean[sym] = new_mean
+        self.n[sym] = n
+
+        block = np.ix_(idx, idx)
+        pairs = touched[:, None] | touched[None, :]
+        pair_n = self.pair_n[block] - 1
+        safe_pair_n = np.maximum(pair_n, 1)
+        cur_mean = self.pair_mean[block]
+        prev_mean = np.where(pair_n > 0, (cur_mean * (pair_n + 1) - x[:, None]) / safe_pair_n, 0.0)
+        empty = pair_n <= 0
+        cov = np.where(empty, 0.0, self.pair_cov[block] - (x[:, None] - prev_mean) * (x[None, :] - cur_mean.T))
+        m2 = np.where(empty, 0.0, self.pair_m2[block] - (x[:, None] - prev_mean) * (x[:, None] - cur_mean))
+        self.pair_cov[block] = np.where(pairs, cov, self.pair_cov[block])
+        self.pair_m2[block] = np.where(pairs, m2, self.pair_m2[block])
+        self.pair_mean[block] = np.where(pairs, prev_mean, cur_mean)
+        self.pair_n[block] = np.where(pairs, pair_n, self.pair_n[block])
+
+    def _day_record(self, date):
+        """{symbol position: return} of everything that traded on date."""
+        record = self._days.get(date)
+        if record is None:
+            # Without a record only the symbols still on this date are known;
+            # pairs with symbols that already moved past it would be missed
+            members = np.flatnonzero((self.last_date == date) & ~np.isnan(self.last_return))
+            record = {int(i): float(self.last_return[i]) for i in members}
+            if (self.last_date > date).any():
+                self.stale = True
+            self._days[date] = record
+        return record
+
+    def _prune_days(self):
+        for date in sorted(self._days)[:-self.revision_days or None]:
+            del self._days[date]
+
+    # ----------------------------------------------------------------- update
+
+    def update(self, bars):
+        """
+        Apply new bars (a frame with Symbol, Date, Close; one or more days).
+
+        Bars on a symbol's last date revise that day. Bars older than it
+        cannot be folded in; they are skipped and set `stale`, so the next
+        recompute picks them up from the history. Returns the number of bars
+        applied.
+        """
+        if bars is None or len(bars) == 0:
+            return 0
+
+        bars = bars[['Symbol', 'Date', 'Close']].dropna(subset=['Close'])
+        new_symbols = [s for s in pd.unique(bars['Symbol']) if s not in self.symbol_index]
+        if new_symbols:
+            self._add_symbols(new_symbols)
+
+        applied = 0
+        dates = pd.to_datetime(bars['Date']).to_numpy(dtype='datetime64[ns]')
+        for date in np.unique(dates):
+            day = bars[dates == date].drop_duplicates('Symbol', keep='last')
+            idx = np.array([self.symbol_index[s] for s in day['Symbol']], dtype=np.int64)
+            close = day['Close'].to_numpy(dtype=np.float64)
+
+            last = self.last_date[idx]
+            fresh = np.isnat(last) | (last < date)
+            revise = ~fresh & (last == date)
+            if (~fresh & ~revise).any():
+                # A backfill behind the running state: only a recompute is exact
+                self.stale = True
+            if not (fresh | revise).any():
+                continue
+
+            # Take the revised symbols' co-moments with everything that traded
+            # this day out; they are re-added below with the new returns
+            record = self._day_record(date)
+            members = np.fromiter(record, dtype=np.int64, count=len(record))
+            returns = np.fromiter(record.values(), dtype=np.float64, count=len(record))
+            touched = np.isin(members, idx[revise])
+            if touched.any():
+                self._remove_day(members, returns, touched)
+
+            rev_idx, rev_close = idx[revise], close[revise]
+            first_bar = np.isnan(self.prev_close[rev_idx])
+            self.first_close[rev_idx[first_bar]] = rev_close[first_bar]
+            self.growth[rev_idx] /= np.where(np.isnan(self.last_return[rev_idx]), 1.0, 1 + self.last_return[rev_idx])
+            self.last_return[rev_idx] = rev_close / self.prev_close[rev_idx] - 1
+            self.last_close[rev_idx] = rev_close
+
+            new_idx, new_close = idx[fresh], close[fresh]
+            first_bar = np.isnan(self.first_close[new_idx])
+            self.first_close[new_idx[first_bar]] = new_close[first_bar]
+            self.prev_close[new_idx] = self.last_close[new_idx]
+            self.last_return[new_idx] = new_close / self.prev_close[new_idx] - 1
+            self.last_close[new_idx] = new_close
+            self.last_date[new_idx] = date
+
+            changed = idx[fresh | revise]
+            has_return = ~np.isnan(self.last_return[changed])
+            self.growth[changed[has_return]] *= 1 + self.last_return[changed[has_return]]
+
+            for i in changed:
+                record.pop(int(i), None)
+            for i in changed[has_return]:
+                record[int(i)] = float(self.last_return[i])
+            members = np.fromiter(record, dtype=np.int64, count=len(record))
+            returns = np.fromiter(record.values(), dtype=np.float64, count=len(record))
+            touched = np.isin(members, changed[has_return])
+            if touched.any():
+                self._add_day(members, returns, touched)
+            applied += int((fresh | revise).sum())
+
+        self._prune_days()
+
+        self.updates_since_recompute += 1
+        if self.history_loader is not None and self.needs_recompute:
+            self.recompute(self.history_loader())
+        return applied
+
+    @property
+    def needs_recompute(self):
+        return self.stale or (self.recompute_every > 0 and self.updates_since_recompute >= self.recompute_every)
+
+    # ---------------------------------------------------------------- metrics
+
+    def metrics(self, periods_per_year=252):
+        """Current per-symbol metrics, O(symbols)."""
+        with np.errstate(divide='ignore', invalid='ignore'):
+            yearly = (self.last_close - self.first_close) / self.first_close * 100
+            std = np.sqrt(self.m2 / (self.n - 1))
+        return pd.DataFrame({
+            'Symbol': self.symbols,
+            'Yearly_Return': yearly,
+            'Volatility': np.where(self.n > 1, std * np.sqrt(periods_per_year) * 100, np.nan),
+            'Cumulative_Return': self.growth - 1,
+            'Observations': self.n.astype(int),
+        })
+
+    def correlation(self, min_periods=2):
+        """Pairwise-complete correlation of daily returns as a Symbol × Symbol frame."""
+        with np.errstate(divide='ignore', invalid='ignore'):
+            corr = self.pair_cov / np.sqrt(self.pair_m2 * self.pair_m2.T)
+        corr[self.pair_n < min_periods] = np.nan
+        np.fill_diagonal(corr, np.where(self.n >= min_periods, 1.0, np.nan))
+        return pd.DataFrame(corr, index=self.symbols, columns=self.symbols)
+
+    # ------------------------------------------------------- full recompute
+
+    @classmethod
+    def from_history(cls, df, **kwargs):
+        """Build the state from a full price history in one vectorized pass."""
+        engine = cls(**kwargs)
+        engine._load_state(as_price_matrix(df))
+        return engine
+
+    def _load_state(self, matrix):
+        close = matrix.close
+        returns = matrix.daily_returns()
+        valid_close = ~np.isnan(close)
+        valid = ~np.isnan(returns)
+        v = valid.astype(np.float64)
+        cols = np.arange(matrix.n_symbols)
+
+        self.symbols = list(matrix.symbols)
+        self.symbol_index = {s: i for i, s in enumerate(self.symbols)}
+
+        last_row = matrix.n_dates - 1 - valid_close[::-1].argmax(axis=0)
+        has_close = valid_close.any(axis=0)
+        self.first_close = matrix.first_close()
+        self.last_close = matrix.last_close()
+        self.prev_close = np.where(has_close, matrix.previous_close()[last_row, cols], np.nan)
+        self.last_return = np.where(has_close, returns[last_row, cols], np.nan)
+        self.last_date = np.where(has_close, matrix.dates.to_numpy()[last_row],
+                                  np.datetime64('NaT')).astype('datetime64[ns]')
+
+        self.n = v.sum(axis=0)
+        self.mean = np.nansum(returns, axis=0) / np.maximum(self.n, 1)
+        self.m2 = np.nansum((returns - self.mean) ** 2, axis=0)
+        self.growth = np.where(valid, 1 + returns, 1.0).prod(axis=0)
+
+        # Pairwise-complete moments from a few matrix products on centred returns
+        x = np.where(valid, returns - self.mean, 0.0)
+        self.pair_n = v.T @ v
+        sums = x.T @ v
+        safe_n = np.maximum(self.pair_n, 1)
+        self.pair_mean = sums / safe_n + self.mean[:, None]
+        self.pair_m2 = (x * x).T @ v - sums * sums / safe_n
+        self.pair_cov = x.T @ x - sums * sums.T / safe_n
+        self.updates_since_recompute = 0
+        self.stale = False
+
+        dates = matrix.dates.to_numpy(dtype='datetime64[ns]')
+        self._days = {}
+        for row in range(max(0, matrix.n_dates - self.revision_days), matrix.n_dates):
+            members = np.flatnonzero(valid[row])
+            self._days[dates[row]] = {int(i): float(returns[row, i]) for i in members}
+
+    def recompute(self, history):
+        """
+        Rebuild the state from the full history and return the drift of the
+        running metrics against it (max absolute differences).
+        """
+        before_metrics = self.metrics().set_index('Symbol')
+        before_corr = self.correlation()
+        self._load_state(as_price_matrix(history))
+        after_metrics = self.metrics().set_index('Symbol')
+        after_corr = self.correlation()
+
+        common = before_metrics.index.intersection(after_metrics.index)
+        drift = {}
+        for column in ('Yearly_Return', 'Volatility', 'Cumulative_Return'):
+            diff = (before_metrics.loc[common, column] - after_metrics.loc[common, column]).abs()
+            drift[column] = float(diff.max()) if len(diff.dropna()) else 0.0
+        corr_diff = (before_corr.loc[common, common] - after_corr.loc[common, common]).abs().to_numpy()
+        drift['Correlation'] = float(np.nanmax(corr_diff)) if np.isfinite(corr_diff).any() else 0.0
+        print(f"🔁 Incremental metrics recomputed; max drift {max(drift.values()):.2e}")
+        return drift
@@ -0,0 +1,182 @@
+# instrumentation.py - Per-stage wall time, CPU time, rows and memory for the pipeline
+import functools
+import json
+import os
+import sys
+import threading
+import time
+import tracemalloc
+from collections import deque
+from contextlib import contextmanager
+
+import pandas as pd
+
+# STOCK_STAGE_LOG=path appends every record as a JSON line;
+# STOCK_TRACE_MEMORY=1 turns on tracemalloc peak tracking (slower).
+# Every record carries max_rss_mb, the process's resident high-water mark.
+# tracemalloc has one peak counter per process, so peak_mb is only measured
+# for stages on the main thread (None elsewhere), and it includes whatever
+# other threads allocated while the stage ran.
+_config = {
+    'jsonl_path': os.environ.get('STOCK_STAGE_LOG'),
+    'trace_memory': os.environ.get('STOCK_TRACE_MEMORY', '') not in ('', '0'),
+}
+_records = deque(maxlen=2000)
+_records_lock = threading.Lock()
+_local = threading.local()
+
+
+def configure(jsonl_path=None, trace_memory=None):
+    """Set the JSON lines sink and/or switch tracemalloc peak tracking on or off."""
+    if jsonl_path is not None:
+        _config['jsonl_path'] = jsonl_path or None
+    if trace_memory is not None:
+        _config['trace_memory'] = bool(trace_memory)
+        if trace_memory and not tracemalloc.is_tracing():
+            tracemalloc.start()
+
+
+def _max_rss_mb():
+    """Process high-water resident memory in MB (None where unsupported)."""
+    try:
+        import resource
+    except ImportError:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / (1024 * 1024) if sys.platform == 'darwin' else peak / 1024
+
+
+def count_rows(value):
+    """Rows in a frame, series, PriceMatrix (observed cells) or the first item of a tuple."""
+    if isinstance(value, (pd.DataFrame, pd.Series)):
+        return len(value)
+    if hasattr(value, 'mask') and hasattr(value, 'symbols'):
+        return int(value.mask.sum())
+    if isinstance(value, tuple) and value:
+        return count_rows(value[0])
+    return None
+
+
+def _emit(record):
+    with _records_lock:
+        _records.append(record)
+    path = _config['jsonl_path']
+    if path:
+        try:
+            with open(path, 'a') as f:
+                f.write(json.dumps(record, default=str) + "\n")
+        except OSError as e:
+            print(f"⚠️ Stage log write failed: {e}")
+
+
+@contextmanager
+def stage(name, rows=None):
+    """
+    Time a block as one pipeline stage.
+
+    Yields the record dict; set record['rows'] inside the block when the row
+    count is only known there. Nested stages are recorded separately and
+    their memory peaks roll up into the enclosing stage. peak_mb is only
+    tracked on the main thread: resetting tracemalloc's shared peak from a
+    worker thread would corrupt the main thread's measurement.
+    """
+    tracing = (_config['trace_memory'] and tracemalloc.is_tracing()
+               and threading.current_thread() is threading.main_thread())
+    stack = getattr(_local, 'stack', None)
+    if stack is None:
+        stack = _local.stack = []
+    if tracing:
+        current, peak = tracemalloc.get_traced_memory()
+        if stack:
+            # Keep the parent's peak so far before resetting the shared counter
+            stack[-1]['_peak'] = max(stack[-1]['_peak'], peak)
+        tracemalloc.reset_peak()
+
+    record = {'stage': name, 'rows': rows, 'thread': threading.current_thread().name,
+              'started': time.time(), '_peak': 0, '_base': tracemalloc.get_traced_memory()[0] if tracing else 0}
+    stack.append(record)
+    wall_start, cpu_start = time.perf_counter(), time.thread_time()
+    error = None
+    try:
+        yield record
+    except BaseException as e:
+        error = type(e).__name__
+        raise
+    finally:
+        record['wall_s'] = time.perf_counter() - wall_start
+        record['cpu_s'] = time.thread_time() - cpu_start
+        stack.pop()
+        peak_bytes = None
+        if tracing:
+            peak_bytes = max(record['_peak'], tracemalloc.get_traced_memory()[1])
+            if stack:
+                stack[-1]['_peak'] = max(stack[-1]['_peak'], peak_bytes)
+        record['peak_mb'] = (peak_bytes - record['_base']) / 1e6 if peak_bytes is not None else None
+        record['max_rss_mb'] = _max_rss_mb()
+        record['error'] = error
+        del record['_peak'], record['_base']
+        _emit(record)
+
+
+def instrument(name=None, rows='input'):
+    """
+    Decorator form of stage(). rows='input' counts the rows of the first
+    argument (the data the stage processed), 'output' the returned value.
+    """
+    def decorate(func):
+        stage_name = name or func.__name__
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with stage(stage_name) as record:
+                if rows == 'input' and args:
+                    record['rows'] = count_rows(args[0])
+                result = func(*args, **kwargs)
+                if record['rows'] is None:
+                    record['rows'] = count_rows(result)
+                return result
+        return wrapper
+    return decorate
+
+
+def records(last=None):
+    """Recorded stages, oldest first (the most recent `last` only, if given)."""
+    with _records_lock:
+        items = list(_records)
+    return items[-last:] if last else items
+
+
+def clear():
+    with _records_lock:
+        _records.clear()
+
+
+def summary():
+    """
+    Per-stage totals: calls, wall/CPU seconds, last wall time, rows/sec, the
+    tracemalloc peak (when traced) and the process RSS high-water mark.
+    """
+    columns = ['stage', 'calls', 'wall_s', 'cpu_s', 'last_wall_s', 'rows', 'rows_per_sec', 'peak_mb', 'max_rss_mb']
+    items = records()
+    if not items:
+        return pd.DataFrame(columns=columns)
+    df = pd.DataFrame(items)
+    for column in ('rows', 'peak_mb', 'max_rss_mb'):
+        df[column] = pd.to_numeric(df[column], errors='coerce')
+    table = df.groupby('stage', sort=False).agg(
+        calls=('wall_s', 'size'), wall_s=('wall_s', 'sum'), cpu_s=('cpu_s', 'sum'),
+        last_wall_s=('wall_s', 'last'), rows=('rows', 'sum'), peak_mb=('peak_mb', 'max'),
+        max_rss_mb=('max_rss_mb', 'max'),
+    ).reset_index()
+    table['rows_per_sec'] = table['rows'] / table['wall_s'].where(table['wall_s'] > 0)
+    return table.sort_values('wall_s', ascending=False)[columns]
+
+
+def print_summary():
+    table = summary()
+    if table.empty:
+        print("⏱️ No stages recorded")
+        return
+    print("⏱️ STAGE TIMINGS")
+    with pd.option_context('display.width', 160, 'display.max_columns', 10):
+        print(table.round(4).to_string(index=False))
@@ -0,0 +1,117 @@
+# metrics_cache.py - On-disk cache of computed dashboard metrics keyed by a data fingerprint
+import hashlib
+import os
+import pickle
+from pathlib import Path
+
+# Bump when the analysis outputs change shape or precision so old entries stop matching
+CACHE_VERSION = 3
+
+
+def data_fingerprint(csv_dir="data/csv", sectors_file="data/sectors.csv", extra=()):
+    """
+    Cheap fingerprint of everything the metrics are computed from: the name,
+    size and mtime of every CSV, the columnar store's meta.json and
+    sectors.csv, plus CACHE_VERSION and any extra key parts.
+    """
+    files = sorted(Path(csv_dir).glob("*.csv"))
+    files.append(Path(csv_dir).parent / "store" / "meta.json")
+    files.append(Path(sectors_file))
+
+    digest = hashlib.sha256(f"v{CACHE_VERSION}|{'|'.join(map(str, extra))}\n".encode())
+    for path in files:
+        if path.exists():
+            stat = path.stat()
+            digest.update(f"{path.name}|{stat.st_size}|{stat.st_mtime_ns}\n".encode())
+    return digest.hexdigest()
+
+
+class MetricsCache:
+    """
+    Pickled artifacts in cache_dir, one file per key, evicted least recently
+    used first once the folder grows past max_bytes.
+
+    Files are written to a temporary name and renamed into place, so a
+    reader never sees a partial entry. A read refreshes the entry's mtime,
+    which is what eviction orders by.
+    """
+
+    def __init__(self, cache_dir="data/cache", max_bytes=512 * 1024 * 1024):
+        self.cache_dir = Path(cache_dir)
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+
+    def _path(self, key):
+        return self.cache_dir / f"{key}.pkl"
+
+    def get(self, key):
+        """The cached value for key, or None."""
+        path = self._path(key)
+        try:
+            with open(path, 'rb') as f:
+                value = pickle.load(f)
+        except (OSError, EOFError, pickle.UnpicklingError, AttributeError, ImportError):
+            self.misses += 1
+            return None
+        os.utime(path)
+        self.hits += 1
+        return value
+
+    def put(self, key, value):
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        path = self._path(key)
+        tmp_path = path.with_suffix(f".{os.getpid()}.tmp")
+        with open(tmp_path, 'wb') as f:
+            pickle.dump(value, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp_path, path)
+        self._evict(keep=path)
+
+    def get_or_compute(self, key, compute):
+        value = self.get(key)
+        if value is None:
+            value = compute()
+            self.put(key, value)
+        return value
+
+    def _entries(self):
+        entries = []
+        for path in self.cache_dir.glob("*.pkl"):
+            try:
+                stat = path.stat()
+            except OSError:
+                continue
+            entries.append((stat.st_mtime, stat.st_size, path))
+        return sorted(entries)
+
+    def _evict(self, keep=None):
+        """Drop the least recently used entries until the folder fits max_bytes."""
+        entries = self._entries()
+        total = sum(size for _, size, _ in entries)
+        for _, size, path in entries:
+            if total <= self.max_bytes:
+                break
+            if path == keep:
+                continue
+            try:
+                path.unlink()
+                total -= size
+            except OSError:
+                pass
+
+    def clear(self):
+        for _, _, path in self._entries():
+            path.unlink(missing_ok=True)
+
+    def info(self):
+        entries = self._entries()
+        return {'entries': len(entries), 'bytes': sum(size for _, size, _ in entries),
+                'max_bytes': self.max_bytes, 'hits': self.hits, 'misses': self.misses}
+
+
+if __name__ == "__main__":
+    cache = MetricsCache()
+    info = cache.info()
+    print(f"🗃️ {info['entries']} cached entries, {info['bytes'] / 1e6:.1f} MB "
+          f"(limit {info['max_bytes'] / 1e6:.0f} MB)")
+    print(f"🔑 Current data fingerprint: {data_fingerprint()[:16]}")
@@ -0,0 +1,202 @@
+# metrics_provider.py - Lazy, memoized dashboard artifacts computed on first access
+import threading
+import time
+
+import pandas as pd
+
+from analysis import (load_stock_data, calculate_key_metrics, calculate_volatility,
+                      calculate_cumulative_returns, get_sector_performance, get_monthly_leaders)
+from correlation import compute_correlation
+from instrumentation import stage, count_rows
+from price_index import PriceIndex
+from price_matrix import PriceMatrix
+from window_index import WindowIndex
+
+
+def _key_metrics(provider):
+    top_green, top_red, market_summary, yearly_returns = calculate_key_metrics(provider.get('price_matrix'))
+    return {'top_green': top_green, 'top_red': top_red,
+            'market_summary': market_summary, 'yearly_returns': yearly_returns}
+
+
+# name → (dependencies, compute). Analyses only run when their dependencies have data.
+# Prices are loaded as float64: they feed the float64 price matrix and the database
+# writer, and float32 would round anything past 7 significant digits.
+ARTIFACTS = {
+    'prices': ((), lambda p: load_stock_data(p.csv_dir, precision='float64')),
+    'price_matrix': (('prices',), lambda p: PriceMatrix.from_frame(p.get('prices'))),
+    'price_index': (('price_matrix',), lambda p: PriceIndex(p.get('price_matrix').to_frame())),
+    'key_metrics': (('price_matrix',), _key_metrics),
+    'volatility': (('price_matrix',), lambda p: calculate_volatility(p.get('price_matrix'))),
+    'cum_returns': (('price_matrix',), lambda p: calculate_cumulative_returns(p.get('price_matrix'))[0]),
+    'sector_perf': (('price_matrix',), lambda p: get_sector_performance(p.get('price_matrix'), p.sectors_file)),
+    'correlation': (('price_matrix',), lambda p: compute_correlation(p.get('price_matrix'))),
+    'monthly_analysis': (('price_matrix',), lambda p: get_monthly_leaders(p.get('price_matrix'), top_n=5)),
+    'window_index': (('price_matrix',), lambda p: WindowIndex(p.get('price_matrix'))),
+}
+
+# Artifacts that can come from an attached SharedPanel instead of this process's memory
+PANEL_ARTIFACTS = {
+    'price_matrix': lambda view: view.matrix,
+    'correlation': lambda view: view.correlation(),
+    'window_index': lambda view: view.window_index(),
+}
+
+# Cheaper to rebuild from the price matrix than to pickle to and from the disk cache
+UNCACHED = ('window_index',)
+
+# Artifacts holding a per-process long frame; prefetch skips them while the panel is attached
+LONG_FRAME_ARTIFACTS = ('prices', 'price_index')
+
+# What a consumer gets when there is no data to compute from
+EMPTY = {
+    'key_metrics': {'top_green': pd.DataFrame(), 'top_red': pd.DataFrame(),
+                    'market_summary': {}, 'yearly_returns': pd.DataFrame()},
+}
+
+
+def _is_empty(value):
+    return value is None or getattr(value, 'empty', False)
+
+
+class MetricsProvider:
+    """
+    Dashboard artifacts (prices, price matrix, key metrics, volatility, ...)
+    computed the first time something asks for them and memoized after.
+
+    With a MetricsCache and a data fingerprint, each artifact is also read
+    from / written to disk on its own, so a cold start only loads what the
+    current page uses. prefetch() computes the rest on a background thread;
+    a per-artifact lock makes a page request and the prefetch share one
+    computation. Listeners registered with on_computed see every freshly
+    computed (not disk-loaded) artifact.
+
+    With a SharedPanel (and a fingerprint), the price matrix, correlation
+    matrix and window index prefix sums are mapped read-only from the panel
+    when it holds this data, and published to it otherwise, so worker
+    processes share one copy. The price index is rebuilt from the mapped
+    matrix, so an attached worker never loads the long price frame.
+    """
+
+    def __init__(self, csv_dir="data/csv", sectors_file="data/sectors.csv", cache=None, fingerprint=None,
+                 panel=None):
+        self.csv_dir = csv_dir
+        self.sectors_file = sectors_file
+        self.cache = cache
+        self.fingerprint = fingerprint
+        self.panel = panel if fingerprint else None
+        self._panel_view = None
+        self.timings = {}
+        self._values = {}
+        self._locks = {name: threading.Lock() for name in ARTIFACTS}
+        self._listeners = []
+        self._prefetch_thread = None
+
+    def on_computed(self, callback):
+        """Call callback(name, value) whenever an artifact is computed from the data."""
+        self._listeners.append(callback)
+
+    def _cache_key(self, name):
+        if self.cache is None or not self.fingerprint or name in UNCACHED:
+            return None
+        return f"{self.fingerprint}-{name}"
+
+    def get(self, name):
+        """The artifact called name, computing (and memoizing) it on first access."""
+        if name in self._values:
+            return self._values[name]
+        if name not in ARTIFACTS:
+            raise KeyError(f"Unknown artifact: {name}")
+
+        with self._locks[name]:
+            if name in self._values:
+                return self._values[name]
+
+            start = time.perf_counter()
+            with stage(f"provider.{name}") as record:
+                value = self._from_panel(name)
+                source = 'panel'
+                if value is None:
+                    key = self._cache_key(name)
+                    value = self.cache.get(key) if key else None
+                    source = 'disk'
+                    if value is None:
+                        value = self._compute(name)
+                        source = 'computed'
+                        if key and not _is_empty(value):
+                            try:
+                                self.cache.put(key, value)
+                            except Exception as e:
+                                print(f"⚠️ Metrics cache write failed for {name}: {e}")
+                        for callback in self._listeners:
+                            callback(name, value)
+                    self._publish(name, value)
+                record['rows'] = count_rows(value)
+                record['source'] = source
+
+            self.timings[name] = (source, time.perf_counter() - start)
+            self._values[name] = value
+            return value
+
+    def _attach(self):
+        """The attached PanelView, or None when this provider has no panel or nothing is published yet."""
+        if self.panel is not None and self._panel_view is None:
+            # Cheap (one small JSON read), so keep trying until a worker has published
+            self._panel_view = self.panel.attach(self.fingerprint)
+        return self._panel_view
+
+    def _from_panel(self, name):
+        if name not in PANEL_ARTIFACTS:
+            return None
+        view = self._attach()
+        return PANEL_ARTIFACTS[name](view) if view is not None else None
+
+    def _publish(self, name, value):
+        """Hand a freshly loaded price or correlation matrix to the shared panel."""
+        if self.panel is None or name not in PANEL_ARTIFACTS or _is_empty(value):
+            return
+        try:
+            if name == 'price_matrix':
+                self.panel.publish(value, fingerprint=self.fingerprint)
+            elif name == 'window_index':
+                self.panel.add_metrics(value.to_metrics(), fingerprint=self.fingerprint)
+            else:
+                self.panel.add_metric(name, value.values, fingerprint=self.fingerprint)
+        except Exception as e:
+            print(f"⚠️ Shared panel publish failed for {name}: {e}")
+
+    def panel_version(self):
+        """Version of the attached shared panel (None when this process is not using one)."""
+        return self._panel_view.version if self._panel_view is not None else None
+
+    def _compute(self, name):
+        depends, compute = ARTIFACTS[name]
+        if any(_is_empty(self.get(dep)) for dep in depends):
+            return EMPTY.get(name, pd.DataFrame())
+        return compute(self)
+
+    def computed(self):
+        """Names of the artifacts available so far."""
+        return [name for name in ARTIFACTS if name in self._values]
+
+    def prefetch(self, names=None):
+        """
+        Compute the remaining artifacts on a background thread (once). While a
+        shared panel is attached, the long-frame artifacts are left to be
+        built on demand.
+        """
+        if self._prefetch_thread is not None:
+            return self._prefetch_thread
+
+        def run():
+            for name in names or ARTIFACTS:
+                if name in LONG_FRAME_ARTIFACTS and name not in self._values and self._attach() is not None:
+                    continue
+                try:
+                    self.get(name)
+                except Exception as e:
+                    print(f"⚠️ Prefetch of {name} failed: {e}")
+
+        self._prefetch_thread = threading.Thread(target=run, name="metrics-prefetch", daemon=True)
+        self._prefetch_thread.start()
+        return self._prefetch_thread
@@ -0,0 +1,265 @@
+# persistence.py - Delta-only bulk upsert of prices into the stock_prices table
+import atexit
+import queue
+import threading
+import time
+
+import pandas as pd
+from sqlalchemy import create_engine, text
+
+from db_schema import SCHEMA
+from instrumentation import instrument
+from price_schema import require_exact_prices
+
+# Frame column → stock_prices column
+PRICE_COLUMNS = {
+    'Symbol': 'symbol',
+    'Date': 'date',
+    'Open': 'open_price',
+    'High': 'high_price',
+    'Low': 'low_price',
+    'Close': 'close_price',
+    'Volume': 'volume',
+}
+
+# Rows that slipped in between the anti-join and the insert are skipped, not errors
+INSERT_IGNORE = {
+    'mysql': "INSERT IGNORE INTO",
+    'sqlite': "INSERT OR IGNORE INTO",
+}
+
+
+def sqlite_engine(db_path="stocks_local.db"):
+    """SQLite engine with the same tables, for running the persistence path locally."""
+    engine = create_engine(f"sqlite:///{db_path}")
+    ensure_schema(engine)
+    return engine
+
+
+def ensure_schema(engine):
+    """Create stocks / stock_prices if they do not exist yet."""
+    statements = SCHEMA.get(engine.dialect.name, SCHEMA['sqlite'])
+    with engine.begin() as conn:
+        for statement in statements:
+            conn.execute(text(statement))
+
+
+def _insert_sql(dialect, table, columns):
+    names = ", ".join(columns)
+    params = ", ".join(f":{c}" for c in columns)
+    if dialect in INSERT_IGNORE:
+        return f"{INSERT_IGNORE[dialect]} {table} ({names}) VALUES ({params})"
+    return f"INSERT INTO {table} ({names}) VALUES ({params}) ON CONFLICT DO NOTHING"
+
+
+def _normalize(df):
+    """Rename to the table's columns, dates as DATE (no time), one row per (symbol, date)."""
+    rows = require_exact_prices(df[[c for c in PRICE_COLUMNS if c in df.columns]]).rename(columns=PRICE_COLUMNS)
+    rows = rows.dropna(subset=['symbol', 'date'])
+    rows['symbol'] = rows['symbol'].astype(str)
+    rows['date'] = pd.to_datetime(rows['date']).dt.date
+    return rows.drop_duplicates(subset=['symbol', 'date'], keep='last').reset_index(drop=True)
+
+
+def _existing_keys(conn, rows):
+    """(symbol, date) keys already stored within the date span of rows."""
+    existing = pd.read_sql(
+        text("SELECT symbol, date FROM stock_prices WHERE date BETWEEN :start AND :end"),
+        conn, params={'start': rows['date'].min(), 'end': rows['date'].max()},
+    )
+    existing['date'] = pd.to_datetime(existing['date']).dt.date
+    return existing
+
+
+def _records(rows):
+    """Plain Python values for the DB-API driver (NaN → NULL, numpy scalars → builtins)."""
+    rows = rows.astype(object).where(rows.notna(), None)
+    if 'volume' in rows:
+        rows['volume'] = [None if v is None else int(v) for v in rows['volume']]
+    return rows.to_dict('records')
+
+
+@instrument()
+def upsert_prices(df, engine, chunk_size=5000, create_schema=True):
+    """
+    Insert the rows of df that are not yet in stock_prices, keyed on (symbol, date).
+
+    Existing keys in df's date span are anti-joined away first, so a reload of
+    unchanged data writes nothing. Missing symbols are added to stocks (the
+    foreign key), then new rows go in as chunked executemany batches inside a
+    single transaction. Returns counts and throughput.
+    """
+    start = time.perf_counter()
+    stats = {'rows': len(df), 'new_rows': 0, 'inserted': 0, 'new_symbols': 0,
+             'seconds': 0.0, 'rows_per_sec': 0.0}
+    if df.empty:
+        return stats
+
+    if create_schema:
+        ensure_schema(engine)
+    dialect = engine.dialect.name
+    rows = _normalize(df)
+
+    with engine.begin() as conn:
+        existing = _existing_keys(conn, rows)
+        if not existing.empty:
+            merged = rows.merge(existing, on=['symbol', 'date'], how='left', indicator=True)
+            rows = rows[(merged['_merge'] == 'left_only').to_numpy()]
+        stats['new_rows'] = len(rows)
+
+        if not rows.empty:
+            known = set(pd.read_sql(text("SELECT symbol FROM stocks"), conn)['symbol'])
+            new_symbols = [s for s in pd.unique(rows['symbol']) if s not in known]
+            if new_symbols:
+                conn.execute(text(_insert_sql(dialect, 'stocks', ['symbol'])),
+                             [{'symbol': s} for s in new_symbols])
+            stats['new_symbols'] = len(new_symbols)
+
+            insert = text(_insert_sql(dialect, 'stock_prices', list(rows.columns)))
+            for offset in range(0, len(rows), chunk_size):
+                result = conn.execute(insert, _records(rows.iloc[offset:offset + chunk_size]))
+                stats['inserted'] += max(result.rowcount, 0)
+
+    elapsed = time.perf_counter() - start
+    stats['seconds'] = elapsed
+    stats['rows_per_sec'] = stats['new_rows'] / elapsed if elapsed > 0 else 0.0
+    print(f"💾 stock_prices: {stats['new_rows']:,} new of {stats['rows']:,} rows "
+          f"in {elapsed:.2f}s ({stats['rows_per_sec']:,.0f} rows/sec)")
+    return stats
+
+
+class BackgroundWriter:
+    """
+    Write-behind queue so callers never wait on the database.
+
+    submit_prices(df) queues price rows for upsert_prices; submit_snapshot(name,
+    df) queues a metric table that replaces metric_<name>. A daemon thread
+    drains everything queued so far into one batch (price frames are
+    concatenated, only the latest snapshot per name is kept), retries failed
+    batches with exponential backoff and flushes what is left at interpreter
+    exit. status() is a cheap, lock-protected read for the UI.
+    """
+
+    def __init__(self, engine, max_retries=5, backoff=1.0, max_backoff=30.0, flush_timeout=10.0):
+        self.engine = engine
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.flush_timeout = flush_timeout
+        self._queue = queue.Queue()
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._stats = {'connected': None, 'written_rows': 0, 'written_snapshots': 0,
+                       'batches': 0, 'retries': 0, 'dropped_batches': 0,
+                       'last_error': None, 'last_write': None, 'oldest_pending': None}
+        self._thread = threading.Thread(target=self._run, name="db-writer", daemon=True)
+        self._thread.start()
+        atexit.register(self.close)
+
+    def submit_prices(self, df):
+        if df is not None and not df.empty:
+            # Fail in the caller rather than on the writer thread
+            require_exact_prices(df)
+            self._queue.put(('prices', None, df, time.time()))
+
+    def submit_snapshot(self, name, df):
+        if df is not None and not df.empty:
+            self._queue.put(('snapshot', name, df, time.time()))
+
+    def status(self):
+        """Queue depth, lag of the oldest unwritten item (seconds) and write counters."""
+        with self._lock:
+            stats = dict(self._stats)
+        oldest = stats.pop('oldest_pending')
+        with self._queue.mutex:
+            if self._queue.queue:
+                queued = self._queue.queue[0][3]
+                oldest = queued if oldest is None else min(oldest, queued)
+        stats['queue_depth'] = self._queue.qsize()
+        stats['lag_s'] = time.time() - oldest if oldest is not None else 0.0
+        return stats
+
+    def _set(self, **values):
+        with self._lock:
+            self._stats.update(values)
+
+    def _drain(self, first):
+        """The first item plus everything else already queued."""
+        items = [first]
+        while True:
+            try:
+                items.append(self._queue.get_nowait())
+            except queue.Empty:
+                return items
+
+    def _write_batch(self, items):
+        prices = [df for kind, _, df, _ in items if kind == 'prices']
+        snapshots = {name: df for kind, name, df, _ in items if kind == 'snapshot'}
+        written = 0
+        if prices:
+            written = upsert_prices(pd.concat(prices, ignore_index=True), self.engine)['new_rows']
+        for name, df in snapshots.items():
+            df.to_sql(f"metric_{name}", self.engine, if_exists='replace', index=False, chunksize=5000)
+        return written, len(snapshots)
+
+    def _run(self):
+        try:
+            with self.engine.connect() as conn:
+                conn.execute(text("SELECT 1"))
+            self._set(connected=True)
+        except Exception as e:
+            self._set(connected=False, last_error=str(e))
+
+        while True:
+            try:
+                first = self._queue.get(timeout=0.5)
+            except queue.Empty:
+                if self._stop.is_set():
+                    return
+                continue
+
+            items = self._drain(first)
+            self._set(oldest_pending=min(item[3] for item in items))
+            delay = self.backoff
+            for attempt in range(self.max_retries + 1):
+                try:
+                    rows, snapshots = self._write_batch(items)
+                except Exception as e:
+                    print(f"⚠️ Background DB write failed (attempt {attempt + 1}): {e}")
+                    with self._lock:
+                        self._stats.update(connected=False, last_error=str(e))
+                        self._stats['retries'] += 1
+                    # On shutdown, give up instead of sleeping through the exit
+                    if self._stop.is_set() or attempt == self.max_retries:
+                        with self._lock:
+                            self._stats['dropped_batches'] += 1
+                        break
+                    self._stop.wait(delay)
+                    delay = min(delay * 2, self.max_backoff)
+                else:
+                    with self._lock:
+                        self._stats['written_rows'] += rows
+                        self._stats['written_snapshots'] += snapshots
+                        self._stats['batches'] += 1
+                        self._stats.update(connected=True, last_error=None, last_write=time.time())
+                    break
+            self._set(oldest_pending=None)
+            for _ in items:
+                self._queue.task_done()
+
+    def close(self):
+        """Flush queued writes (bounded by flush_timeout) and stop the thread."""
+        if self._stop.is_set():
+            return
+        self._stop.set()
+        self._thread.join(self.flush_timeout)
+        pending = self._queue.qsize()
+        if pending:
+            print(f"⚠️ Background DB writer exited with {pending} unwritten item(s)")
+
+
+if __name__ == "__main__":
+    from analysis import load_stock_data
+
+    engine = sqlite_engine()
+    upsert_prices(load_stock_data(precision='float64'), engine)
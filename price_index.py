@@ -0,0 +1,151 @@
+# price_index.py - Per-symbol row offsets and date binary search over the long price frame
+import numpy as np
+import pandas as pd
+
+
+class PriceIndex:
+    """
+    Query layer over the long (Symbol, Date, ...) frame.
+
+    The frame is sorted by Symbol then Date once; each symbol's rows are then
+    one contiguous slice (offsets), and a date range inside a slice is two
+    binary searches. A page of k filtered rows therefore costs
+    O(symbols + log rows + k) instead of a scan of the whole frame.
+    """
+
+    def __init__(self, df):
+        if not df.empty and not _is_sorted(df):
+            df = df.sort_values(['Symbol', 'Date'], kind='stable')
+        self.df = df.reset_index(drop=True)
+        self.n_rows = len(self.df)
+        self._sorted_by = {}
+
+        if self.df.empty:
+            self.symbols = np.empty(0, dtype=object)
+            self.offsets = np.zeros(1, dtype=np.int64)
+            self.dates = np.empty(0, dtype='datetime64[ns]')
+        else:
+            symbol_values = self.df['Symbol'].to_numpy()
+            starts = np.flatnonzero(np.r_[True, symbol_values[1:] != symbol_values[:-1]])
+            self.symbols = symbol_values[starts].astype(object)
+            self.offsets = np.r_[starts, self.n_rows].astype(np.int64)
+            self.dates = pd.to_datetime(self.df['Date']).to_numpy(dtype='datetime64[ns]')
+        self.symbol_index = {s: i for i, s in enumerate(self.symbols)}
+
+    @property
+    def empty(self):
+        return self.n_rows == 0
+
+    @property
+    def date_range(self):
+        if self.empty:
+            return None, None
+        return pd.Timestamp(self.dates.min()), pd.Timestamp(self.dates.max())
+
+    def _bounds(self, start, end):
+        lo = None if start is None else np.datetime64(pd.Timestamp(start), 'ns')
+        hi = None
+        if end is not None:
+            end = pd.Timestamp(end)
+            # A date-only end covers that whole day
+            hi = np.datetime64(end + pd.Timedelta(days=1) if end == end.normalize() else end, 'ns')
+            hi_side = 'left' if end == end.normalize() else 'right'
+        else:
+            hi_side = 'right'
+        return lo, hi, hi_side
+
+    def ranges(self, symbols=None, start=None, end=None):
+        """(first_row, stop_row) per requested symbol, clipped to the date range."""
+        if symbols is None:
+            positions = range(len(self.symbols))
+        else:
+            positions = sorted({self.symbol_index[s] for s in symbols if s in self.symbol_index})
+        lo_date, hi_date, hi_side = self._bounds(start, end)
+
+        result = []
+        for pos in positions:
+            first, stop = self.offsets[pos], self.offsets[pos + 1]
+            if lo_date is not None:
+                first += np.searchsorted(self.dates[first:stop], lo_date, side='left')
+            if hi_date is not None:
+                stop = self.offsets[pos] + np.searchsorted(self.dates[self.offsets[pos]:stop], hi_date, side=hi_side)
+            if stop > first:
+                result.append((int(first), int(stop)))
+        return result
+
+    def count(self, symbols=None, start=None, end=None):
+        return sum(stop - first for first, stop in self.ranges(symbols, start, end))
+
+    def rows(self, symbols=None, start=None, end=None):
+        """Row positions of the matching rows, in (Symbol, Date) order."""
+        spans = self.ranges(symbols, start, end)
+        if not spans:
+            return np.empty(0, dtype=np.int64)
+        return np.concatenate([np.arange(first, stop) for first, stop in spans])
+
+    def select(self, symbols=None, start=None, end=None):
+        """The matching rows as a frame (replaces df[df['Symbol'].isin(...)] scans)."""
+        return self.df.iloc[self.rows(symbols, start, end)]
+
+    def _order(self, column):
+        """Row positions sorted by column, computed once per column."""
+        if column not in self._sorted_by:
+            self._sorted_by[column] = np.argsort(self.df[column].to_numpy(), kind='stable')
+        return self._sorted_by[column]
+
+    def page(self, symbols=None, start=None, end=None, page=0, page_size=100,
+             sort_by=None, ascending=True):
+        """
+        One page of the filtered rows and the total number of matches.
+
+        In the natural (Symbol, Date) order the page is located through the
+        per-symbol spans directly. Sorting by another column uses a once-per-
+        column argsort when nothing is filtered, and sorts only the matching
+        rows otherwise.
+        """
+        spans = self.ranges(symbols, start, end)
+        lengths = np.array([stop - first for first, stop in spans], dtype=np.int64)
+        total = int(lengths.sum())
+        begin = max(0, page) * page_size
+        if begin >= total:
+            return self.df.iloc[0:0], total
+        count = min(page_size, total - begin)
+
+        if sort_by in (None, 'Symbol'):
+            # Descending is the same walk from the other end
+            if not ascending:
+                begin = total - begin - count
+            ends = np.cumsum(lengths)
+            first_span = int(np.searchsorted(ends, begin, side='right'))
+            picked, remaining, position = [], count, begin
+            for span in range(first_span, len(spans)):
+                span_first = spans[span][0] + (position - (ends[span] - lengths[span]))
+                take = min(remaining, spans[span][1] - span_first)
+                picked.append(np.arange(span_first, span_first + take))
+                remaining -= take
+                position += take
+                if remaining == 0:
+                    break
+            rows = np.concatenate(picked)
+            if not ascending:
+                rows = rows[::-1]
+        elif total == self.n_rows:
+            order = self._order(sort_by)
+            rows = order[begin:begin + count] if ascending else order[::-1][begin:begin + count]
+        else:
+            matches = self.rows(symbols, start, end)
+            values = self.df[sort_by].to_numpy()[matches]
+            order = np.argsort(values, kind='stable')
+            if not ascending:
+                order = order[::-1]
+            rows = matches[order[begin:begin + count]]
+        return self.df.iloc[rows], total
+
+
+def _is_sorted(df):
+    symbols = df['Symbol'].to_numpy()
+    if not (symbols[1:] >= symbols[:-1]).all():
+        return False
+    dates = pd.to_datetime(df['Date']).to_numpy()
+    same_symbol = symbols[1:] == symbols[:-1]
+    return bool((dates[1:] >= dates[:-1])[same_symbol].all())
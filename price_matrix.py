@@ -0,0 +1,208 @@
+# price_matrix.py - Dense date × symbol price layout shared by the analysis functions
+import numpy as np
+import pandas as pd
+
+from instrumentation import instrument
+
+FIELDS = ('Open', 'High', 'Low', 'Close', 'Volume')
+
+
+class PriceMatrix:
+    """
+    Aligned (n_dates, n_symbols) arrays for Open/High/Low/Close/Volume.
+
+    Built once from the long frame returned by load_stock_data. Every field is
+    a C-contiguous float array on the shared trading calendar `dates`; cells
+    where a symbol has no row are NaN and False in `mask`.
+    """
+
+    def __init__(self, symbols, dates, fields, mask):
+        self.symbols = np.asarray(symbols, dtype=object)
+        self.dates = pd.DatetimeIndex(dates)
+        self.fields = fields
+        self.mask = mask
+        self.symbol_index = {symbol: i for i, symbol in enumerate(self.symbols)}
+
+    @classmethod
+    @instrument('PriceMatrix.from_frame', rows='output')
+    def from_frame(cls, df, dtype=np.float64):
+        """Scatter a long (Symbol, Date, ...) frame into the dense layout in one pass."""
+        sym_codes, symbols = pd.factorize(df['Symbol'], sort=True)
+        date_codes, dates = pd.factorize(pd.to_datetime(df['Date']), sort=True)
+        shape = (len(dates), len(symbols))
+
+        fields = {}
+        for field in FIELDS:
+            if field not in df.columns:
+                continue
+            values = np.full(shape, np.nan, dtype=dtype)
+            values[date_codes, sym_codes] = df[field].to_numpy(dtype=dtype, na_value=np.nan)
+            fields[field] = values
+
+        mask = np.zeros(shape, dtype=bool)
+        mask[date_codes, sym_codes] = True
+        return cls(np.asarray(symbols), dates, fields, mask)
+
+    @property
+    def n_dates(self):
+        return len(self.dates)
+
+    @property
+    def n_symbols(self):
+        return len(self.symbols)
+
+    @property
+    def empty(self):
+        return self.n_symbols == 0 or self.n_dates == 0
+
+    def __getitem__(self, field):
+        return self.fields[field]
+
+    @property
+    def close(self):
+        return self.fields['Close']
+
+    @property
+    def volume(self):
+        return self.fields.get('Volume')
+
+    def select(self, symbols):
+        """Sub-matrix for a subset of symbols (columns are copied, dates are shared)."""
+        cols = np.array([self.symbol_index[s] for s in symbols if s in self.symbol_index], dtype=np.int64)
+        fields = {name: np.ascontiguousarray(values[:, cols]) for name, values in self.fields.items()}
+        return PriceMatrix(self.symbols[cols], self.dates, fields, np.ascontiguousarray(self.mask[:, cols]))
+
+    def to_frame(self):
+        """
+        The long (Symbol, Date, ...) frame back from the mask, in (Symbol, Date)
+        order with a categorical Symbol; Volume is int64 when every value is whole.
+        """
+        date_rows, sym_cols = np.nonzero(self.mask.T)[::-1]
+        data = {'Symbol': pd.Categorical.from_codes(sym_cols, categories=pd.Index(self.symbols, dtype=object)),
+                'Date': self.dates.to_numpy()[date_rows]}
+        for name, values in self.fields.items():
+            column = values[date_rows, sym_cols]
+            if name == 'Volume' and not np.isnan(column).any() and np.array_equal(column, np.floor(column)):
+                column = column.astype(np.int64)
+            data[name] = column
+        return pd.DataFrame(data, copy=False)
+
+    def _valid_close(self):
+        return ~np.isnan(self.close)
+
+    def first_close(self):
+        """First non-missing close per symbol (NaN for symbols with no close)."""
+        valid = self._valid_close()
+        first = valid.argmax(axis=0)
+        values = self.close[first, np.arange(self.n_symbols)]
+        return np.where(valid.any(axis=0), values, np.nan)
+
+    def last_close(self):
+        """Last non-missing close per symbol (NaN for symbols with no close)."""
+        valid = self._valid_close()
+        last = self.n_dates - 1 - valid[::-1].argmax(axis=0)
+        values = self.close[last, np.arange(self.n_symbols)]
+        return np.where(valid.any(axis=0), values, np.nan)
+
+    def previous_close(self):
+        """Close of each symbol's previous trading row, skipping calendar gaps."""
+        valid = self._valid_close()
+        rows = np.where(valid, np.arange(self.n_dates)[:, None], -1)
+        np.maximum.accumulate(rows, axis=0, out=rows)
+        prev_rows = np.full_like(rows, -1)
+        prev_rows[1:] = rows[:-1]
+        prev = self.close[np.maximum(prev_rows, 0), np.arange(self.n_symbols)]
+        return np.where(prev_rows >= 0, prev, np.nan)
+
+    def daily_returns(self):
+        """
+        Simple daily returns per symbol, close / previous close - 1.
+
+        Matches a per-symbol pct_change: the previous close is the symbol's own
+        previous row, so gaps in the shared calendar do not break the series.
+        NaN on each symbol's first row and wherever the symbol has no close.
+        """
+        with np.errstate(divide='ignore', invalid='ignore'):
+            returns = self.close / self.previous_close() - 1
+        returns[~self._valid_close()] = np.nan
+        return returns
+
+    def volatility(self, periods_per_year=252):
+        """Annualized volatility (%) of daily returns per symbol; NaN with fewer than two returns."""
+        returns = self.daily_returns()
+        counts = (~np.isnan(returns)).sum(axis=0)
+        mean = np.nansum(returns, axis=0) / np.maximum(counts, 1)
+        dev = np.where(np.isnan(returns), 0.0, returns - mean)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            std = np.sqrt((dev * dev).sum(axis=0) / (counts - 1))
+        return np.where(counts > 1, std * np.sqrt(periods_per_year) * 100, np.nan)
+
+    def cumulative_returns(self):
+        """
+        Cumulative return path per symbol, (1 + r).cumprod() - 1.
+
+        The product of a symbol's daily returns telescopes to close / first close,
+        so each path starts at 0 on the symbol's own first date. NaN where the
+        symbol has no close.
+        """
+        with np.errstate(divide='ignore', invalid='ignore'):
+            cumulative = self.close / self.first_close() - 1
+        return cumulative
+
+    def yearly_returns(self):
+        """First/last close and percentage return over the loaded span, one row per symbol."""
+        first = self.first_close()
+        last = self.last_close()
+        with np.errstate(divide='ignore', invalid='ignore'):
+            ret = (last - first) / first * 100
+        return pd.DataFrame({
+            'Symbol': self.symbols,
+            'first': first,
+            'last': last,
+            'Yearly_Return': np.where(np.isnan(ret), 0.0, ret),
+        })
+
+    def monthly_returns(self):
+        """
+        Month × symbol percentage returns from each month's first and last close.
+
+        Returns (months, returns) where months is a PeriodIndex and returns is a
+        (n_months, n_symbols) array, NaN where a symbol has no close that month.
+        One pass over the matrix builds "first valid row at or after t" and
+        "last valid row at or before t" indices; each month then reads two rows.
+        """
+        n_dates = self.n_dates
+        valid = self._valid_close()
+        row = np.arange(n_dates)[:, None]
+
+        last_at = np.where(valid, row, -1)
+        np.maximum.accumulate(last_at, axis=0, out=last_at)
+        first_from = np.where(valid, row, n_dates)
+        first_from = np.minimum.accumulate(first_from[::-1], axis=0)[::-1]
+
+        month_codes, months = pd.factorize(self.dates.to_period('M'), sort=True)
+        starts = np.searchsorted(month_codes, np.arange(len(months)), side='left')
+        ends = np.searchsorted(month_codes, np.arange(len(months)), side='right')
+
+        first_rows = first_from[starts]          # (n_months, n_symbols)
+        last_rows = last_at[ends - 1]
+        present = (first_rows < ends[:, None]) & (last_rows >= starts[:, None])
+
+        cols = np.arange(self.n_symbols)
+        first = self.close[np.minimum(first_rows, n_dates - 1), cols]
+        last = self.close[np.maximum(last_rows, 0), cols]
+        with np.errstate(divide='ignore', invalid='ignore'):
+            returns = (last - first) / first * 100
+        returns[~present] = np.nan
+        return pd.PeriodIndex(months), returns
+
+    def returns_frame(self):
+        """Daily returns as a Date × Symbol DataFrame (for pandas consumers)."""
+        return pd.DataFrame(self.daily_returns(), index=self.dates, columns=self.symbols)
+
+
+def as_price_matrix(data):
+    """Accept either a long price frame or an already built PriceMatrix."""
+    if isinstance(data, PriceMatrix):
+        return data
+    return PriceMatrix.from_frame(data)
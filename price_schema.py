@@ -0,0 +1,99 @@
+# price_schema.py - Declared compact dtypes for the in-memory price frame
+import sys
+
+import numpy as np
+import pandas as pd
+
+PRICE_FIELDS = ('Open', 'High', 'Low', 'Close')
+PRECISIONS = {'float32': np.float32, 'float64': np.float64}
+
+# Symbol: categorical (one small code per row instead of a string reference)
+# Open/High/Low/Close: float32 by default, float64 on request
+# Volume: uint32, or uint64 when a value does not fit (float64 if any are missing)
+# Date: datetime64, unchanged
+
+
+def volume_dtype(volume):
+    """Smallest unsigned integer dtype that holds every volume exactly."""
+    values = volume.to_numpy()
+    if len(values) == 0:
+        return np.dtype(np.uint32)
+    if volume.isna().any():
+        # Missing volumes stay NaN rather than turning into a fake 0
+        return np.dtype(np.float64)
+    if values.dtype.kind == 'f' and not np.array_equal(values, np.floor(values)):
+        return np.dtype(np.float64)
+    if values.min() < 0:
+        return np.dtype(np.int64)
+    return np.dtype(np.uint32) if values.max() <= np.iinfo(np.uint32).max else np.dtype(np.uint64)
+
+
+def _object_bytes(codes, categories):
+    """Footprint of the same column as strings: one reference per row plus each distinct string."""
+    return 8 * len(codes) + sum(sys.getsizeof(str(c)) for c in categories)
+
+
+def compact_prices(df, precision='float32', verbose=True):
+    """
+    Convert a long price frame to the compact schema, column by column.
+
+    Only the converted columns are rebuilt; anything else is passed through.
+    float32 keeps about 7 significant digits, so 123456.78 becomes 123456.78125.
+    precision='float64' keeps the exact prices; use it for anything that
+    writes prices out (database, exports) or reports them. The printed
+    "before" size is the wide schema (string Symbol, 8-byte numbers), also
+    when the input already arrives partly compact.
+    """
+    if df.empty:
+        return df
+    price_dtype = np.dtype(PRECISIONS[precision])
+
+    columns = {}
+    before = after = 0
+    for name in df.columns:
+        column = df[name]
+        if name == 'Symbol':
+            if isinstance(column.dtype, pd.CategoricalDtype):
+                converted = column
+                codes, categories = column.cat.codes.to_numpy(), column.cat.categories
+            else:
+                codes, categories = pd.factorize(column, sort=True)
+                converted = pd.Series(pd.Categorical.from_codes(codes, categories=pd.Index(categories, dtype=object)),
+                                      index=df.index, name=name)
+            before += _object_bytes(codes, categories)
+        elif name in PRICE_FIELDS or name == 'Volume':
+            dtype = price_dtype if name in PRICE_FIELDS else volume_dtype(column)
+            converted = column.astype(dtype)
+            before += 8 * len(column)
+        else:
+            converted = column
+            before += column.memory_usage(index=False, deep=True)
+        after += converted.memory_usage(index=False, deep=True)
+        columns[name] = converted
+
+    result = pd.DataFrame(columns, index=df.index, copy=False)
+    if verbose:
+        rows = len(df)
+        print(f"🗜️ Compact schema: {before / rows:.1f} → {after / rows:.1f} bytes/row "
+              f"({(before - after) / 1e6:.1f} MB saved)")
+    return result
+
+
+def bytes_per_row(df):
+    """In-memory bytes per row (deep, so string columns count their text)."""
+    if df.empty:
+        return 0.0
+    return float(df.memory_usage(index=False, deep=True).sum()) / len(df)
+
+
+def require_exact_prices(df):
+    """
+    Refuse float32 price columns in data headed for a writer (database,
+    exports): the digits float32 dropped cannot be recovered, so writers
+    must load with precision='float64'.
+    """
+    lossy = [name for name in PRICE_FIELDS if name in df.columns and df[name].dtype == np.float32]
+    if lossy:
+        raise ValueError(f"float32 prices ({', '.join(lossy)}) cannot be written exactly; "
+                         f"load with precision='float64'")
+    return df
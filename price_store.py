@@ -0,0 +1,249 @@
+# price_store.py - Columnar on-disk price store (one .npy file per column)
+import hashlib
+import json
+import os
+import time
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+STORE_VERSION = 2
+PRICE_COLUMNS = ['Date', 'Open', 'High', 'Low', 'Close', 'Volume']
+META_FILE = "meta.json"
+
+
+def default_store_dir(csv_dir="data/csv"):
+    """The store lives next to the CSV folder (data/csv → data/store)."""
+    return str(Path(csv_dir).parent / "store")
+
+
+def store_exists(store_dir):
+    return (Path(store_dir) / META_FILE).exists()
+
+
+def csv_fingerprint(csv_dir):
+    """Hash of the name, size and mtime of every per-symbol CSV in csv_dir."""
+    digest = hashlib.sha256()
+    for path in sorted(Path(csv_dir).glob("*.csv")):
+        stat = path.stat()
+        digest.update(f"{path.name}|{stat.st_size}|{stat.st_mtime_ns}\n".encode())
+    return digest.hexdigest()
+
+
+def store_is_fresh(store_dir, csv_dir):
+    """
+    True when the store was built from exactly the CSVs now in csv_dir: an
+    added, removed, replaced or touched file (whatever its mtime) makes it stale.
+    """
+    meta_path = Path(store_dir) / META_FILE
+    if not meta_path.exists() or not os.path.isdir(csv_dir):
+        return False
+    try:
+        source = read_store_meta(store_dir).get('csv_fingerprint')
+    except (OSError, ValueError):
+        return False
+    return source is not None and source == csv_fingerprint(csv_dir)
+
+
+def _save_column(path, values):
+    # Write to a temp file first so readers never see a half-written column
+    tmp_path = path.with_name(f".{path.name}.tmp")
+    with open(tmp_path, 'wb') as f:
+        np.save(f, np.ascontiguousarray(values))
+    os.replace(tmp_path, path)
+
+
+def _column_values(df, column):
+    if column == 'Date':
+        return pd.to_datetime(df['Date']).to_numpy(dtype='datetime64[ns]')
+    return df[column].to_numpy()
+
+
+def _write_meta(store_path, meta):
+    # meta.json goes last: it is the commit point for the new data
+    tmp_meta = store_path / f".{META_FILE}.tmp"
+    tmp_meta.write_text(json.dumps(meta))
+    os.replace(tmp_meta, store_path / META_FILE)
+
+
+def _symbol_offsets(df):
+    symbols, counts = np.unique(df['Symbol'].astype(str).to_numpy(), return_counts=True)
+    return symbols, np.concatenate([[0], np.cumsum(counts)]).astype(np.int64)
+
+
+def write_price_store(df, store_dir="data/store", csv_dir=None):
+    """
+    Write a price frame as one contiguous array per column, sorted by (Symbol, Date).
+
+    Symbols are not stored per row: rows of a symbol are contiguous, so the
+    symbol list plus row offsets is enough to rebuild the column or slice it.
+    csv_dir names the CSV folder the frame matches (already written); its
+    fingerprint is recorded so store_is_fresh can tell when the two diverge.
+    """
+    store_path = Path(store_dir)
+    store_path.mkdir(parents=True, exist_ok=True)
+
+    df = df.sort_values(['Symbol', 'Date']).reset_index(drop=True)
+    symbols, offsets = _symbol_offsets(df)
+
+    columns = {}
+    for column in PRICE_COLUMNS:
+        if column not in df.columns:
+            continue
+        values = _column_values(df, column)
+        _save_column(store_path / f"{column}.npy", values)
+        columns[column] = str(values.dtype)
+
+    meta = {
+        'version': STORE_VERSION,
+        'n_rows': int(len(df)),
+        'columns': columns,
+        'symbols': symbols.tolist(),
+        'offsets': offsets.tolist(),
+        'appends': [],
+        'csv_fingerprint': csv_fingerprint(csv_dir) if csv_dir is not None else None,
+    }
+    _write_meta(store_path, meta)
+    # Appended chunks are folded into the rewritten columns
+    for path in store_path.glob("*.a*.npy"):
+        path.unlink(missing_ok=True)
+
+    print(f"💾 Price store written: {len(df)} rows, {len(symbols)} stocks → {store_dir}")
+    return meta
+
+
+def _chunks(meta):
+    """(file suffix, symbols, offsets) of the base columns and of each appended chunk, oldest first."""
+    chunks = [("", meta['symbols'], meta['offsets'])]
+    chunks += [(f".a{chunk['id']}", chunk['symbols'], chunk['offsets']) for chunk in meta.get('appends', [])]
+    return chunks
+
+
+def _last_dates(store_path, meta):
+    """Each stored symbol's last date, from the last row of its newest chunk."""
+    last = {}
+    for suffix, symbols, offsets in _chunks(meta):
+        dates = np.load(store_path / f"Date{suffix}.npy", mmap_mode='r')
+        for i, symbol in enumerate(symbols):
+            if offsets[i + 1] > offsets[i]:
+                last[symbol] = dates[offsets[i + 1] - 1]
+    return last
+
+
+def append_price_store(df, store_dir="data/store", csv_dir=None, max_appends=32):
+    """
+    Add rows that are all dated after their symbol's last stored row as a new
+    chunk: one small file per column plus an entry in meta.json, so the cost
+    follows the new rows rather than the stored history.
+
+    Returns the new meta, or None when the rows overlap stored dates, their
+    columns differ from the store's, or max_appends chunks already exist;
+    the caller then rebuilds the store.
+    """
+    store_path = Path(store_dir)
+    meta = read_store_meta(store_dir)
+    if meta.get('version') != STORE_VERSION or len(meta.get('appends', [])) >= max_appends:
+        return None
+    if {c for c in PRICE_COLUMNS if c in df.columns} != set(meta['columns']):
+        return None
+    if df.empty:
+        return meta
+
+    df = (df.drop_duplicates(subset=['Symbol', 'Date'], keep='last')
+          .sort_values(['Symbol', 'Date']).reset_index(drop=True))
+    symbols, offsets = _symbol_offsets(df)
+    first_new = _column_values(df, 'Date')[offsets[:-1]]
+    last_stored = _last_dates(store_path, meta)
+    for symbol, first in zip(symbols, first_new):
+        if symbol in last_stored and first <= last_stored[symbol]:
+            return None
+
+    chunk_id = max((chunk['id'] for chunk in meta['appends']), default=0) + 1
+    for column in meta['columns']:
+        _save_column(store_path / f"{column}.a{chunk_id}.npy", _column_values(df, column))
+
+    meta['appends'].append({'id': chunk_id, 'symbols': symbols.tolist(), 'offsets': offsets.tolist()})
+    meta['n_rows'] += int(len(df))
+    if csv_dir is not None:
+        meta['csv_fingerprint'] = csv_fingerprint(csv_dir)
+    _write_meta(store_path, meta)
+    print(f"💾 Price store appended: {len(df)} rows, {len(symbols)} stocks → {store_dir}")
+    return meta
+
+
+def read_store_meta(store_dir="data/store"):
+    with open(Path(store_dir) / META_FILE) as f:
+        return json.load(f)
+
+
+def read_price_store(store_dir="data/store", columns=None, symbols=None):
+    """
+    Read the store into a frame sorted by (Symbol, Date).
+
+    columns: optional projection, e.g. ['Date', 'Close'] (Symbol is always returned).
+    symbols: optional subset; only the row ranges of those symbols are touched.
+    Appended chunks only hold dates after the earlier chunks' rows, so each
+    symbol's rows are its slices from every chunk, oldest first.
+    """
+    meta = read_store_meta(store_dir)
+    if meta.get('version') != STORE_VERSION:
+        raise ValueError(f"Unsupported price store version {meta.get('version')}")
+
+    available = list(meta['columns'])
+    wanted = available if columns is None else [c for c in available if c in columns or c == 'Date']
+
+    chunks = _chunks(meta)
+    all_symbols = sorted(set().union(*(chunk_symbols for _, chunk_symbols, _ in chunks)))
+    if symbols is None:
+        selected = all_symbols
+    else:
+        wanted_symbols = set(symbols)
+        selected = [s for s in all_symbols if s in wanted_symbols]
+
+    # (chunk, first_row, stop_row) slices in (Symbol, chunk) order
+    lookups = [{s: i for i, s in enumerate(chunk_symbols)} for _, chunk_symbols, _ in chunks]
+    spans, counts = [], np.zeros(len(selected), dtype=np.int64)
+    for position, symbol in enumerate(selected):
+        for c, (_, _, offsets) in enumerate(chunks):
+            i = lookups[c].get(symbol)
+            if i is not None and offsets[i + 1] > offsets[i]:
+                spans.append((c, offsets[i], offsets[i + 1]))
+                counts[position] += offsets[i + 1] - offsets[i]
+
+    store_path = Path(store_dir)
+    data = {}
+    # Rows are grouped by symbol, so the categorical codes are just repeats
+    data['Symbol'] = pd.Categorical.from_codes(np.repeat(np.arange(len(selected)), counts),
+                                               categories=pd.Index(selected, dtype=object))
+
+    full_read = len(chunks) == 1 and len(selected) == len(all_symbols)
+    for column in wanted:
+        arrays = [np.load(store_path / f"{column}{suffix}.npy", mmap_mode='r') for suffix, _, _ in chunks]
+        if full_read:
+            data[column] = np.array(arrays[0])
+        else:
+            data[column] = np.concatenate(
+                [arrays[c][first:stop] for c, first, stop in spans]
+            ) if spans else arrays[0][:0].copy()
+
+    return pd.DataFrame(data, columns=['Symbol'] + wanted)
+
+
+def build_price_store(csv_dir="data/csv", store_dir=None):
+    """Convert an existing folder of per-symbol CSVs into the columnar store."""
+    from analysis import load_stock_data
+
+    store_dir = store_dir or default_store_dir(csv_dir)
+    start = time.perf_counter()
+    # The store keeps the source precision; readers compact on load
+    df = load_stock_data(csv_dir, use_store=False, compact=False)
+    if df.empty:
+        return None
+    meta = write_price_store(df, store_dir, csv_dir)
+    print(f"⏱️ Store built in {time.perf_counter() - start:.2f}s")
+    return meta
+
+
+if __name__ == "__main__":
+    build_price_store()
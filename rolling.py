@@ -0,0 +1,174 @@
+# rolling.py - Rolling-window volatility and correlation across the whole universe
+import numpy as np
+import pandas as pd
+
+from price_matrix import as_price_matrix
+
+ROLLING_WINDOWS = (20, 60, 252)
+MARKET = 'MARKET'
+
+
+def _window_sums(values, window):
+    """
+    Sliding sums over the last `window` rows for every column at once.
+
+    The running total adds the entering row and removes the leaving one,
+    which is a difference of two prefix sums: O(1) per step, independent of
+    the window length. Missing cells must already be 0 in values.
+    """
+    prefix = np.zeros((values.shape[0] + 1,) + values.shape[1:])
+    np.cumsum(values, axis=0, out=prefix[1:])
+    sums = prefix[1:].copy()
+    sums[window:] -= prefix[1:-window]
+    return sums
+
+
+def _returns(data):
+    matrix = as_price_matrix(data)
+    returns = matrix.daily_returns()
+    return matrix, returns, ~np.isnan(returns)
+
+
+def _market_returns(returns, valid):
+    """Equal-weighted average daily return of the symbols trading each day."""
+    counts = valid.sum(axis=1)
+    with np.errstate(invalid='ignore'):
+        return np.where(counts > 0, np.where(valid, returns, 0.0).sum(axis=1) / np.maximum(counts, 1), np.nan)
+
+
+def rolling_volatility(data, window=20, periods_per_year=252, min_periods=None):
+    """
+    Annualized rolling volatility (%) of daily returns as a Date × Symbol frame.
+
+    Same values as returns_frame().rolling(window, min_periods).std() scaled
+    to a year, computed from sliding sums of returns and squared returns.
+    """
+    matrix, returns, valid = _returns(data)
+    min_periods = max(2, min_periods or window)
+
+    # Centre each column first so the sliding sum of squares stays well conditioned
+    counts = valid.sum(axis=0)
+    centre = np.where(valid, returns, 0.0).sum(axis=0) / np.maximum(counts, 1)
+    x = np.where(valid, returns - centre, 0.0)
+
+    n = _window_sums(valid.astype(np.float64), window)
+    s = _window_sums(x, window)
+    ss = _window_sums(x * x, window)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        var = np.maximum(ss - s * s / n, 0.0) / (n - 1)
+    vol = np.sqrt(var) * np.sqrt(periods_per_year) * 100
+    vol[n < min_periods] = np.nan
+    return pd.DataFrame(vol, index=matrix.dates, columns=matrix.symbols)
+
+
+def rolling_correlation_to(data, benchmark=MARKET, window=60, min_periods=None):
+    """
+    Rolling correlation of every symbol's daily returns with one benchmark,
+    as a Date × Symbol frame.
+
+    benchmark is a symbol in the data or MARKET for the equal-weighted
+    average return. Each window uses the days both series have a return.
+    """
+    matrix, returns, valid = _returns(data)
+    min_periods = max(2, min_periods or window)
+
+    if benchmark == MARKET:
+        bench = _market_returns(returns, valid)
+    elif benchmark in matrix.symbol_index:
+        bench = returns[:, matrix.symbol_index[benchmark]]
+    else:
+        raise ValueError(f"Unknown benchmark symbol: {benchmark}")
+
+    both = valid & ~np.isnan(bench)[:, None]
+    x = np.where(both, returns, 0.0)
+    y = np.where(both, bench[:, None], 0.0)
+    # Centre both series so the sliding co-moments stay well conditioned
+    x = np.where(both, x - x.sum(axis=0) / np.maximum(both.sum(axis=0), 1), 0.0)
+    y = np.where(both, y - np.nanmean(bench), 0.0)
+
+    n = _window_sums(both.astype(np.float64), window)
+    sx = _window_sums(x, window)
+    sy = _window_sums(y, window)
+    sxx = _window_sums(x * x, window)
+    syy = _window_sums(y * y, window)
+    sxy = _window_sums(x * y, window)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        cov = sxy - sx * sy / n
+        corr = cov / np.sqrt(np.maximum(sxx - sx * sx / n, 0.0) * np.maximum(syy - sy * sy / n, 0.0))
+    corr[n < min_periods] = np.nan
+    np.clip(corr, -1.0, 1.0, out=corr)
+    return pd.DataFrame(corr, index=matrix.dates, columns=matrix.symbols)
+
+
+def _window_moments(x, v):
+    """Pairwise co-moment sums of a block of rows, computed from scratch."""
+    return v.T @ v, x.T @ v, (x * x).T @ v, x.T @ x
+
+
+def rolling_correlation_matrices(data, window=60, step=1, symbols=None, min_periods=None,
+                                 resync_every=500):
+    """
+    Rolling pairwise-complete correlation matrices of daily returns.
+
+    Returns (dates, symbols, values) with values shaped (n_dates, n, n) as
+    float32, one matrix every `step` trading days. The window's co-moment
+    matrices are updated by adding the entering day and removing the leaving
+    one (rank-one updates), so each step costs O(n²) instead of
+    O(window × n²). Every resync_every days the sums are rebuilt from the
+    window's rows to stop floating point drift from accumulating.
+    """
+    matrix = as_price_matrix(data)
+    if symbols is not None:
+        matrix = matrix.select(symbols)
+    matrix, returns, valid = _returns(matrix)
+    min_periods = max(2, min_periods or window)
+
+    counts = valid.sum(axis=0)
+    centre = np.where(valid, returns, 0.0).sum(axis=0) / np.maximum(counts, 1)
+    x = np.where(valid, returns - centre, 0.0)
+    v = valid.astype(np.float64)
+
+    n_symbols = matrix.n_symbols
+    # sums[i, j] is Σ x_i over the window days where j is also present
+    pair_n, sums, sq_sums, cross = (np.zeros((n_symbols, n_symbols)) for _ in range(4))
+
+    out_rows = np.arange(0, matrix.n_dates, step)
+    values = np.full((len(out_rows), n_symbols, n_symbols), np.nan, dtype=np.float32)
+    out_pos = 0
+    for t in range(matrix.n_dates):
+        if resync_every and t > 0 and t % resync_every == 0:
+            start = max(0, t - window + 1)
+            pair_n, sums, sq_sums, cross = _window_moments(x[start:t + 1], v[start:t + 1])
+        else:
+            for row, sign in ((t, 1.0), (t - window, -1.0)):
+                if row < 0:
+                    continue
+                xr, vr = x[row], v[row]
+                pair_n += sign * np.outer(vr, vr)
+                sums += sign * np.outer(xr, vr)
+                sq_sums += sign * np.outer(xr * xr, vr)
+                cross += sign * np.outer(xr, xr)
+
+        if out_pos < len(out_rows) and out_rows[out_pos] == t:
+            safe_n = np.maximum(pair_n, 1)
+            with np.errstate(divide='ignore', invalid='ignore'):
+                var = np.maximum(sq_sums - sums * sums / safe_n, 0.0)
+                corr = (cross - sums * sums.T / safe_n) / np.sqrt(var * var.T)
+            corr[pair_n < min_periods] = np.nan
+            np.clip(corr, -1.0, 1.0, out=corr)
+            values[out_pos] = corr
+            out_pos += 1
+
+    return matrix.dates[out_rows], matrix.symbols, values
+
+
+def rolling_panel(data, windows=ROLLING_WINDOWS, benchmark=MARKET):
+    """Rolling volatility and benchmark correlation for each window, keyed by window length."""
+    matrix = as_price_matrix(data)
+    return {
+        window: {
+            'volatility': rolling_volatility(matrix, window),
+            'correlation': rolling_correlation_to(matrix, benchmark, window),
+        }
+        for window in windows
+    }
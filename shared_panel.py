@@ -0,0 +1,219 @@
+# shared_panel.py - Memory-mapped price panel shared read-only by dashboard workers
+import json
+import os
+import shutil
+import time
+from contextlib import contextmanager
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from price_matrix import PriceMatrix
+
+PANEL_VERSION = 1
+DESCRIPTOR_FILE = "panel.json"
+LOCK_FILE = ".panel.lock"
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
+
+
+def _save_array(path, values):
+    """np.save through a temp file so a reader never maps a half-written array."""
+    tmp_path = path.with_name(f".{path.name}.tmp")
+    with open(tmp_path, 'wb') as f:
+        np.save(f, np.ascontiguousarray(values))
+    os.replace(tmp_path, path)
+
+
+@contextmanager
+def _exclusive(path):
+    """Hold an exclusive lock on path (created if missing) across processes."""
+    with open(path, 'a+b') as f:
+        if fcntl is not None:
+            fcntl.flock(f, fcntl.LOCK_EX)
+        else:
+            f.seek(0)
+            msvcrt.locking(f.fileno(), msvcrt.LK_LOCK, 1)
+        try:
+            yield
+        finally:
+            if fcntl is not None:
+                fcntl.flock(f, fcntl.LOCK_UN)
+            else:
+                f.seek(0)
+                msvcrt.locking(f.fileno(), msvcrt.LK_UNLCK, 1)
+
+
+class PanelView:
+    """One attached panel version: read-only memory maps of the published arrays."""
+
+    def __init__(self, panel_dir, descriptor):
+        self.descriptor = descriptor
+        self.version = descriptor['version']
+        self.fingerprint = descriptor.get('fingerprint')
+        self.path = Path(panel_dir) / descriptor['path']
+        self.symbols = np.asarray(descriptor['symbols'], dtype=object)
+
+        def load(name):
+            return np.load(self.path / f"{name}.npy", mmap_mode='r')
+
+        fields = {field: load(field) for field in descriptor['fields']}
+        self.matrix = PriceMatrix(self.symbols, load('dates'), fields, load('mask'))
+        self.metrics = {name: load(f"metric_{name}") for name in descriptor.get('metrics', [])}
+
+    def correlation(self):
+        """The published CorrelationMatrix (float32 map, no copy), or None."""
+        if 'correlation' not in self.metrics:
+            return None
+        from correlation import CorrelationMatrix
+        return CorrelationMatrix(self.symbols, self.metrics['correlation'])
+
+    def window_index(self):
+        """A WindowIndex over the published prefix arrays (maps, no copy), or None."""
+        from window_index import WindowIndex
+        return WindowIndex.from_metrics(self.symbols, self.matrix.dates, self.metrics)
+
+
+class SharedPanel:
+    """
+    Publishes the aligned price arrays (and metric arrays such as the
+    correlation matrix or the window index prefix sums) as .npy files that every dashboard process maps
+    read-only, so the OS page cache holds one copy however many workers run.
+
+    Each publish writes a new vN-<pid> folder and then swaps panel.json, the
+    small descriptor holding the version counter, with one atomic rename.
+    Writers (publish, add_metrics) hold a lock file while they read and
+    replace the descriptor, so concurrent publishers get distinct versions
+    and a metric write never puts back a descriptor that was replaced.
+    Readers attach to whatever version the descriptor names. Older folders
+    are removed after `keep` newer versions exist; a process that still maps
+    one keeps reading it (POSIX keeps unlinked files alive while mapped).
+    """
+
+    def __init__(self, panel_dir="data/panel", keep=2):
+        self.panel_dir = Path(panel_dir)
+        self.keep = keep
+
+    def descriptor(self):
+        """The current descriptor, or None when nothing has been published."""
+        try:
+            with open(self.panel_dir / DESCRIPTOR_FILE) as f:
+                descriptor = json.load(f)
+        except (OSError, ValueError):
+            return None
+        return descriptor if descriptor.get('panel_version') == PANEL_VERSION else None
+
+    def current_version(self):
+        descriptor = self.descriptor()
+        return descriptor['version'] if descriptor else 0
+
+    def _write_descriptor(self, descriptor):
+        tmp_path = self.panel_dir / f".{DESCRIPTOR_FILE}.{os.getpid()}.tmp"
+        tmp_path.write_text(json.dumps(descriptor))
+        os.replace(tmp_path, self.panel_dir / DESCRIPTOR_FILE)
+
+    def _lock(self):
+        self.panel_dir.mkdir(parents=True, exist_ok=True)
+        return _exclusive(self.panel_dir / LOCK_FILE)
+
+    def publish(self, matrix, metrics=None, fingerprint=None):
+        """Write a PriceMatrix (plus optional {name: array} metrics) as the next version."""
+        with self._lock():
+            return self._publish(matrix, metrics, fingerprint)
+
+    def _publish(self, matrix, metrics, fingerprint):
+        version = self.current_version() + 1
+        folder = f"v{version:06d}-{os.getpid()}"
+        path = self.panel_dir / folder
+        path.mkdir(parents=True, exist_ok=True)
+
+        for field, values in matrix.fields.items():
+            _save_array(path / f"{field}.npy", values)
+        _save_array(path / "mask.npy", matrix.mask)
+        _save_array(path / "dates.npy", matrix.dates.to_numpy(dtype='datetime64[ns]'))
+        for name, values in (metrics or {}).items():
+            _save_array(path / f"metric_{name}.npy", values)
+
+        # The descriptor swap is the commit point for the new version
+        self._write_descriptor({
+            'panel_version': PANEL_VERSION,
+            'version': version,
+            'path': folder,
+            'fingerprint': fingerprint,
+            'symbols': [str(s) for s in matrix.symbols],
+            'shape': [matrix.n_dates, matrix.n_symbols],
+            'fields': list(matrix.fields),
+            'metrics': list(metrics or {}),
+            'published': time.time(),
+        })
+        self._remove_old_versions()
+        print(f"🧩 Shared panel v{version} published: {matrix.n_dates} dates × {matrix.n_symbols} stocks")
+        return version
+
+    def add_metric(self, name, values, fingerprint=None):
+        """
+        Add a metric array to the current version if it still holds the data
+        identified by fingerprint. Returns False when the panel moved on.
+        """
+        return self.add_metrics({name: values}, fingerprint)
+
+    def add_metrics(self, metrics, fingerprint=None):
+        """Add several {name: array} metrics with one descriptor swap, so readers see all or none."""
+        with self._lock():
+            # Read under the lock: a publish cannot slip in before the swap below
+            descriptor = self.descriptor()
+            if descriptor is None or descriptor.get('fingerprint') != fingerprint:
+                return False
+            for name, values in metrics.items():
+                _save_array(self.panel_dir / descriptor['path'] / f"metric_{name}.npy", values)
+            descriptor['metrics'] = sorted(set(descriptor.get('metrics', [])) | set(metrics))
+            self._write_descriptor(descriptor)
+            return True
+
+    def attach(self, fingerprint=None):
+        """
+        Map the current version read-only. Returns None when nothing is
+        published, or when fingerprint is given and the panel holds other data.
+        """
+        descriptor = self.descriptor()
+        if descriptor is None:
+            return None
+        if fingerprint is not None and descriptor.get('fingerprint') != fingerprint:
+            return None
+        try:
+            return PanelView(self.panel_dir, descriptor)
+        except (OSError, ValueError) as e:
+            # The version was swapped out and removed between the two reads
+            print(f"⚠️ Shared panel v{descriptor['version']} unreadable: {e}")
+            return None
+
+    def _remove_old_versions(self):
+        folders = sorted((p for p in self.panel_dir.glob("v*-*") if p.is_dir()),
+                         key=lambda p: int(p.name[1:].split('-')[0]))
+        for folder in folders[:-self.keep]:
+            shutil.rmtree(folder, ignore_errors=True)
+
+
+def publish_from_csv(csv_dir="data/csv", panel_dir="data/panel"):
+    """Build the panel straight from the price data (e.g. after extract_data.py runs)."""
+    from analysis import load_stock_data
+    from correlation import compute_correlation
+    from metrics_cache import data_fingerprint
+
+    df = load_stock_data(csv_dir, precision='float64')
+    if df.empty:
+        return None
+    matrix = PriceMatrix.from_frame(df)
+    corr = compute_correlation(matrix)
+    panel = SharedPanel(panel_dir)
+    return panel.publish(matrix, {'correlation': corr.values},
+                         fingerprint=data_fingerprint(csv_dir, str(Path(csv_dir).parent / "sectors.csv")))
+
+
+if __name__ == "__main__":
+    publish_from_csv()
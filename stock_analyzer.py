@@ -2,46 +2,333 @@
 import pandas as pd
 import numpy as np
 import sqlite3
-from sqlalchemy import create_engine
+import hashlib
+import math
+import os
+import threading
+from collections import OrderedDict
+from pathlib import Path
 import warnings
+from correlation import compute_correlation
 warnings.filterwarnings('ignore')
 
+PRICE_COLUMNS = ['symbol', 'date', 'open', 'high', 'low', 'close', 'volume']
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS prices (
+    symbol TEXT NOT NULL,
+    date   TEXT NOT NULL,
+    open   REAL,
+    high   REAL,
+    low    REAL,
+    close  REAL,
+    volume INTEGER,
+    PRIMARY KEY (symbol, date)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS load_meta (
+    key   TEXT PRIMARY KEY,
+    value TEXT
+);
+"""
+
+# Daily returns per row, computed inside SQLite with LAG over each symbol's rows
+RETURNS_CTE = """
+returns AS (
+    SELECT symbol, date, close, volume,
+           close / LAG(close) OVER by_symbol - 1 AS daily_return
+    FROM prices
+    WINDOW by_symbol AS (PARTITION BY symbol ORDER BY date)
+)
+"""
+
+# First/last close and return moments per symbol: one small row per symbol
+SYMBOL_STATS_SQL = """
+WITH """ + RETURNS_CTE + """,
+bounds AS (
+    SELECT symbol, daily_return,
+           FIRST_VALUE(close) OVER whole AS first_close,
+           LAST_VALUE(close) OVER whole AS last_close
+    FROM returns
+    WINDOW whole AS (PARTITION BY symbol ORDER BY date
+                     ROWS BETWEEN UNBOUNDED PRECEDING AND UNBOUNDED FOLLOWING)
+)
+SELECT symbol,
+       MAX(first_close) AS first_close,
+       MAX(last_close) AS last_close,
+       COUNT(daily_return) AS n_returns,
+       AVG(daily_return) AS mean_return,
+       SUM(daily_return * daily_return) AS sum_sq_return
+FROM bounds
+GROUP BY symbol
+ORDER BY symbol
+"""
+
+# Mean of the 20-day rolling std of daily returns (same as rolling(20).std().mean())
+ROLLING_VOLATILITY_SQL = """
+WITH """ + RETURNS_CTE + """,
+windows AS (
+    SELECT symbol,
+           COUNT(daily_return) OVER last20 AS n,
+           SUM(daily_return) OVER last20 AS s,
+           SUM(daily_return * daily_return) OVER last20 AS ss
+    FROM returns
+    WINDOW last20 AS (PARTITION BY symbol ORDER BY date ROWS BETWEEN 19 PRECEDING AND CURRENT ROW)
+)
+SELECT symbol, AVG(SQRT(MAX((ss - s * s / n) / (n - 1), 0))) AS volatility
+FROM windows
+WHERE n = 20
+GROUP BY symbol
+"""
+
+MARKET_SUMMARY_SQL = """
+WITH """ + RETURNS_CTE + """
+SELECT COUNT(DISTINCT symbol) AS total_stocks,
+       COUNT(DISTINCT CASE WHEN daily_return > 0 THEN symbol END) AS green_stocks,
+       COUNT(DISTINCT CASE WHEN daily_return < 0 THEN symbol END) AS red_stocks,
+       AVG(close) AS avg_close,
+       AVG(volume) AS avg_volume
+FROM returns
+"""
+
+
+def _read_sectors(sector_file):
+    """Symbol → sector mapping with lowercase columns (tolerates the '# sectors.csv' header line)"""
+    sectors = pd.read_csv(sector_file, comment='#')
+    sectors.columns = [c.strip().lower() for c in sectors.columns]
+    sectors['symbol'] = sectors['symbol'].astype(str).str.strip().str.upper()
+    sectors['sector'] = sectors['sector'].astype(str).str.strip()
+    return sectors.drop_duplicates('symbol')
+
+
+class ResultCache:
+    """Bounded LRU cache with hit/miss counters (thread-safe)"""
+    
+    def __init__(self, maxsize=256):
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+    
+    def get_or_compute(self, key, compute):
+        with self._lock:
+            if key in self._entries:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return self._entries[key]
+            self.misses += 1
+        
+        value = compute()
+        with self._lock:
+            self._entries[key] = value
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+        return value
+    
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+    
+    def info(self):
+        with self._lock:
+            return {'hits': self.hits, 'misses': self.misses,
+                    'size': len(self._entries), 'maxsize': self.maxsize}
+
+
 class StockAnalyzer:
-    def __init__(self, csv_dir="data/csv"):
+    def __init__(self, csv_dir="data/csv", db_path="stocks.db", pushdown=False, cache_size=256):
+        """
+        pushdown=True computes returns, volatility and sector averages inside
+        SQLite with window functions; only the per-symbol results come back.
+        
+        Per-symbol return series and aggregate results are memoized in a
+        bounded LRU cache (cache_size entries, 0 disables it), keyed by the
+        data version that load_data bumps. Cached frames are shared: treat
+        them as read-only.
+        """
         self.csv_dir = csv_dir
-        self.engine = create_engine('sqlite:///stocks.db')
+        self.db_path = db_path
+        self.pushdown = pushdown
+        self.data_version = 0
+        self._cache = ResultCache(cache_size)
         self.load_data()
     
-    def load_data(self):
-        """Load all CSV files into SQLite"""
-        conn = sqlite3.connect('stocks.db')
-        
-        # Master table
-        master_df = pd.read_csv(f"{self.csv_dir}/nifty50_master.csv")
-        master_df.to_sql('stocks', conn, if_exists='replace', index=False)
-        
-        # Per symbol tables
-        for symbol in master_df['symbol'].unique():
-            symbol_df = pd.read_csv(f"{self.csv_dir}/{symbol}.csv")
-            symbol_df.to_sql(symbol.lower(), conn, if_exists='replace', index=False)
-        
-        conn.close()
-        print("✅ Data loaded to SQLite")
+    def _cached(self, key, compute):
+        """Memoize compute() under key + the current data version"""
+        if self._cache.maxsize <= 0:
+            return compute()
+        return self._cache.get_or_compute((self.data_version, self.pushdown) + key, compute)
+    
+    def cache_info(self):
+        """Hit/miss counters, current size, size limit and data version"""
+        return {**self._cache.info(), 'data_version': self.data_version}
+    
+    def clear_cache(self):
+        self._cache.clear()
+    
+    def _connect(self):
+        conn = sqlite3.connect(self.db_path)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        try:
+            conn.execute("SELECT SQRT(4)")
+        except sqlite3.OperationalError:
+            # SQLite built without the math functions
+            conn.create_function("SQRT", 1, lambda x: math.sqrt(x) if x is not None else None,
+                                 deterministic=True)
+        return conn
+    
+    def _source_files(self):
+        """Files the price table is built from"""
+        master = Path(self.csv_dir) / "nifty50_master.csv"
+        if master.exists():
+            return [master]
+        files = sorted(Path(self.csv_dir).glob("*.csv"))
+        store_meta = Path(self.csv_dir).parent / "store" / "meta.json"
+        return files + ([store_meta] if store_meta.exists() else [])
+    
+    def _source_fingerprint(self):
+        """Cheap fingerprint of the source data: names, sizes and mtimes"""
+        digest = hashlib.sha256()
+        for path in self._source_files():
+            stat = path.stat()
+            digest.update(f"{path.name}|{stat.st_size}|{stat.st_mtime_ns}\n".encode())
+        return digest.hexdigest()
+    
+    def _read_source(self):
+        """All prices as a frame with the lowercase price columns"""
+        master = Path(self.csv_dir) / "nifty50_master.csv"
+        if master.exists():
+            df = pd.read_csv(master)
+        else:
+            from analysis import load_stock_data
+            df = load_stock_data(self.csv_dir, compact=False)
+        df.columns = [c.lower() for c in df.columns]
+        df['date'] = pd.to_datetime(df['date']).dt.strftime('%Y-%m-%d %H:%M:%S')
+        for column in PRICE_COLUMNS:
+            if column not in df.columns:
+                df[column] = None
+        return df[PRICE_COLUMNS]
+    
+    def _ensure_schema(self, conn):
+        # Databases written by the old per-symbol loader had a real 'stocks' table
+        legacy = conn.execute(
+            "SELECT type FROM sqlite_master WHERE name = 'stocks'"
+        ).fetchone()
+        if legacy and legacy[0] == 'table':
+            conn.execute("DROP TABLE stocks")
+        conn.executescript(SCHEMA)
+        # Kept for existing queries against the old 'stocks' table
+        conn.execute("CREATE VIEW IF NOT EXISTS stocks AS SELECT * FROM prices")
+    
+    def load_data(self, force=False):
+        """Bulk-load all prices into the single indexed 'prices' table"""
+        conn = self._connect()
+        try:
+            self._ensure_schema(conn)
+            fingerprint = self._source_fingerprint()
+            row = conn.execute("SELECT value FROM load_meta WHERE key = 'fingerprint'").fetchone()
+            if not force and row and row[0] == fingerprint:
+                print("✅ SQLite data up to date (skipped reload)")
+                return False
+            
+            df = self._read_source()
+            rows = zip(*(df[column].tolist() for column in PRICE_COLUMNS))
+            
+            # One transaction for the whole load; the date index is rebuilt afterwards
+            with conn:
+                conn.execute("DROP INDEX IF EXISTS idx_prices_date")
+                conn.execute("DELETE FROM prices")
+                conn.executemany(
+                    "INSERT OR REPLACE INTO prices (symbol, date, open, high, low, close, volume) "
+                    "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                    rows
+                )
+                conn.execute("CREATE INDEX idx_prices_date ON prices (date)")
+                conn.execute(
+                    "INSERT OR REPLACE INTO load_meta (key, value) VALUES ('fingerprint', ?)",
+                    (fingerprint,)
+                )
+            conn.execute("ANALYZE")
+        finally:
+            conn.close()
+        # New data: every cached result is stale
+        self.data_version += 1
+        self._cache.clear()
+        print(f"✅ Data loaded to SQLite: {len(df)} rows")
+        return True
+    
+    def _query(self, sql, params=()):
+        conn = self._connect()
+        try:
+            return pd.read_sql(sql, conn, params=params)
+        finally:
+            conn.close()
+    
+    def symbols(self):
+        """All symbols (distinct scan of the primary key)"""
+        return self._query("SELECT DISTINCT symbol FROM prices ORDER BY symbol")['symbol']
+    
+    def get_prices(self, symbol, start=None, end=None):
+        """One symbol's rows as an indexed range scan on (symbol, date); a date-only end is inclusive"""
+        sql = "SELECT * FROM prices WHERE symbol = ?"
+        params = [symbol]
+        if start is not None:
+            sql += " AND date >= ?"
+            params.append(str(pd.Timestamp(start)))
+        if end is not None:
+            end = pd.Timestamp(end)
+            if end == end.normalize():
+                end += pd.Timedelta(days=1)
+            sql += " AND date < ?"
+            params.append(str(end))
+        return self._query(sql + " ORDER BY date", params)
+    
+    def get_cross_section(self, date):
+        """All symbols on one trading day in a single query"""
+        day = pd.Timestamp(date).normalize()
+        return self._query(
+            "SELECT * FROM prices WHERE date >= ? AND date < ? ORDER BY symbol",
+            (str(day), str(day + pd.Timedelta(days=1)))
+        )
+    
+    def symbol_stats(self):
+        """Per-symbol first/last close, yearly return and daily-return std, computed in SQL"""
+        return self._cached(('symbol_stats',), self._symbol_stats)
+    
+    def _symbol_stats(self):
+        stats = self._query(SYMBOL_STATS_SQL)
+        n = stats['n_returns']
+        variance = (stats['sum_sq_return'] - n * stats['mean_return'] ** 2) / (n - 1)
+        stats['return_std'] = np.sqrt(variance.clip(lower=0)).where(n > 1)
+        stats['yearly_return'] = stats['last_close'] / stats['first_close'] - 1
+        return stats
     
     def calculate_returns(self, symbol):
-        """Calculate daily & yearly returns"""
-        df = pd.read_sql(f"SELECT * FROM '{symbol.lower()}' ORDER BY date", self.engine)
+        """Calculate daily & yearly returns (cached per symbol)"""
+        return self._cached(('returns', symbol), lambda: self._calculate_returns(symbol))
+    
+    def _calculate_returns(self, symbol):
+        df = self.get_prices(symbol)
         df['date'] = pd.to_datetime(df['date'])
         df['daily_return'] = df['close'].pct_change()
         df['cumulative_return'] = (1 + df['daily_return']).cumprod() - 1
         df['volatility'] = df['daily_return'].rolling(20).std()
-        df['yearly_return'] = df['cumulative_return'].iloc[-1]
+        df['yearly_return'] = df['cumulative_return'].iloc[-1] if len(df) > 0 else np.nan
         return df
     
     def get_top_green_red(self, top_n=10):
         """Top 10 Green/Red stocks"""
+        return self._cached(('top_green_red', top_n), lambda: self._get_top_green_red(top_n))
+    
+    def _get_top_green_red(self, top_n):
+        if self.pushdown:
+            df_returns = self.symbol_stats()[['symbol', 'yearly_return']]
+            return df_returns.nlargest(top_n, 'yearly_return'), df_returns.nsmallest(top_n, 'yearly_return')
+        
         results = []
-        for symbol in pd.read_sql("SELECT DISTINCT symbol FROM stocks", self.engine)['symbol']:
+        for symbol in self.symbols():
             df = self.calculate_returns(symbol)
             yearly_return = df['yearly_return'].iloc[-1] if len(df) > 0 else 0
             results.append({'symbol': symbol, 'yearly_return': yearly_return})
@@ -54,7 +341,16 @@ class StockAnalyzer:
     
     def market_summary(self):
         """Market overview stats"""
-        df = pd.read_sql("SELECT * FROM stocks", self.engine)
+        return dict(self._cached(('market_summary',), self._market_summary))
+    
+    def _market_summary(self):
+        if self.pushdown:
+            summary = self._query(MARKET_SUMMARY_SQL).to_dict('records')[0]
+            for key in ('total_stocks', 'green_stocks', 'red_stocks'):
+                summary[key] = int(summary[key])
+            return summary
+        
+        df = self._query("SELECT * FROM prices ORDER BY symbol, date")
         df['date'] = pd.to_datetime(df['date'])
         df['daily_return'] = df.groupby('symbol')['close'].pct_change()
         
@@ -71,8 +367,14 @@ class StockAnalyzer:
     
     def get_volatility_top(self, top_n=10):
         """Top volatile stocks"""
+        return self._cached(('volatility_top', top_n), lambda: self._get_volatility_top(top_n))
+    
+    def _get_volatility_top(self, top_n):
+        if self.pushdown:
+            return self._query(ROLLING_VOLATILITY_SQL).nlargest(top_n, 'volatility')
+        
         results = []
-        for symbol in pd.read_sql("SELECT DISTINCT symbol FROM stocks", self.engine)['symbol']:
+        for symbol in self.symbols():
             df = self.calculate_returns(symbol)
             vol = df['volatility'].mean()
             results.append({'symbol': symbol, 'volatility': vol})
@@ -81,7 +383,16 @@ class StockAnalyzer:
     
     def sector_performance(self, sector_file="data/sectors.csv"):
         """Sector-wise analysis"""
-        sectors = pd.read_csv(sector_file)
+        # The mapping file is part of the key so edits to it are picked up
+        mtime = os.stat(sector_file).st_mtime_ns
+        return self._cached(('sector_performance', sector_file, mtime),
+                            lambda: self._sector_performance(sector_file))
+    
+    def _sector_performance(self, sector_file):
+        sectors = _read_sectors(sector_file)
+        if self.pushdown:
+            return self._sector_performance_sql(sectors)
+        
         results = []
         
         for symbol in sectors['symbol']:
@@ -94,13 +405,44 @@ class StockAnalyzer:
         sector_avg = df.groupby('sector')['yearly_return'].mean().reset_index()
         return sector_avg.sort_values('yearly_return', ascending=False)
     
+    def _sector_performance_sql(self, sectors):
+        """Sector averages of the yearly return, joined and aggregated in SQLite"""
+        conn = self._connect()
+        try:
+            conn.execute("CREATE TEMP TABLE sector_map (symbol TEXT PRIMARY KEY, sector TEXT)")
+            conn.executemany("INSERT INTO sector_map VALUES (?, ?)",
+                             zip(sectors['symbol'].tolist(), sectors['sector'].tolist()))
+            sql = """
+                WITH bounds AS (
+                    SELECT DISTINCT symbol,
+                           FIRST_VALUE(close) OVER whole AS first_close,
+                           LAST_VALUE(close) OVER whole AS last_close
+                    FROM prices
+                    WINDOW whole AS (PARTITION BY symbol ORDER BY date
+                                     ROWS BETWEEN UNBOUNDED PRECEDING AND UNBOUNDED FOLLOWING)
+                )
+                SELECT m.sector, AVG(b.last_close / b.first_close - 1) AS yearly_return
+                FROM bounds b JOIN sector_map m ON m.symbol = b.symbol
+                GROUP BY m.sector
+                ORDER BY yearly_return DESC
+            """
+            return pd.read_sql(sql, conn)
+        finally:
+            conn.close()
+    
     def correlation_matrix(self):
         """Stock correlation heatmap data"""
-        closes = pd.read_sql("""
+        # The query window is relative to today, so the day is part of the key
+        return self._cached(('correlation', str(pd.Timestamp.now().date())), self._correlation_matrix)
+    
+    def _correlation_matrix(self):
+        closes = self._query("""
             SELECT symbol, date, close 
-            FROM stocks 
+            FROM prices 
             WHERE date >= date('now', '-1 year')
-        """, self.engine)
+        """)
+        if closes.empty:
+            return pd.DataFrame()
         
-        pivot = closes.pivot(index='date', columns='symbol', values='close')
-        return pivot.corr()
+        closes.columns = ['Symbol', 'Date', 'Close']
+        return compute_correlation(closes).to_frame()
@@ -7,6 +7,7 @@ from plotly.subplots import make_subplots
 import numpy as np
 from ProjectTopicsWise.Streamlit.env.Scripts.analysis import load_stock_data, calculate_key_metrics, calculate_volatility, calculate_cumulative_returns
 import sqlite3
+from correlation import compute_correlation
 
 st.set_page_config(page_title="Stock Performance Dashboard", layout="wide")
 
@@ -64,8 +65,7 @@ st.plotly_chart(fig_cum, use_container_width=True)
 
 # Correlation Heatmap
 st.subheader("🔗 Stock Price Correlation Heatmap")
-close_prices = df.pivot(index='Date', columns='Symbol', values='Close').dropna(axis=1)
-corr_matrix = close_prices.corr()
+corr_matrix = compute_correlation(df).to_frame()
 fig_corr = px.imshow(corr_matrix, aspect="auto", color_continuous_scale='RdBu_r',
-                    title="Correlation Between Stock Closing Prices")
+                    title="Correlation Between Stock Daily Returns")
 st.plotly_chart(fig_corr, use_container_width=True)
@@ -0,0 +1,5 @@
+# conftest.py - Make the flat root-level modules importable from tests/
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
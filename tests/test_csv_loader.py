@@ -0,0 +1,53 @@
+# test_csv_loader.py - Per-file outcomes of the concurrent CSV reader
+import pandas as pd
+
+from csv_loader import load_csv_dir
+
+
+def _write(folder, name, text):
+    (folder / name).write_text(text)
+
+
+def _load(folder):
+    df, outcomes = load_csv_dir(folder, workers=2)
+    return df, outcomes.set_index('Symbol')
+
+
+def test_outcomes_per_file(tmp_path):
+    _write(tmp_path, "OK.csv", "Date,Open,High,Low,Close,Volume\n"
+                               "2024-01-02 00:00:00,1,2,0.5,1.5,100\n"
+                               "2024-01-01 00:00:00,1,2,0.5,1.4,90\n")
+    _write(tmp_path, "NOVOL.csv", "Date,Close\n2024-01-01 00:00:00,10\n")
+    _write(tmp_path, "NOCLOSE.csv", "Date,Open\n2024-01-01 00:00:00,10\n")
+    _write(tmp_path, "PART.csv", "Date,Close,Volume\n2024-01-01 00:00:00,5,1\nnot a date,6,2\n")
+    _write(tmp_path, "BAD.csv", "Date,Close,Volume\nnever,5,1\n")
+
+    df, outcomes = _load(tmp_path)
+    assert outcomes.loc['OK', 'Status'] == 'ok'
+    assert outcomes.loc['NOVOL', 'Status'] == 'no_volume'
+    assert outcomes.loc['NOCLOSE', 'Status'] == 'rejected'
+    assert outcomes.loc['PART', 'Status'] == 'partial'
+    assert outcomes.loc['PART', 'Rows'] == 1
+    assert outcomes.loc['BAD', 'Status'] == 'error'
+
+    assert sorted(df['Symbol'].unique()) == ['NOVOL', 'OK', 'PART']
+    ok = df[df['Symbol'] == 'OK']
+    assert ok['Date'].is_monotonic_increasing
+    assert ok['Close'].tolist() == [1.4, 1.5]
+    assert df.loc[df['Symbol'] == 'NOVOL', 'Volume'].isna().all()
+
+
+def test_offset_dates_are_normalised_to_utc(tmp_path):
+    _write(tmp_path, "IST.csv", "Date,Close,Volume\n"
+                                "2024-01-01T09:15:00+05:30,1,1\n"
+                                "2024-01-01T10:15:00+05:30,2,1\n")
+    _write(tmp_path, "MIX.csv", "Date,Close,Volume\n"
+                                "2024-01-01 00:00:00,1,1\n"
+                                "2024-01-02T00:00:00-05:00,2,1\n")
+
+    df, outcomes = _load(tmp_path)
+    assert (outcomes['Status'] == 'ok').all()
+    assert df.loc[df['Symbol'] == 'IST', 'Date'].tolist() == [pd.Timestamp("2024-01-01 03:45"),
+                                                              pd.Timestamp("2024-01-01 04:45")]
+    assert df.loc[df['Symbol'] == 'MIX', 'Date'].tolist() == [pd.Timestamp("2024-01-01"),
+                                                              pd.Timestamp("2024-01-02 05:00")]
@@ -0,0 +1,55 @@
+# test_export_for_powerbi.py - Star schema keys stay stable across exports
+import numpy as np
+import pandas as pd
+
+import export_for_powerbi as export
+
+
+def _prices(symbols, n_days=40):
+    dates = pd.date_range("2024-01-01", periods=n_days)
+    rows = len(symbols) * n_days
+    return pd.DataFrame({
+        'Symbol': np.repeat(symbols, n_days),
+        'Date': np.tile(dates, len(symbols)),
+        'Close': np.linspace(100, 200, rows),
+        'Volume': np.arange(rows, dtype=np.int64),
+    })
+
+
+def test_new_symbol_only_writes_its_own_partitions(tmp_path):
+    manifest = {}
+    df = _prices(['BBB', 'CCC'])
+    _, _, fact = export.build_star_schema(df, tmp_path / "none.csv",
+                                          symbol_keys=manifest.setdefault(export.SYMBOL_KEYS, {}))
+    assert export.export_partitioned(fact, tmp_path, 'fact_prices', 'csv', ('month', 'symbol'), manifest) == (4, 0, 0)
+    export.save_manifest(manifest, tmp_path)
+
+    # AAA sorts first; BBB and CCC must keep their keys and partitions
+    manifest = export.load_manifest(tmp_path)
+    _, dim_symbol, fact = export.build_star_schema(pd.concat([_prices(['AAA']), df]), tmp_path / "none.csv",
+                                                   symbol_keys=manifest.setdefault(export.SYMBOL_KEYS, {}))
+    assert dict(zip(dim_symbol['Symbol'], dim_symbol['symbol_key'])) == {'AAA': 2, 'BBB': 0, 'CCC': 1}
+    assert export.export_partitioned(fact, tmp_path, 'fact_prices', 'csv', ('month', 'symbol'), manifest) == (2, 4, 0)
+
+
+def test_removed_symbol_key_is_not_reused():
+    symbol_keys = {'AAA': 0, 'BBB': 1}
+    keys = export.assign_symbol_keys(['BBB', 'CCC'], symbol_keys)
+    assert keys.tolist() == [1, 2]
+    assert symbol_keys == {'AAA': 0, 'BBB': 1, 'CCC': 2}
+
+
+def test_fact_keeps_exact_prices_and_missing_volume(tmp_path):
+    df = pd.DataFrame({
+        'Symbol': ['BIG', 'BIG'],
+        'Date': pd.to_datetime(['2024-01-01', '2024-01-02']),
+        'Close': [123456.78, 831.4],
+        'Volume': [100.0, np.nan],
+    })
+    _, _, fact = export.build_star_schema(df, tmp_path / "none.csv")
+    assert fact['Close'].tolist() == [123456.78, 831.4]
+    assert fact['Volume'].dtype == 'Int64'
+    assert fact['Volume'].iloc[0] == 100 and pd.isna(fact['Volume'].iloc[1])
+
+    path = export.write_frame(fact, tmp_path / "fact_prices", 'csv')
+    assert pd.read_csv(path)['Volume'].isna().tolist() == [False, True]
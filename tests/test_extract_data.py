@@ -0,0 +1,28 @@
+# test_extract_data.py - Incremental CSV merges find the last date through the header
+import pandas as pd
+
+from extract_data import _csv_tail, _merge_symbol_csv
+
+
+def _new_rows(date, close):
+    return pd.DataFrame({'Symbol': ['AAA'], 'Date': [pd.Timestamp(date)], 'Close': [close]})
+
+
+def test_last_date_follows_the_header(tmp_path):
+    path = tmp_path / "AAA.csv"
+    path.write_text("Close,Symbol,Date\n1.0,AAA,2024-01-01 00:00:00\n2.0,AAA,2024-01-02 00:00:00\n")
+    assert _csv_tail(path) == (['Close', 'Symbol', 'Date'], pd.Timestamp("2024-01-02"))
+
+    path.write_text("Symbol,Date,Close\n")
+    assert _csv_tail(path) == (['Symbol', 'Date', 'Close'], None)
+
+
+def test_append_only_when_columns_line_up(tmp_path):
+    path = tmp_path / "AAA.csv"
+    _new_rows("2024-01-01", 1.0).to_csv(path, index=False)
+    assert _merge_symbol_csv(_new_rows("2024-01-02", 2.0), path) == 'appended'
+
+    reordered = tmp_path / "BBB.csv"
+    _new_rows("2024-01-01", 1.0)[['Close', 'Date', 'Symbol']].to_csv(reordered, index=False)
+    assert _merge_symbol_csv(_new_rows("2024-01-02", 2.0), reordered) == 'merged'
+    assert pd.read_csv(reordered)['Close'].tolist() == [1.0, 2.0]
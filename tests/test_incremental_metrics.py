@@ -0,0 +1,85 @@
+# test_incremental_metrics.py - Replay updates and revisions against a full rebuild
+import numpy as np
+import pandas as pd
+
+from incremental_metrics import IncrementalMetrics
+
+
+def _history(n_symbols=6, n_days=40, seed=0):
+    rng = np.random.default_rng(seed)
+    dates = pd.bdate_range("2024-01-01", periods=n_days)
+    close = 100 * np.exp(np.cumsum(rng.normal(0, 0.02, (n_days, n_symbols)), axis=0))
+    return pd.DataFrame({
+        'Symbol': np.tile([f"S{i}" for i in range(n_symbols)], n_days),
+        'Date': np.repeat(dates, n_symbols),
+        'Close': close.ravel(),
+    })
+
+
+def _assert_matches(engine, history):
+    expected = IncrementalMetrics.from_history(history)
+    got = engine.metrics().set_index('Symbol').sort_index()
+    want = expected.metrics().set_index('Symbol').sort_index()
+    for column in ('Yearly_Return', 'Volatility', 'Cumulative_Return'):
+        np.testing.assert_allclose(got[column], want[column], rtol=1e-9, atol=1e-12)
+    symbols = sorted(engine.symbols)
+    np.testing.assert_allclose(engine.correlation().loc[symbols, symbols],
+                               expected.correlation().loc[symbols, symbols], atol=1e-9)
+
+
+def test_daily_updates_match_from_history():
+    history = _history()
+    dates = sorted(history['Date'].unique())
+    engine = IncrementalMetrics.from_history(history[history['Date'] < dates[20]])
+    for date in dates[20:]:
+        engine.update(history[history['Date'] == date])
+    _assert_matches(engine, history)
+
+
+def test_revision_after_other_symbols_moved_on():
+    history = _history()
+    dates = sorted(history['Date'].unique())
+    day, next_day = dates[30], dates[31]
+    engine = IncrementalMetrics.from_history(history[history['Date'] <= day])
+
+    # Intraday refresh of S0 on day, everyone else moves to the next day, then S0 is revised again
+    first = history[(history['Date'] == day) & (history['Symbol'] == 'S0')].assign(Close=lambda d: d['Close'] * 1.03)
+    engine.update(first)
+    engine.update(history[(history['Date'] == next_day) & (history['Symbol'] != 'S0')])
+    final = first.assign(Close=lambda d: d['Close'] * 0.97)
+    engine.update(final)
+
+    expected = history[history['Date'] <= next_day].copy()
+    mask = (expected['Date'] == day) & (expected['Symbol'] == 'S0')
+    expected.loc[mask, 'Close'] = final['Close'].to_numpy()
+    expected = expected[~((expected['Date'] == next_day) & (expected['Symbol'] == 'S0'))]
+    assert not engine.stale
+    _assert_matches(engine, expected)
+
+
+def test_late_bar_for_symbol_behind_the_rest():
+    history = _history()
+    dates = sorted(history['Date'].unique())
+    engine = IncrementalMetrics.from_history(history[history['Date'] <= dates[30]])
+    engine.update(history[(history['Date'] == dates[31]) & (history['Symbol'] != 'S2')])
+    engine.update(history[(history['Date'] == dates[31]) & (history['Symbol'] == 'S2')])
+    _assert_matches(engine, history[history['Date'] <= dates[31]])
+
+
+def test_bar_for_dropped_day_marks_state_stale():
+    history = _history()
+    dates = sorted(history['Date'].unique())
+    engine = IncrementalMetrics.from_history(history[history['Date'] <= dates[30]].query("Symbol != 'S1' or Date <= @dates[5]"),
+                                             revision_days=3)
+    engine.update(history[(history['Date'] == dates[6]) & (history['Symbol'] == 'S1')])
+    assert engine.stale and engine.needs_recompute
+
+
+def test_backfill_before_last_date_marks_state_stale():
+    history = _history()
+    dates = sorted(history['Date'].unique())
+    engine = IncrementalMetrics.from_history(history[history['Date'] <= dates[30]])
+    assert not engine.needs_recompute
+    correction = history[(history['Date'] == dates[28]) & (history['Symbol'] == 'S3')].assign(Close=1.0)
+    assert engine.update(correction) == 0
+    assert engine.stale and engine.needs_recompute
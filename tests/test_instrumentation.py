@@ -0,0 +1,40 @@
+# test_instrumentation.py - Memory peaks are not reset from worker threads
+import threading
+import tracemalloc
+
+import numpy as np
+
+import instrumentation
+from instrumentation import configure, records, stage, summary
+
+
+def test_worker_thread_stages_leave_the_main_peak_alone():
+    instrumentation.clear()
+    configure(trace_memory=True)
+    try:
+        started, done = threading.Event(), threading.Event()
+
+        def worker():
+            started.wait()
+            with stage("test.worker"):
+                pass
+            done.set()
+
+        thread = threading.Thread(target=worker)
+        thread.start()
+        with stage("test.main"):
+            block = np.ones(4_000_000)  # ~32 MB
+            del block
+            # A worker stage starting after the peak must not reset it
+            started.set()
+            done.wait()
+        thread.join()
+    finally:
+        configure(trace_memory=False)
+        tracemalloc.stop()
+
+    by_stage = {record['stage']: record for record in records()}
+    assert by_stage['test.main']['peak_mb'] > 30
+    assert by_stage['test.worker']['peak_mb'] is None
+    assert by_stage['test.worker']['max_rss_mb'] is not None
+    assert 'max_rss_mb' in summary().columns
@@ -0,0 +1,49 @@
+# test_metrics_provider.py - Workers attached to the shared panel never load the long frame
+import numpy as np
+import pandas as pd
+
+from downsample import downsample_ohlc
+from metrics_provider import MetricsProvider
+from price_matrix import PriceMatrix
+from shared_panel import SharedPanel
+
+
+def _write_csv_dir(folder, n_symbols=4, n_days=30):
+    folder.mkdir()
+    rng = np.random.default_rng(0)
+    dates = pd.bdate_range("2024-01-01", periods=n_days).strftime("%Y-%m-%d %H:%M:%S")
+    for i in range(n_symbols):
+        close = 100 * np.exp(np.cumsum(rng.normal(0, 0.02, n_days)))
+        keep = rng.random(n_days) > 0.1
+        pd.DataFrame({'Date': dates, 'Open': close, 'High': close * 1.01, 'Low': close * 0.99,
+                      'Close': close, 'Volume': rng.integers(1, 1000, n_days)})[keep].to_csv(
+            folder / f"S{i}.csv", index=False)
+    return folder
+
+
+def test_attached_worker_builds_price_index_from_the_panel(tmp_path):
+    csv_dir = _write_csv_dir(tmp_path / "csv")
+    panel = SharedPanel(tmp_path / "panel")
+    first = MetricsProvider(str(csv_dir), fingerprint='fp', panel=panel)
+    expected = first.get('prices')
+    first.get('price_matrix')
+
+    worker = MetricsProvider(str(csv_dir), fingerprint='fp', panel=panel)
+    worker.prefetch(['prices', 'price_matrix', 'price_index', 'volatility']).join()
+    assert worker.computed() == ['price_matrix', 'volatility']
+    assert worker.timings['price_matrix'][0] == 'panel'
+
+    index = worker.get('price_index')
+    assert 'prices' not in worker.computed()
+    pd.testing.assert_frame_equal(index.df, expected.reset_index(drop=True), check_dtype=False,
+                                  check_categorical=False)
+
+
+def test_ohlc_bars_from_matrix_match_long_frame(tmp_path):
+    csv_dir = _write_csv_dir(tmp_path / "csv")
+    df = MetricsProvider(str(csv_dir)).get('prices')
+    symbols = ['S1', 'S3']
+    from_frame = downsample_ohlc(df, symbols, '2024-01-10', '2024-02-01', n_buckets=5)
+    from_matrix = downsample_ohlc(PriceMatrix.from_frame(df), symbols, '2024-01-10', '2024-02-01', n_buckets=5)
+    pd.testing.assert_frame_equal(from_matrix.reset_index(drop=True), from_frame.reset_index(drop=True),
+                                  check_dtype=False, check_categorical=False)
@@ -0,0 +1,36 @@
+# test_price_schema.py - Writers get exact prices from a float64 load
+import numpy as np
+import pandas as pd
+import pytest
+from sqlalchemy import create_engine
+
+from analysis import load_stock_data
+from persistence import upsert_prices
+from price_schema import require_exact_prices
+
+
+def _write_csv(folder):
+    folder.mkdir()
+    pd.DataFrame({
+        'Date': ['2024-01-01 00:00:00', '2024-01-02 00:00:00'],
+        'Close': [123456.78, 831.4],
+        'Volume': [100, 200],
+    }).to_csv(folder / "BIG.csv", index=False)
+    return folder
+
+
+def test_float64_load_keeps_eight_significant_digits(tmp_path):
+    csv_dir = _write_csv(tmp_path / "csv")
+    exact = load_stock_data(str(csv_dir), use_store=False, precision='float64')
+    assert exact['Close'].dtype == np.float64
+    assert exact['Close'].tolist() == [123456.78, 831.4]
+
+
+def test_writers_refuse_float32_prices(tmp_path):
+    csv_dir = _write_csv(tmp_path / "csv")
+    compact = load_stock_data(str(csv_dir), use_store=False)
+    assert compact['Close'].dtype == np.float32
+    with pytest.raises(ValueError, match="precision='float64'"):
+        require_exact_prices(compact)
+    with pytest.raises(ValueError):
+        upsert_prices(compact, create_engine("sqlite://"))
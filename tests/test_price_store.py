@@ -0,0 +1,67 @@
+# test_price_store.py - The store is only used while it matches the CSV folder
+import os
+
+import pandas as pd
+
+from price_store import (append_price_store, build_price_store, read_price_store, read_store_meta,
+                         store_is_fresh, write_price_store)
+
+
+def _write(csv_dir, symbol, closes):
+    pd.DataFrame({
+        'Date': pd.bdate_range("2024-01-01", periods=len(closes)).strftime("%Y-%m-%d %H:%M:%S"),
+        'Close': closes,
+        'Volume': 100,
+    }).to_csv(csv_dir / f"{symbol}.csv", index=False)
+
+
+def _built(tmp_path):
+    csv_dir, store_dir = tmp_path / "csv", tmp_path / "store"
+    csv_dir.mkdir()
+    _write(csv_dir, "AAA", [1.0, 2.0])
+    _write(csv_dir, "BBB", [3.0, 4.0])
+    build_price_store(str(csv_dir), str(store_dir))
+    assert store_is_fresh(store_dir, csv_dir)
+    return csv_dir, store_dir
+
+
+def test_deleted_csv_makes_store_stale(tmp_path):
+    csv_dir, store_dir = _built(tmp_path)
+    (csv_dir / "BBB.csv").unlink()
+    assert not store_is_fresh(store_dir, csv_dir)
+
+
+def test_csv_copied_in_with_old_mtime_makes_store_stale(tmp_path):
+    csv_dir, store_dir = _built(tmp_path)
+    _write(csv_dir, "CCC", [5.0])
+    os.utime(csv_dir / "CCC.csv", (0, 0))
+    assert not store_is_fresh(store_dir, csv_dir)
+
+
+def test_missing_csv_dir_is_not_fresh(tmp_path):
+    csv_dir, store_dir = _built(tmp_path)
+    assert not store_is_fresh(store_dir, tmp_path / "elsewhere")
+
+
+def _rows(symbol, start, closes):
+    return pd.DataFrame({'Symbol': symbol, 'Date': pd.bdate_range(start, periods=len(closes)),
+                         'Close': closes, 'Volume': 100})
+
+
+def test_append_matches_a_full_rewrite(tmp_path):
+    base = pd.concat([_rows("AAA", "2024-01-01", [1.0, 2.0]), _rows("BBB", "2024-01-01", [3.0])])
+    new = pd.concat([_rows("BBB", "2024-02-01", [4.0, 5.0]), _rows("CCC", "2024-02-01", [6.0])])
+    write_price_store(base, tmp_path / "store")
+    assert append_price_store(new, tmp_path / "store") is not None
+    assert len(read_store_meta(tmp_path / "store")['appends']) == 1
+
+    write_price_store(pd.concat([base, new]), tmp_path / "full")
+    pd.testing.assert_frame_equal(read_price_store(tmp_path / "store"), read_price_store(tmp_path / "full"))
+    pd.testing.assert_frame_equal(read_price_store(tmp_path / "store", symbols=['BBB'], columns=['Close']),
+                                  read_price_store(tmp_path / "full", symbols=['BBB'], columns=['Close']))
+
+
+def test_append_refuses_overlapping_dates(tmp_path):
+    write_price_store(_rows("AAA", "2024-01-01", [1.0, 2.0, 3.0]), tmp_path / "store")
+    assert append_price_store(_rows("AAA", "2024-01-02", [9.0]), tmp_path / "store") is None
+    assert read_price_store(tmp_path / "store")['Close'].tolist() == [1.0, 2.0, 3.0]
@@ -0,0 +1,39 @@
+# test_shared_panel.py - Concurrent publishers and metric writers keep the descriptor consistent
+import threading
+
+import numpy as np
+import pandas as pd
+
+from price_matrix import PriceMatrix
+from shared_panel import SharedPanel
+
+
+def _matrix():
+    dates = pd.bdate_range("2024-01-01", periods=5)
+    close = np.arange(10, dtype=np.float64).reshape(5, 2)
+    return PriceMatrix(['A', 'B'], dates, {'Close': close}, np.ones((5, 2), dtype=bool))
+
+
+def test_concurrent_publishes_get_distinct_versions(tmp_path):
+    panel = SharedPanel(tmp_path, keep=100)
+    matrix = _matrix()
+    versions = []
+
+    def publisher():
+        for _ in range(5):
+            versions.append(panel.publish(matrix, fingerprint='fp'))
+
+    def metric_writer():
+        for i in range(20):
+            panel.add_metric(f"m{i}", np.zeros(2), fingerprint='fp')
+
+    threads = [threading.Thread(target=publisher) for _ in range(4)] + [threading.Thread(target=metric_writer)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert sorted(versions) == list(range(1, 21))
+    # A metric write never rolls the descriptor back to an older version
+    assert panel.current_version() == 20
+    assert panel.attach('fp').matrix.close.tolist() == matrix.close.tolist()
@@ -0,0 +1,67 @@
+# test_window_index.py - Prefix-sum windows against a pandas groupby, and over the shared panel
+import numpy as np
+import pandas as pd
+
+from metrics_provider import MetricsProvider
+from price_matrix import PriceMatrix
+from shared_panel import SharedPanel
+from window_index import WindowIndex
+
+
+def _prices(n_symbols=5, n_days=80, seed=1):
+    """Random walks with each symbol missing ~15% of the calendar (gaps in the shared dates)."""
+    rng = np.random.default_rng(seed)
+    dates = pd.bdate_range("2024-01-01", periods=n_days)
+    frames = []
+    for i in range(n_symbols):
+        keep = rng.random(n_days) > 0.15
+        close = 100 * np.exp(np.cumsum(rng.normal(0, 0.02, n_days)))
+        frames.append(pd.DataFrame({'Symbol': f"S{i}", 'Date': dates, 'Close': close,
+                                    'Volume': rng.integers(1, 10_000, n_days).astype(float)})[keep])
+    return pd.concat(frames, ignore_index=True)
+
+
+def _groupby_window(df, start, end):
+    part = df[(df['Date'] >= start) & (df['Date'] <= end)].sort_values(['Symbol', 'Date'])
+    returns = part.groupby('Symbol')['Close'].pct_change()
+    grouped = part.assign(Return=returns).groupby('Symbol')
+    return pd.DataFrame({
+        'Return_%': (grouped['Close'].last() / grouped['Close'].first() - 1) * 100,
+        'Volatility': grouped['Return'].std() * np.sqrt(252) * 100,
+        'Avg_Volume': grouped['Volume'].mean(),
+        'Days': grouped.size(),
+    })
+
+
+def _assert_window(index, df, start, end):
+    got = index.window(start, end).set_index('Symbol').sort_index()
+    want = _groupby_window(df, pd.Timestamp(start), pd.Timestamp(end))
+    assert list(got.index) == list(want.index)
+    for column in ('Return_%', 'Volatility', 'Avg_Volume'):
+        np.testing.assert_allclose(got[column], want[column], rtol=1e-9)
+    np.testing.assert_array_equal(got['Days'], want['Days'])
+
+
+def test_windows_match_groupby_across_calendar_gaps():
+    df = _prices()
+    index = WindowIndex(PriceMatrix.from_frame(df))
+    dates = sorted(df['Date'].unique())
+    for start, end in ((dates[0], dates[-1]), (dates[5], dates[30]), (dates[17], dates[18]), (dates[40], dates[79])):
+        _assert_window(index, df, start, end)
+
+
+def test_window_index_is_mapped_from_the_panel(tmp_path):
+    df = _prices()
+    panel = SharedPanel(tmp_path / "panel")
+    panel.publish(PriceMatrix.from_frame(df), fingerprint='fp')
+    first = MetricsProvider(fingerprint='fp', panel=panel)
+    built = first.get('window_index')
+    assert first.timings['window_index'][0] == 'computed'
+
+    worker = MetricsProvider(fingerprint='fp', panel=panel)
+    mapped = worker.get('window_index')
+    assert worker.timings['window_index'][0] == 'panel'
+    assert isinstance(mapped.log_sum, np.memmap)
+    pd.testing.assert_frame_equal(mapped.window('2024-02-01', '2024-03-15'),
+                                  built.window('2024-02-01', '2024-03-15'))
+    _assert_window(mapped, df, '2024-01-15', '2024-04-01')
@@ -0,0 +1,151 @@
+# window_index.py - Prefix-sum index for return, volatility and volume over any date window
+import numpy as np
+import pandas as pd
+
+from price_matrix import as_price_matrix
+
+# Prefix arrays, as published to the shared panel under "window_<name>"
+ARRAYS = ('log_sum', 'ret_sum', 'sq_sum', 'close_count', 'volume_sum', 'volume_count', 'last_at', 'first_from')
+PANEL_PREFIX = "window_"
+
+
+class WindowIndex:
+    """
+    Per-symbol prefix sums over the shared trading calendar, so metrics for an
+    arbitrary [start, end] window cost two binary searches on the calendar and
+    O(1) arithmetic per symbol, for all symbols at once.
+
+    Stored per (date, symbol): running sums of log returns, simple returns,
+    squared simple returns, closes seen, volume and volume days, plus "first
+    close at or after row t" / "last close at or before row t" lookups that
+    find each symbol's own window edges across calendar gaps.
+    """
+
+    def __init__(self, data, periods_per_year=252):
+        matrix = as_price_matrix(data)
+        self.symbols = matrix.symbols
+        self.dates = matrix.dates
+        self.periods_per_year = periods_per_year
+        n_dates, n_symbols = matrix.n_dates, matrix.n_symbols
+
+        close = matrix.close
+        valid = ~np.isnan(close)
+        returns = matrix.daily_returns()
+        has_return = ~np.isnan(returns)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            log_returns = np.log1p(returns)
+
+        def prefix(values, dtype=np.float64):
+            out = np.zeros((n_dates + 1, n_symbols), dtype=dtype)
+            np.cumsum(values, axis=0, out=out[1:])
+            return out
+
+        self.log_sum = prefix(np.where(has_return, log_returns, 0.0))
+        self.ret_sum = prefix(np.where(has_return, returns, 0.0))
+        self.sq_sum = prefix(np.where(has_return, returns * returns, 0.0))
+        self.close_count = prefix(valid, np.int32)
+        volume = matrix.volume
+        if volume is not None:
+            has_volume = ~np.isnan(volume)
+            self.volume_sum = prefix(np.where(has_volume, volume, 0.0))
+            self.volume_count = prefix(has_volume, np.int32)
+        else:
+            self.volume_sum = self.volume_count = None
+
+        rows = np.arange(n_dates, dtype=np.int32)[:, None]
+        self.last_at = np.where(valid, rows, -1).astype(np.int32)
+        np.maximum.accumulate(self.last_at, axis=0, out=self.last_at)
+        first_from = np.where(valid, rows, n_dates).astype(np.int32)
+        self.first_from = np.ascontiguousarray(np.minimum.accumulate(first_from[::-1], axis=0)[::-1])
+
+    def to_metrics(self):
+        """The prefix arrays as {panel metric name: array}, for SharedPanel.add_metrics."""
+        return {PANEL_PREFIX + name: getattr(self, name) for name in ARRAYS if getattr(self, name) is not None}
+
+    @classmethod
+    def from_metrics(cls, symbols, dates, metrics, periods_per_year=252):
+        """
+        A WindowIndex over already built prefix arrays (e.g. the panel's
+        read-only memory maps), without copying them. None when they are missing.
+        """
+        if PANEL_PREFIX + 'log_sum' not in metrics:
+            return None
+        index = cls.__new__(cls)
+        index.symbols = np.asarray(symbols, dtype=object)
+        index.dates = pd.DatetimeIndex(dates)
+        index.periods_per_year = periods_per_year
+        for name in ARRAYS:
+            setattr(index, name, metrics.get(PANEL_PREFIX + name))
+        return index
+
+    @property
+    def empty(self):
+        return len(self.symbols) == 0 or len(self.dates) == 0
+
+    @property
+    def date_range(self):
+        if self.empty:
+            return None, None
+        return self.dates[0], self.dates[-1]
+
+    def _rows(self, start, end):
+        """Calendar rows [lo, hi) inside the window; a date-only end covers that whole day."""
+        lo = 0 if start is None else int(self.dates.searchsorted(pd.Timestamp(start), side='left'))
+        if end is None:
+            hi = len(self.dates)
+        else:
+            end = pd.Timestamp(end)
+            if end == end.normalize():
+                hi = int(self.dates.searchsorted(end + pd.Timedelta(days=1), side='left'))
+            else:
+                hi = int(self.dates.searchsorted(end, side='right'))
+        return lo, hi
+
+    def window(self, start=None, end=None):
+        """
+        One row per symbol with a close inside [start, end]:
+        Symbol, First_Date, Last_Date, Days, Return_% (first to last close in
+        the window), Log_Return, Volatility (annualized %, NaN under two
+        returns) and Avg_Volume.
+        """
+        columns = ['Symbol', 'First_Date', 'Last_Date', 'Days', 'Return_%', 'Log_Return', 'Volatility', 'Avg_Volume']
+        lo, hi = self._rows(start, end)
+        if self.empty or hi <= lo:
+            return pd.DataFrame(columns=columns)
+
+        cols = np.arange(len(self.symbols))
+        first = self.first_from[lo]
+        last = self.last_at[hi - 1]
+        present = (first < hi) & (last >= lo)
+        first, last, cols = first[present], last[present], cols[present]
+
+        # Returns inside the window are the ones after each symbol's first close
+        a, b = first + 1, last + 1
+        log_return = self.log_sum[b, cols] - self.log_sum[a, cols]
+        n = (self.close_count[b, cols] - self.close_count[a, cols]).astype(np.float64)
+        total = self.ret_sum[b, cols] - self.ret_sum[a, cols]
+        squares = self.sq_sum[b, cols] - self.sq_sum[a, cols]
+        with np.errstate(divide='ignore', invalid='ignore'):
+            variance = np.maximum(squares - total * total / n, 0.0) / (n - 1)
+            volatility = np.where(n > 1, np.sqrt(variance) * np.sqrt(self.periods_per_year) * 100, np.nan)
+            if self.volume_sum is not None:
+                avg_volume = ((self.volume_sum[hi, cols] - self.volume_sum[lo, cols])
+                              / (self.volume_count[hi, cols] - self.volume_count[lo, cols]))
+            else:
+                avg_volume = np.full(len(cols), np.nan)
+
+        return pd.DataFrame({
+            'Symbol': self.symbols[cols],
+            'First_Date': self.dates[first],
+            'Last_Date': self.dates[last],
+            'Days': self.close_count[last + 1, cols] - self.close_count[first, cols],
+            'Return_%': np.expm1(log_return) * 100,
+            'Log_Return': log_return,
+            'Volatility': volatility,
+            'Avg_Volume': avg_volume,
+        }, columns=columns)
+
+    def top(self, start=None, end=None, n=10, by='Return_%', ascending=False):
+        """The n best (or, with ascending=True, worst) symbols of the window by one column."""
+        metrics = self.window(start, end).dropna(subset=[by])
+        return metrics.nsmallest(n, by) if ascending else metrics.nlargest(n, by)